@@ -0,0 +1,173 @@
+/*
+ * Copyright (C) 2015-2020 Bitergia
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+import java.security.Permission;
+import java.util.jar.JarFile;
+
+/**
+ * Long-lived Jadolint host.
+ *
+ * It is launched as a single-file source program (Java 11 or later), with the
+ * Jadolint jar in the classpath and its path as argument:
+ *
+ *   java -cp jadolint.jar JadolintHost.java jadolint.jar
+ *
+ * It reads from the standard input one request per line, made of the Jadolint
+ * options (e.g., --deps, --smells) separated by commas and the path of the
+ * Dockerfile, separated by a tab. The main class of Jadolint is run on the same
+ * JVM for every option of the request, and its output is written on the standard
+ * output followed by a line with a NUL character and the status of the execution
+ * (0 on success, 1 on failure).
+ *
+ * The calls to System.exit performed by Jadolint are turned into exceptions by
+ * a security manager, thus the JVM is not terminated and the exit status is the
+ * status of the execution. The security manager can not be installed on Java 18
+ * or later, unless the JVM is launched with -Djava.security.manager=allow; there,
+ * a call to System.exit terminates the JVM and the request fails.
+ */
+public class JadolintHost {
+
+    /**
+     * Thrown in place of terminating the JVM when Jadolint calls System.exit.
+     */
+    private static final class ExitException extends SecurityException {
+
+        private final int status;
+
+        ExitException(int status) {
+            super("System.exit(" + status + ")");
+            this.status = status;
+        }
+    }
+
+    /**
+     * Security manager which only forbids System.exit while Jadolint runs.
+     */
+    private static final class ExitGuard extends SecurityManager {
+
+        private volatile boolean running = false;
+
+        @Override
+        public void checkPermission(Permission permission) {
+        }
+
+        @Override
+        public void checkPermission(Permission permission, Object context) {
+        }
+
+        @Override
+        public void checkExit(int status) {
+            if (running) {
+                throw new ExitException(status);
+            }
+        }
+    }
+
+    private static ExitGuard guard = null;
+
+    @SuppressWarnings("removal")
+    private static void installGuard() {
+        ExitGuard exitGuard = new ExitGuard();
+        try {
+            System.setSecurityManager(exitGuard);
+            guard = exitGuard;
+        } catch (UnsupportedOperationException | SecurityException e) {
+            guard = null;
+        }
+    }
+
+    public static void main(String[] args) throws Exception {
+        installGuard();
+
+        String mainClass;
+        try (JarFile jar = new JarFile(args[0])) {
+            mainClass = jar.getManifest().getMainAttributes().getValue("Main-Class");
+        }
+        Method jadolint = Class.forName(mainClass).getMethod("main", String[].class);
+
+        PrintStream output = new PrintStream(new FileOutputStream(FileDescriptor.out), false, "UTF-8");
+        BufferedReader input = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+
+        String line;
+        while ((line = input.readLine()) != null) {
+            int separator = line.indexOf('\t');
+            if (separator < 0) {
+                continue;
+            }
+            String[] options = line.substring(0, separator).split(",");
+            String filePath = line.substring(separator + 1);
+
+            for (String option : options) {
+                run(jadolint, output, filePath, option);
+            }
+            output.flush();
+        }
+    }
+
+    private static void run(Method jadolint, PrintStream output, String filePath, String option)
+            throws Exception {
+        ByteArrayOutputStream buffer = new ByteArrayOutputStream();
+        PrintStream capture = new PrintStream(buffer, true, "UTF-8");
+        int status = 0;
+
+        // the results printed by Jadolint are captured, thus they are not mixed with the protocol
+        System.setOut(capture);
+        if (guard != null) {
+            guard.running = true;
+        }
+        try {
+            jadolint.invoke(null, (Object) new String[] {filePath, option});
+        } catch (InvocationTargetException e) {
+            if (e.getCause() instanceof ExitException) {
+                // Jadolint called System.exit, the output printed so far is kept
+                ExitException exit = (ExitException) e.getCause();
+                if (exit.status != 0) {
+                    capture.println(exit.getMessage());
+                    status = 1;
+                }
+            } else {
+                capture.println(e.getCause());
+                status = 1;
+            }
+        } catch (Exception e) {
+            capture.println(e);
+            status = 1;
+        } finally {
+            if (guard != null) {
+                guard.running = false;
+            }
+            capture.flush();
+            System.setOut(output);
+        }
+
+        String result = buffer.toString("UTF-8");
+        output.print(result);
+        if (!result.isEmpty() && !result.endsWith("\n")) {
+            output.println();
+        }
+        output.println("\0" + status);
+    }
+}
@@ -21,7 +21,10 @@
 #     inishchith <inishchith@gmail.com>
 #
 
+import json
+import os
 import subprocess
+import tempfile
 
 from graal.graal import (GraalError,
                          GraalRepository)
@@ -33,8 +36,8 @@ DEFAULT_DIFF_TIMEOUT = 60
 class Cloc(Analyzer):
     """A wrapper for Cloc.
 
-    This class allows to call Cloc over a file, parses
-    the result of the analysis and returns it as a dict.
+    This class allows to call Cloc over a file or a set of files,
+    parses the result of the analysis and returns it as a dict.
 
     :param diff_timeout: max time to compute diffs of a given file
     """
@@ -106,17 +109,47 @@ class Cloc(Analyzer):
 
         return results
 
+    def __analyze_files(self, message, file_paths):
+        """Add information about LOC, blank and commented lines using CLOC for a set of files
+
+        :param message: JSON document from standard output after execution of cloc --by-file
+        :param file_paths: the paths of the files analyzed
+
+        :returns result: dict of the results of the analysis, indexed by file path
+        """
+        by_file = json.loads(message) if message.strip() else {}
+
+        results = {}
+        for file_path in file_paths:
+            # the files not recognized by cloc are not included in its output
+            file_info = by_file.get(file_path, {})
+            results[file_path] = {
+                "blanks": file_info.get("blank", 0),
+                "comments": file_info.get("comment", 0),
+                "loc": file_info.get("code", 0),
+                "ext": GraalRepository.extension(file_path)
+            }
+
+        return results
+
     def analyze(self, **kwargs):
         """Add information using CLOC
 
         :param file_path: file path
-        :param repository_level: set to True if analysis has to be performed on a repository
+        :param file_paths: list of file paths, analyzed with a single execution of CLOC
+            (it replaces `file_path`)
+        :param repository_level: set to True if analysis has to be performed on a repository;
+            with `file_paths`, the results of the files are grouped by language
 
-        :returns result: dict of the results of the analysis
+        :returns result: dict of the results of the analysis; when `file_paths`
+            is set, the results of each file indexed by its path
         """
+        repository_level = kwargs.get('repository_level', False)
+
+        if 'file_paths' in kwargs:
+            return self.__analyze_by_file(kwargs['file_paths'], repository_level)
 
         file_path = kwargs['file_path']
-        repository_level = kwargs.get('repository_level', False)
 
         try:
             cloc_command = ['cloc', file_path, '--diff-timeout', str(self.diff_timeout)]
@@ -133,3 +166,33 @@ class Cloc(Analyzer):
             results['ext'] = GraalRepository.extension(file_path)
 
         return results
+
+    def __analyze_by_file(self, file_paths, repository_level=False):
+        """Run CLOC once over a list of files. At repository level, the duplicated
+        files are discarded as when CLOC analyzes a directory"""
+
+        if not file_paths:
+            return {}
+
+        # the files are passed via a list file to not exceed the length of the command line
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as list_file:
+            list_file.write('\n'.join(file_paths) + '\n')
+
+        if repository_level:
+            cloc_command = ['cloc', '--list-file', list_file.name, '--diff-timeout', str(self.diff_timeout)]
+        else:
+            cloc_command = ['cloc', '--by-file', '--json', '--skip-uniqueness',
+                            '--list-file', list_file.name, '--diff-timeout', str(self.diff_timeout)]
+
+        try:
+            message = subprocess.check_output(cloc_command).decode("utf-8")
+        except subprocess.CalledProcessError as e:
+            raise GraalError(cause="Cloc failed at %s files, %s" % (len(file_paths), e.output.decode("utf-8")))
+        finally:
+            os.remove(list_file.name)
+            subprocess._cleanup()
+
+        if repository_level:
+            return self.__analyze_repository(message)
+
+        return self.__analyze_files(message, file_paths)
@@ -20,6 +20,9 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #
 
+import logging
+import os
+import queue
 import subprocess
 
 from graal.graal import (GraalError,
@@ -30,18 +33,62 @@ from .analyzer import Analyzer
 DEPENDENCIES = 'dependencies'
 SMELLS = 'smells'
 
+JADOLINT_OPTIONS = {
+    DEPENDENCIES: '--deps',
+    SMELLS: '--smells'
+}
+
+JADOLINT_HOST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'JadolintHost.java')
+# marker of the end of the results of a file, followed by the status
+JADOLINT_HOST_END = '\0'
+
+logger = logging.getLogger(__name__)
+
 
 class Jadolint(Analyzer):
-    """A wrapper for Jadolint, a tool to extract dependencies and smells from Dockerfiles."""
+    """A wrapper for Jadolint, a tool to extract dependencies and smells from Dockerfiles.
+
+    By default, a JVM is launched for each Dockerfile and analysis. When `host`
+    is enabled, the Dockerfiles are analyzed by long-lived JVMs running
+    `JadolintHost.java` (Java 11 or later is required), which perform all the
+    analyses of a file in a single request. A JVM is started for each file
+    analyzed at the same time, and they are released by `close`.
 
+    :param exec_path: path of the Jadolint jar
+    :param analysis: the analysis to perform (i.e., DEPENDENCIES or SMELLS), or a list
+        of them to perform on each file
+    :param host: if True, the files are analyzed by long-lived JVMs
+    """
     version = '0.2.0'
 
-    def __init__(self, exec_path, analysis):
+    def __init__(self, exec_path, analysis, host=False):
         if not GraalRepository.exists(exec_path):
             raise GraalError(cause="executable path %s not valid" % exec_path)
 
         self.exec_path = exec_path
         self.analysis = analysis
+        self.host = host
+        self._hosts = queue.LifoQueue()
+
+    def __run(self, file_path, option):
+        """Run Jadolint on a Dockerfile with a new JVM"""
+
+        cmd = ['java', '-jar', self.exec_path, file_path, option]
+
+        try:
+            msg = subprocess.check_output(cmd).decode("utf-8")
+        except subprocess.CalledProcessError as e:
+            raise GraalError(cause="Jadolint failed at %s, %s" % (file_path, e.output.decode("utf-8")))
+        finally:
+            subprocess._cleanup()
+
+        return msg
+
+    def close(self):
+        """Terminate the long-lived JVMs"""
+
+        while not self._hosts.empty():
+            self._hosts.get_nowait().close()
 
     def analyze(self, **kwargs):
         """Get Jadolint results for a Dockerfile.
@@ -49,26 +96,135 @@ class Jadolint(Analyzer):
         :param file_path: file path
         :param result: dict of the results of the analysis
         """
-        results = []
-        result = {self.analysis: results}
+        result = {}
         file_path = kwargs['file_path']
+        analyses = self.analysis if isinstance(self.analysis, list) else [self.analysis]
 
-        if self.analysis == DEPENDENCIES:
-            cmd = ['java', '-jar', self.exec_path, file_path, '--deps']
-        else:
-            cmd = ['java', '-jar', self.exec_path, file_path, '--smells']
+        # an idle long-lived JVM is used, or a new one if all of them are busy. The
+        # requests to the hosts are written on a line
+        host = None
+        if self.host and '\n' not in file_path:
+            try:
+                host = self._hosts.get_nowait()
+            except queue.Empty:
+                host = JadolintHost(self.exec_path)
 
+        options = [JADOLINT_OPTIONS[analysis] for analysis in analyses]
         try:
-            msg = subprocess.check_output(cmd).decode("utf-8")
-        except subprocess.CalledProcessError as e:
-            raise GraalError(cause="Jadolint failed at %s, %s" % (file_path, e.output.decode("utf-8")))
+            if host:
+                msgs = host.run_options(file_path, options)
+            else:
+                msgs = [self.__run(file_path, option) for option in options]
         finally:
-            subprocess._cleanup()
+            if host:
+                self._hosts.put(host)
 
-        results_raw = msg.split('\n')
-        for res_raw in results_raw:
-            res = res_raw.strip()
-            if res:
-                results.append(res)
+        for analysis, msg in zip(analyses, msgs):
+            results = []
+            for res_raw in msg.split('\n'):
+                res = res_raw.strip()
+                if res:
+                    results.append(res)
+            result[analysis] = results
 
         return result
+
+
+class JadolintHost:
+    """A long-lived JVM running Jadolint.
+
+    The JVM runs `JadolintHost.java`, which invokes the main class of the
+    Jadolint jar for every option of a request. The requests (the Jadolint
+    options, separated by commas, and the path of the Dockerfile, separated
+    by a tab) are written on its standard input, one per line. The output
+    of Jadolint for each option is read from its standard output, until a
+    line with a NUL character followed by the status of the execution. The
+    JVM is started on the first request, and restarted if it dies. The calls
+    to System.exit performed by Jadolint are intercepted on Java 11 to 17.
+
+    :param exec_path: path of the Jadolint jar
+    """
+    def __init__(self, exec_path):
+        self.exec_path = exec_path
+        self._proc = None
+
+    def run(self, file_path, option):
+        """Run Jadolint on a Dockerfile
+
+        :param file_path: file path
+        :param option: the Jadolint option (e.g., --deps, --smells)
+
+        :returns: the output of Jadolint
+        """
+        return self.run_options(file_path, [option])[0]
+
+    def run_options(self, file_path, options):
+        """Run Jadolint on a Dockerfile with a set of options, using a single request
+
+        :param file_path: file path
+        :param options: list of Jadolint options (e.g., --deps, --smells)
+
+        :returns: the outputs of Jadolint, one for each option
+        """
+        responses = None
+        for _ in range(2):
+            if self._proc is None or self._proc.poll() is not None:
+                self.__start()
+
+            try:
+                self._proc.stdin.write('%s\t%s\n' % (','.join(options), file_path))
+                self._proc.stdin.flush()
+                responses = [self.__read() for _ in options]
+            except OSError:
+                responses = None
+
+            if responses is not None and None not in responses:
+                break
+
+            responses = None
+            logger.warning("Jadolint host died at %s, restarting it" % file_path)
+            self.close()
+
+        if responses is None:
+            raise GraalError(cause="Jadolint host failed at %s" % file_path)
+
+        for status, msg in responses:
+            if status != '0':
+                raise GraalError(cause="Jadolint failed at %s, %s" % (file_path, msg))
+
+        return [msg for _, msg in responses]
+
+    def close(self):
+        """Terminate the JVM"""
+
+        if self._proc is None:
+            return
+
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self._proc.kill()
+            self._proc.wait()
+        finally:
+            self._proc.stdout.close()
+            self._proc = None
+
+    def __read(self):
+        """Read the output of a request, returning None if the JVM died"""
+
+        lines = []
+        for line in self._proc.stdout:
+            if line.startswith(JADOLINT_HOST_END):
+                return line[len(JADOLINT_HOST_END):].strip(), ''.join(lines)
+            lines.append(line)
+
+        return None
+
+    def _command(self):
+        return ['java', '-cp', self.exec_path, JADOLINT_HOST, self.exec_path]
+
+    def __start(self):
+        self._proc = subprocess.Popen(self._command(),
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, universal_newlines=True, encoding='utf-8')
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import mmap
+import os
+import re
+
+from graal.graal import (GraalError,
+                         GraalRepository)
+from .analyzer import Analyzer
+from .cloc import Cloc
+
+C_LINE = [rb'//']
+C_BLOCK = [(rb'/\*', rb'\*/')]
+HASH_LINE = [rb'#']
+
+# String literals, which are skipped when looking for comments
+DOUBLE_QUOTED = rb'"(?:\\.|[^"\\\n])*"'
+SINGLE_QUOTED = rb"'(?:\\.|[^'\\\n])*'"
+BACKQUOTED = rb'`[^`]*`'
+QUOTED = [DOUBLE_QUOTED, SINGLE_QUOTED]
+
+# Comment syntaxes: language name, file extensions, line comment markers, block
+# comment delimiters and string literals (as regular expressions). The language
+# names are the ones used by CLOC.
+LANGUAGES = [
+    ('C', ['c', 'ec', 'pgc'], C_LINE, C_BLOCK, QUOTED),
+    ('C/C++ Header', ['h'], C_LINE, C_BLOCK, QUOTED),
+    ('C++', ['cpp', 'cc', 'cxx', 'c++', 'hpp', 'hh', 'hxx'], C_LINE, C_BLOCK, QUOTED),
+    ('C#', ['cs'], C_LINE, C_BLOCK, QUOTED),
+    ('CSS', ['css'], [], C_BLOCK, QUOTED),
+    ('Go', ['go'], C_LINE, C_BLOCK, QUOTED + [BACKQUOTED]),
+    ('Groovy', ['groovy', 'gradle'], C_LINE, C_BLOCK, QUOTED),
+    ('Java', ['java'], C_LINE, C_BLOCK, QUOTED),
+    ('JavaScript', ['js', 'mjs', 'cjs', 'jsx'], C_LINE, C_BLOCK, QUOTED + [BACKQUOTED]),
+    ('Kotlin', ['kt', 'kts'], C_LINE, C_BLOCK, QUOTED),
+    ('Objective-C', ['m'], C_LINE, C_BLOCK, QUOTED),
+    ('Rust', ['rs'], C_LINE, C_BLOCK, [DOUBLE_QUOTED]),
+    ('Scala', ['scala', 'sc'], C_LINE, C_BLOCK, QUOTED),
+    ('Swift', ['swift'], C_LINE, C_BLOCK, [DOUBLE_QUOTED]),
+    ('TypeScript', ['ts', 'tsx'], C_LINE, C_BLOCK, QUOTED + [BACKQUOTED]),
+    ('PHP', ['php', 'php3', 'php4', 'php5'], C_LINE + HASH_LINE, C_BLOCK, QUOTED),
+    ('SQL', ['sql'], [rb'--'], C_BLOCK, QUOTED),
+    ('Lua', ['lua'], [rb'--'], [(rb'--\[=*\[', rb'\]=*\]')], QUOTED),
+    ('Haskell', ['hs'], [rb'--'], [(rb'\{-', rb'-\}')], [DOUBLE_QUOTED]),
+    # CLOC treats the docstrings as comments, and any triple quote closes them
+    ('Python', ['py', 'pyw'], HASH_LINE, [(rb'[uU]?(?:"""|\'\'\')', rb'(?:"""|\'\'\')')], QUOTED),
+    ('Ruby', ['rb', 'rake'], HASH_LINE, [(rb'^=begin', rb'^=end[^\n]*')], QUOTED),
+    ('Perl', ['pl', 'pm'], HASH_LINE, [(rb'^=\w+', rb'^=cut[^\n]*')], QUOTED),
+    ('Bourne Shell', ['sh'], HASH_LINE, [], QUOTED),
+    ('Bourne Again Shell', ['bash'], HASH_LINE, [], QUOTED),
+    ('make', ['mk', 'mak'], HASH_LINE, [], []),
+    ('R', ['r'], HASH_LINE, [], QUOTED),
+    ('TOML', ['toml'], HASH_LINE, [], QUOTED),
+    ('YAML', ['yml', 'yaml'], HASH_LINE, [], QUOTED),
+    ('Elixir', ['ex', 'exs'], HASH_LINE, [], QUOTED),
+    ('Erlang', ['erl', 'hrl'], [rb'%'], [], QUOTED),
+    ('TeX', ['tex', 'sty'], [rb'%'], [], []),
+    ('Lisp', ['lisp', 'lsp', 'el'], [rb';'], [], [DOUBLE_QUOTED]),
+    ('Clojure', ['clj', 'cljs', 'cljc'], [rb';'], [], [DOUBLE_QUOTED]),
+    ('HTML', ['html', 'htm'], [], [(rb'<!--', rb'-->')], []),
+    ('XML', ['xml', 'xsd', 'xsl'], [], [(rb'<!--', rb'-->')], []),
+    ('Markdown', ['md'], [], [(rb'<!--', rb'-->')], []),
+    ('JSON', ['json'], [], [], []),
+]
+
+NON_BLANK = re.compile(rb'\S')
+
+VCS_DIRS = ['.git', '.hg', '.svn', '.bzr', 'CVS']
+
+
+class LineCounter(Analyzer):
+    """A built-in counter of blank, commented and code lines.
+
+    This class counts the lines of a file or a repository, returning
+    the results in the same format of `Cloc`. The files of the languages
+    in `LANGUAGES` are counted in process: the comments are found with a
+    regular expression for each language, which is matched on the
+    memory-mapped content of the files, skipping the string literals. As
+    in CLOC, the lines containing only comments are commented lines, while
+    the ones containing code and comments are code lines. The files of the
+    other languages (e.g., Dockerfiles) are counted by `Cloc`, with a single
+    execution for each analysis.
+    """
+    version = '0.3.0'
+
+    def __init__(self):
+        self.cloc = Cloc()
+        self.languages = {}
+        for language, extensions, line_markers, block_delimiters, strings in LANGUAGES:
+            patterns = [start + rb'[\s\S]*?' + end for start, end in block_delimiters]
+            patterns.extend([marker + rb'[^\n]*' for marker in line_markers])
+
+            comments = None
+            if patterns:
+                # the string literals are matched (and ignored) to not take as comments
+                # the markers they contain
+                pattern = b'(?P<comment>' + b'|'.join(patterns) + b')'
+                comments = re.compile(b'|'.join([pattern] + strings), re.MULTILINE)
+
+            for extension in extensions:
+                self.languages[extension] = (language, comments)
+
+    def count(self, file_path):
+        """Count the blank, commented and code lines of a file
+
+        :param file_path: file path
+
+        :returns: a dict with the number of blank, commented and code lines,
+            or None if the language of the file is unknown
+        """
+        extension = GraalRepository.extension(file_path).lower()
+        if extension not in self.languages:
+            return None
+
+        _, comments = self.languages[extension]
+
+        try:
+            with open(file_path, 'rb') as fd:
+                if os.fstat(fd.fileno()).st_size == 0:
+                    return {'blanks': 0, 'comments': 0, 'loc': 0}
+
+                with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return self.__count_lines(mm, self.__comment_spans(mm, comments))
+        except OSError as e:
+            raise GraalError(cause="Line counter failed at %s, %s" % (file_path, str(e)))
+
+    @staticmethod
+    def __comment_spans(mm, comments):
+        """Get the start and end offsets of the comments of a file"""
+
+        if not comments:
+            return []
+
+        return [match.span() for match in comments.finditer(mm) if match.group('comment') is not None]
+
+    @staticmethod
+    def __count_lines(mm, spans):
+        """Count the lines of a file, classifying them by the code they contain
+        outside the comments found at `spans`. The content is read in place"""
+
+        results = {
+            'blanks': 0,
+            'comments': 0,
+            'loc': 0
+        }
+
+        size = len(mm)
+        start = 0
+        first = 0
+        while start < size:
+            end = mm.find(b'\n', start)
+            if end < 0:
+                end = size
+
+            if not NON_BLANK.search(mm, start, end):
+                results['blanks'] += 1
+                start = end + 1
+                continue
+
+            # the comments ended before the line are discarded
+            while first < len(spans) and spans[first][1] <= start:
+                first += 1
+
+            code = False
+            pos = start
+            i = first
+            while not code and i < len(spans) and spans[i][0] < end:
+                span_start, span_end = spans[i]
+                code = span_start > pos and NON_BLANK.search(mm, pos, span_start) is not None
+                pos = max(pos, span_end)
+                i += 1
+
+            if not code and pos < end:
+                code = NON_BLANK.search(mm, pos, end) is not None
+
+            if code:
+                results['loc'] += 1
+            else:
+                results['comments'] += 1
+
+            # the newline at the end of the file does not start a new line
+            start = end + 1
+
+        return results
+
+    def __analyze_repository(self, repository_path):
+        """Count the lines of the files of a repository, grouped by language"""
+
+        results = {}
+        unknown_paths = []
+        for root, dirs, files in os.walk(repository_path):
+            dirs[:] = [d for d in dirs if d not in VCS_DIRS]
+
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+                if os.path.islink(file_path):
+                    continue
+
+                file_results = self.count(file_path)
+                if file_results is None:
+                    unknown_paths.append(file_path)
+                    continue
+
+                file_results['total_files'] = 1
+                language, _ = self.languages[GraalRepository.extension(file_path).lower()]
+                self.__add_results(results, language, file_results)
+
+        if unknown_paths:
+            cloc_results = self.cloc.analyze(file_paths=unknown_paths, repository_level=True)
+            for language, language_results in cloc_results.items():
+                self.__add_results(results, language, language_results)
+
+        return results
+
+    @staticmethod
+    def __add_results(results, language, counts):
+        language_results = results.setdefault(language, {
+            "total_files": 0,
+            "blanks": 0,
+            "comments": 0,
+            "loc": 0
+        })
+        for key in ['total_files', 'blanks', 'comments', 'loc']:
+            language_results[key] += counts[key]
+
+    def analyze(self, **kwargs):
+        """Count blank, commented and code lines
+
+        :param file_path: file path
+        :param file_paths: list of file paths, the results are returned indexed by path
+        :param repository_level: set to True if analysis has to be performed on a repository
+
+        :returns result: dict of the results of the analysis
+        """
+        if 'file_paths' in kwargs:
+            return self.__analyze_files(kwargs['file_paths'])
+
+        file_path = kwargs['file_path']
+
+        if kwargs.get('repository_level', False):
+            return self.__analyze_repository(file_path)
+
+        results = self.count(file_path)
+        if results is None:
+            return self.cloc.analyze(file_path=file_path)
+        results['ext'] = GraalRepository.extension(file_path)
+
+        return results
+
+    def __analyze_files(self, file_paths):
+        """Count the lines of a set of files, the ones of unknown languages with a single CLOC execution"""
+
+        results = {}
+        unknown_paths = []
+        for file_path in file_paths:
+            file_results = self.count(file_path)
+            if file_results is None:
+                unknown_paths.append(file_path)
+            else:
+                file_results['ext'] = GraalRepository.extension(file_path)
+            results[file_path] = file_results
+
+        if unknown_paths:
+            results.update(self.cloc.analyze(file_paths=unknown_paths))
+
+        return results
@@ -21,12 +21,17 @@
 #     inishchith <inishchith@gmail.com>
 #
 
+import codecs
+import multiprocessing
 import warnings
 
 import lizard
 from graal.backends.core.analyzers.cloc import Cloc
+from graal.backends.core.analyzers.linecounter import LineCounter
 from .analyzer import Analyzer
 
+LIZARD_CHUNK_SIZE = 256
+
 
 class Lizard(Analyzer):
     """A wrapper for Lizard, a code complexity analyzer, which is able
@@ -48,6 +53,10 @@ class Lizard(Analyzer):
     """
     version = '0.3.1'
 
+    def __init__(self):
+        self._pool = None
+        self._pool_size = 0
+
     def __analyze_file(self, file_path, details):
         """Add code complexity information for a file using Lizard.
 
@@ -61,41 +70,82 @@ class Lizard(Analyzer):
 
         :returns  result: dict of the results of the analysis
         """
-        result = {}
-
         # Filter DeprecationWarning from lizard_ext/auto_open.py line 26
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", category=DeprecationWarning)
             analysis = lizard.analyze_file(file_path)
 
-        result['ccn'] = analysis.CCN
-        result['avg_ccn'] = analysis.average_cyclomatic_complexity
-        result['avg_loc'] = analysis.average_nloc
-        result['avg_tokens'] = analysis.average_token_count
-        result['num_funs'] = len(analysis.function_list)
-        result['loc'] = analysis.nloc
-        result['tokens'] = analysis.token_count
-        result['ext'] = file_path.split(".")[-1]
-
-        if not details:
-            return result
-
-        funs_data = []
-        for fun in analysis.function_list:
-            fun_data = {'ccn': fun.cyclomatic_complexity,
-                        'tokens': fun.token_count,
-                        'loc': fun.nloc,
-                        'lines': fun.length,
-                        'name': fun.name,
-                        'args': fun.parameter_count,
-                        'start': fun.start_line,
-                        'end': fun.end_line}
-            funs_data.append(fun_data)
-
-        result['funs'] = funs_data
-        return result
+        return _digest_analysis(analysis, file_path, details)
+
+    def __analyze_files(self, file_paths, details, jobs=1):
+        """Add code complexity information for a set of files using Lizard.
+
+        The files are analyzed by a pool of processes, which is kept alive
+        across calls (also the ones analyzing repositories) until `close` is invoked. The processes receive the
+        content of the files and return the results of `__analyze_file`.
+
+        :param file_paths: list of file paths
+        :param details: if True, it returns information about single functions
+        :param jobs: number of processes analyzing the files
+
+        :returns  result: dict of the results of the analysis, indexed by file path
+        """
+        jobs = jobs or 1
+        if jobs < 2 or len(file_paths) < 2 or multiprocessing.current_process().daemon:
+            return {file_path: self.__analyze_file(file_path, details) for file_path in file_paths}
+
+        pool = self.__pool(jobs)
+
+        results = {}
+        for i in range(0, len(file_paths), LIZARD_CHUNK_SIZE):
+            chunk = file_paths[i:i + LIZARD_CHUNK_SIZE]
+
+            tasks = []
+            for file_path in chunk:
+                with open(file_path, 'rb') as fd:
+                    tasks.append((file_path, fd.read(), details))
+
+            results.update(zip(chunk, pool.starmap(_analyze_source_code, tasks)))
+
+        return results
+
+    def __pool(self, jobs):
+        """Get the pool of processes shared by the analyses, with `jobs` processes.
+        It is created on first use, regardless of the number of files to analyze"""
+
+        if self._pool and self._pool_size != jobs:
+            self.close()
+
+        if not self._pool:
+            self._pool = multiprocessing.Pool(processes=jobs)
+            self._pool_size = jobs
+
+        return self._pool
+
+    def close(self):
+        """Terminate the pool of processes analyzing the files, if any"""
+
+        if self._pool:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self._pool_size = 0
+
+    @staticmethod
+    def source_files(repository_path):
+        """List the files of a repository analyzed by Lizard, skipping the ones
+        whose content is duplicated.
 
-    def __analyze_repository(self, repository_path, files_affected, details):
+        :param repository_path: repository path
+
+        :returns: the paths of the files relative to `repository_path`, in the
+            order they are analyzed
+        """
+        return [file_path[len(repository_path) + 1:]
+                for file_path in lizard.get_all_source_files([repository_path], [], None)]
+
+    def __analyze_repository(self, repository_path, files_affected, details, jobs=1, line_counter=False,
+                             files=None):
         """Add code complexity information for a given repository
         using Lizard and CLOC.
 
@@ -104,20 +154,45 @@ class Lizard(Analyzer):
 
         :param repository_path: repository path
         :param details: if True, it returns fine-grained results
+        :param jobs: number of processes analyzing the files
+        :param line_counter: if True, the blank and commented lines are counted
+            with the built-in line counter instead of CLOC
+        :param files: if set, only these files of the repository (relative paths) are
+            analyzed, skipping the ones not supported by Lizard
 
         :returns  result: list of the results of the analysis
         """
         analysis_result = []
 
-        repository_analysis = lizard.analyze(
-            paths=[repository_path],
-            threads=1,
-            exts=lizard.get_extensions([]),
-        )
-        cloc = Cloc()
+        extensions = lizard.get_extensions([])
+        if files is None:
+            files = list(lizard.get_all_source_files([repository_path], [], None))
+        else:
+            files = [repository_path + "/" + file_path for file_path in files
+                     if lizard.get_reader_for(file_path)]
+        file_analyzer = lizard.FileAnalyzer(extensions)
+
+        # Lizard is CPU-bound, thus the files are analyzed by the pool of processes shared
+        # by the analyses. Unlike the threads of Lizard, the results are returned in the same
+        # order of the files
+        jobs = jobs or 1
+        if jobs > 1 and len(files) > 1 and not multiprocessing.current_process().daemon:
+            repository_analysis = self.__pool(jobs).map(file_analyzer, files,
+                                                        chunksize=max(1, len(files) // (jobs * 4)))
+        else:
+            repository_analysis = [file_analyzer(file_path) for file_path in files]
+
+        for extension in extensions:
+            if hasattr(extension, 'cross_file_process'):
+                repository_analysis = extension.cross_file_process(repository_analysis)
+        repository_analysis = list(repository_analysis)
+
+        # the blank and commented lines of all the files are obtained with a single CLOC execution
+        cloc = LineCounter() if line_counter else Cloc()
+        cloc_analyses = cloc.analyze(file_paths=[analysis.filename for analysis in repository_analysis])
 
         for analysis in repository_analysis:
-            cloc_analysis = cloc.analyze(file_path=analysis.filename)
+            cloc_analysis = cloc_analyses[analysis.filename]
             file_path = analysis.filename.replace(repository_path + "/", '')
             in_commit = True if file_path in files_affected else False
 
@@ -141,8 +216,14 @@ class Lizard(Analyzer):
         """Add code complexity information using Lizard.
 
         :param file_path: file path
+        :param file_paths: list of file paths, the results are returned indexed by path
         :param repository_path: repository path
         :param details: if True, it returns detailed information about an analysis
+        :param jobs: number of processes analyzing the files
+        :param line_counter: if True, the built-in line counter is used instead of CLOC
+            (repository level only)
+        :param files: paths of the files to analyze, relative to `repository_path`
+            (repository level only, by default all of them)
 
         :returns  result: the results of the analysis
         """
@@ -151,8 +232,61 @@ class Lizard(Analyzer):
 
         if kwargs.get('repository_level', False):
             files_affected = kwargs['files_affected']
-            result = self.__analyze_repository(kwargs["repository_path"], files_affected, details)
+            result = self.__analyze_repository(kwargs["repository_path"], files_affected, details,
+                                               jobs=kwargs.get('jobs', 1),
+                                               line_counter=kwargs.get('line_counter', False),
+                                               files=kwargs.get('files', None))
+        elif 'file_paths' in kwargs:
+            result = self.__analyze_files(kwargs['file_paths'], details, jobs=kwargs.get('jobs', 1))
         else:
             result = self.__analyze_file(kwargs['file_path'], details)
 
         return result
+
+
+def _digest_analysis(analysis, file_path, details):
+    """Convert the analysis of a file obtained with Lizard to a dict"""
+
+    result = {}
+
+    result['ccn'] = analysis.CCN
+    result['avg_ccn'] = analysis.average_cyclomatic_complexity
+    result['avg_loc'] = analysis.average_nloc
+    result['avg_tokens'] = analysis.average_token_count
+    result['num_funs'] = len(analysis.function_list)
+    result['loc'] = analysis.nloc
+    result['tokens'] = analysis.token_count
+    result['ext'] = file_path.split(".")[-1]
+
+    if not details:
+        return result
+
+    funs_data = []
+    for fun in analysis.function_list:
+        fun_data = {'ccn': fun.cyclomatic_complexity,
+                    'tokens': fun.token_count,
+                    'loc': fun.nloc,
+                    'lines': fun.length,
+                    'name': fun.name,
+                    'args': fun.parameter_count,
+                    'start': fun.start_line,
+                    'end': fun.end_line}
+        funs_data.append(fun_data)
+
+    result['funs'] = funs_data
+    return result
+
+
+def _analyze_source_code(file_path, content, details):
+    """Analyze the content of a file in a process of the pool"""
+
+    # the content is decoded as lizard does when reading a file
+    encoding = 'utf-8-sig' if content.startswith(codecs.BOM_UTF8) else 'utf-8'
+    try:
+        code = content.decode(encoding)
+    except UnicodeDecodeError:
+        code = content.decode('utf-8', 'ignore')
+    code = code.replace('\r\n', '\n').replace('\r', '\n')
+
+    analysis = lizard.analyze_file.analyze_source_code(file_path, code)
+    return _digest_analysis(analysis, file_path, details)
@@ -21,8 +21,14 @@
 #     inishchith <inishchith@gmail.com>
 #
 
+import concurrent.futures
 import json
+import logging
+import os
+import queue
+import shutil
 import subprocess
+import tempfile
 from graal.graal import (GraalError,
                          GraalRepository)
 from .analyzer import Analyzer
@@ -31,6 +37,12 @@ from .analyzer import Analyzer
 SCANCODE_CLI_EXEC = "etc/scripts/scancli.py"
 CONFIGURE_EXEC = 'configure'
 
+SCANCODE_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scancode_worker.py')
+# locations of the Python interpreter of scancode-toolkit, relative to the folder of its executable
+SCANCODE_PYTHON_PATHS = ['python', 'bin/python', 'venv/bin/python']
+
+logger = logging.getLogger(__name__)
+
 
 class ScanCode(Analyzer):
     """A wrapper for nexB/scancode-toolkit.
@@ -38,17 +50,28 @@ class ScanCode(Analyzer):
     This class allows to call scancode-toolkit over a file, parses
     the result of the analysis and returns it as a dict.
 
+    A set of files is scanned with a single execution of scancode,
+    which uses `processes` processes. When `workers` is greater than 0,
+    the files are scanned by a pool of long-lived scancode processes
+    instead, which load the license index only once. They are started
+    on the first analysis and released by `close`.
+
     :param exec_path: path of the scancode executable
     :param cli: True, if scancode_cli is used
+    :param workers: number of long-lived scancode processes (scancode only)
+    :param processes: number of processes used by scancode to scan a set of files
     """
-    version = '0.2.0'
+    version = '0.5.0'
 
-    def __init__(self, exec_path, cli=False):
+    def __init__(self, exec_path, cli=False, workers=0, processes=1):
         if not GraalRepository.exists(exec_path):
             raise GraalError(cause="executable path %s not valid" % exec_path)
 
         self.exec_path = exec_path
         self.cli = cli
+        self.workers = workers
+        self.processes = processes
+        self._workers = None
 
         if self.cli:
             exec_path = self.exec_path.replace(SCANCODE_CLI_EXEC, CONFIGURE_EXEC)
@@ -78,56 +101,257 @@ class ScanCode(Analyzer):
 
         return result
 
+    def __analyze_scancode_files(self, file_paths):
+        """Add information about license and copyright using a single execution of scancode
+
+        The files are linked (or copied) to a scratch directory, each one within
+        a folder named after its position, and the whole directory is scanned.
+        The files skipped by scancode in the directory are scanned one by one.
+
+        :param file_paths: file paths
+
+        :returns result: dict of the results of the analysis of each file, indexed by path
+        """
+        if not file_paths:
+            return {}
+
+        scratch_path = tempfile.mkdtemp(prefix='graal_scancode_')
+        try:
+            for i, file_path in enumerate(file_paths):
+                target_dir = os.path.join(scratch_path, str(i))
+                os.mkdir(target_dir)
+                target_path = os.path.join(target_dir, os.path.basename(file_path))
+                try:
+                    os.link(file_path, target_path)
+                except OSError:
+                    shutil.copyfile(file_path, target_path)
+
+            try:
+                msg = subprocess.check_output(
+                    [self.exec_path, '--json-pp', '-', '--license', '--copyright',
+                     '--processes', str(self.processes), scratch_path]).decode("utf-8")
+            except subprocess.CalledProcessError as e:
+                cause = "Scancode failed at %s files, %s" % (len(file_paths), e.output.decode("utf-8"))
+                raise GraalError(cause=cause)
+            finally:
+                subprocess._cleanup()
+        finally:
+            shutil.rmtree(scratch_path)
+
+        results = {}
+
+        # the paths of the files scanned start with the name of the scratch directory
+        scratch_name = os.path.basename(scratch_path)
+        for file_info in json.loads(msg).get('files', []):
+            if file_info.get('type', 'file') != 'file':
+                continue
+
+            parts = file_info['path'].split('/')
+            if parts[0] == scratch_name:
+                parts = parts[1:]
+
+            file_path = file_paths[int(parts[0])]
+            results[file_path] = {
+                'licenses': file_info['licenses'],
+                'copyrights': file_info['copyrights']
+            }
+
+        # scancode skips the files matching its default ignores (e.g., VCS files)
+        # when scanning a directory, thus they are scanned one by one
+        for file_path in file_paths:
+            if file_path not in results:
+                logger.warning("Scancode skipped %s in the batch scan, scanning it alone" % file_path)
+                results[file_path] = self.__analyze_scancode(file_path)
+
+        return {file_path: results[file_path] for file_path in file_paths}
+
+    def __analyze_workers(self, file_paths):
+        """Add information about license and copyright using the pool of scancode workers
+
+        :param file_paths: file paths
+
+        :returns result: dict of the results of the analysis of each file, indexed by path
+        """
+        if self._workers is None:
+            python_path = self.__python_path()
+            self._workers = queue.Queue()
+            for _ in range(self.workers):
+                self._workers.put(ScanCodeWorker(python_path))
+
+        def scan(file_path):
+            worker = self._workers.get()
+            try:
+                return worker.scan(file_path)
+            finally:
+                self._workers.put(worker)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(scan, file_paths))
+
+        return dict(zip(file_paths, results))
+
+    def __python_path(self):
+        """Find the Python interpreter of scancode-toolkit"""
+
+        exec_dir = os.path.dirname(os.path.abspath(self.exec_path))
+        for python_path in SCANCODE_PYTHON_PATHS:
+            python_path = os.path.join(exec_dir, python_path)
+            if os.path.isfile(python_path) and os.access(python_path, os.X_OK):
+                return python_path
+
+        raise GraalError(cause="Python interpreter of scancode not found in %s" % exec_dir)
+
+    def close(self):
+        """Terminate the scancode workers"""
+
+        if self._workers is None:
+            return
+
+        while not self._workers.empty():
+            self._workers.get().close()
+        self._workers = None
+
     def __analyze_scancode_cli(self, file_paths):
         """Add information about license using scancode-cli
 
+        The output of scancode-cli is read from the process pipe, and each
+        JSON document (separated by blank lines) is parsed as soon as it is
+        complete, thus the results are yielded file by file.
+
         :param file_paths: file paths (in case of scancode_cli for concurrent execution on files)
-        :returns result: list of the results of the analysis
+        :returns result: generator of the results of the analysis
         """
-        result = []
+        cmd_scancli = ['python3', self.exec_path]
+        cmd_scancli.extend(file_paths)
 
+        proc = subprocess.Popen(cmd_scancli, stdout=subprocess.PIPE, universal_newlines=True)
         try:
-            cmd_scancli = ['python3', self.exec_path]
-            cmd_scancli.extend(file_paths)
-            msg = subprocess.check_output(cmd_scancli).decode("utf-8")
-        except subprocess.CalledProcessError as e:
-            raise GraalError(cause="Scancode failed at %s, %s" % (file_paths,
-                                                                  e.output.decode("utf-8")))
-        finally:
-            subprocess._cleanup()
+            lines = []
+            for line in proc.stdout:
+                line = line.rstrip('\n')
+                if line:
+                    lines.append(line)
+                elif lines:
+                    yield self.__parse_scancode_cli(lines, file_paths)
+                    lines = []
 
-        output_content = ''
-        outputs_json = []
-        for line in msg.split('\n'):
-            if line == '':
-                if output_content:
-                    output_json = json.loads(output_content)[1:]
-                    outputs_json.append(output_json)
-                    output_content = ''
-            else:
-                output_content += line
+            if proc.wait() != 0:
+                raise GraalError(cause="Scancode failed at %s, %s" % (file_paths, '\n'.join(lines)))
 
-        if output_content:
-            output_json = json.loads(output_content)[1:]
-            outputs_json.append(output_json)
+            if lines:
+                yield self.__parse_scancode_cli(lines, file_paths)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
 
-        for output_json in outputs_json:
-            file_info = output_json[0]['files'][0]
-            result.append(file_info)
+    @staticmethod
+    def __parse_scancode_cli(lines, file_paths):
+        """Parse a JSON document of the output of scancode-cli"""
 
-        return result
+        content = ''.join(lines)
+        try:
+            output_json = json.loads(content)[1:]
+        except ValueError:
+            raise GraalError(cause="Scancode failed at %s, %s" % (file_paths, content))
+
+        return output_json[0]['files'][0]
 
     def analyze(self, **kwargs):
         """Add information about license
 
         :param file_path: file path (in case of scancode)
-        :param file_paths: file paths ( in case of scancode_cli for concurrent execution on files )
+        :param file_paths: file paths ( in case of scancode_cli for concurrent execution on files );
+            with scancode, the results of each file are returned indexed by path
+        :param stream: if True, a generator of the results of each file is returned (scancode_cli only)
 
         :returns result: the results of the analysis
         """
         if self.cli:
             result = self.__analyze_scancode_cli(kwargs['file_paths'])
+            if not kwargs.get('stream', False):
+                result = list(result)
+        elif 'file_paths' in kwargs:
+            if self.workers > 0:
+                result = self.__analyze_workers(kwargs['file_paths'])
+            else:
+                result = self.__analyze_scancode_files(kwargs['file_paths'])
+        elif self.workers > 0:
+            file_path = kwargs['file_path']
+            result = self.__analyze_workers([file_path])[file_path]
         else:
             result = self.__analyze_scancode(kwargs['file_path'])
 
         return result
+
+
+class ScanCodeWorker:
+    """A long-lived scancode process.
+
+    The process runs `scancode_worker.py` with the Python interpreter of
+    scancode-toolkit, thus the license index is loaded once. The paths of
+    the files are written on its standard input, and the results are read
+    from its standard output, one JSON document per line. The process is
+    started on the first scan, and restarted if it dies.
+
+    :param python_path: path of the Python interpreter of scancode-toolkit
+    """
+    def __init__(self, python_path):
+        self.python_path = python_path
+        self._proc = None
+
+    def scan(self, file_path):
+        """Scan a file
+
+        :param file_path: file path
+
+        :returns: a dict with the licenses and copyrights found
+        """
+        line = None
+        for _ in range(2):
+            if self._proc is None or self._proc.poll() is not None:
+                self.__start()
+
+            try:
+                self._proc.stdin.write(json.dumps(file_path) + '\n')
+                self._proc.stdin.flush()
+                line = self._proc.stdout.readline()
+            except OSError:
+                line = None
+
+            if line:
+                break
+
+            logger.warning("Scancode worker died at %s, restarting it" % file_path)
+            self.close()
+
+        if not line:
+            raise GraalError(cause="Scancode worker failed at %s" % file_path)
+
+        result = json.loads(line)
+        if 'error' in result:
+            raise GraalError(cause="Scancode failed at %s, %s" % (file_path, result['error']))
+
+        return result
+
+    def close(self):
+        """Terminate the process"""
+
+        if self._proc is None:
+            return
+
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self._proc.kill()
+            self._proc.wait()
+        finally:
+            self._proc.stdout.close()
+            self._proc = None
+
+    def __start(self):
+        self._proc = subprocess.Popen([self.python_path, SCANCODE_WORKER],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, universal_newlines=True)
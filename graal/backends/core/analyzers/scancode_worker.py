@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Long-lived scancode worker.
+
+This script is run by the Python interpreter of scancode-toolkit, thus the
+license index is loaded only once. It reads from the standard input the paths
+of the files to scan, as JSON strings (one per line), and writes on the standard
+output the results of each file as a JSON document (one per line), containing
+the attributes `licenses` and `copyrights`, or `error` if the scan failed.
+
+The files are scanned as done by `scancode --license --copyright`: the scanners
+are obtained from the license and copyright plugins, with the default values of
+their options, and they are run by the function scanning each file of the CLI,
+within its default timeout.
+"""
+
+import json
+import sys
+
+
+def get_scanners():
+    """Get the scanners run by the CLI with `--license --copyright`"""
+
+    from scancode import Scanner
+    from licensedcode.plugin_license import LicenseScanner
+    from cluecode.plugin_copyright import CopyrightScanner
+
+    scanners = []
+    for name, plugin_class in [('licenses', LicenseScanner), ('copyrights', CopyrightScanner)]:
+        options = {option.name: option.default for option in plugin_class.options}
+        options.update(license=True, copyright=True)
+
+        plugin = plugin_class()
+        plugin.setup(**options)
+        scanners.append(Scanner(name=name, function=plugin.get_scanner(**options)))
+
+    return scanners
+
+
+def main():
+    output = sys.stdout
+    # the messages printed by scancode must not reach the results
+    sys.stdout = sys.stderr
+
+    from scancode.cli import scan_resource
+
+    scanners = get_scanners()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+
+        file_path = json.loads(line)
+        try:
+            _, _, scan_errors, _, results, _ = scan_resource((file_path, 0), scanners)
+            if scan_errors:
+                result = {'error': '\n'.join(scan_errors)}
+            else:
+                result = {
+                    'licenses': results.get('licenses', []),
+                    'copyrights': results.get('copyrights', [])
+                }
+        except Exception as e:
+            result = {'error': str(e)}
+
+        output.write(json.dumps(result) + '\n')
+        output.flush()
+
+
+if __name__ == '__main__':
+    main()
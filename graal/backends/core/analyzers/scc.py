@@ -20,53 +20,118 @@
 #     inishchith <inishchith@gmail.com>
 #
 
+import json
+import os
 import subprocess
 
-from graal.graal import GraalRepository
+from graal.graal import (GraalError,
+                         GraalRepository)
 from .analyzer import Analyzer
 
+SCC_CHUNK_SIZE = 512
+
 
 class SCC(Analyzer):
     """A wrapper for SCC.
 
-    This class allows to call SCC over a file, parses
-    the result of the analysis and returns it as a dict.
+    This class allows to call SCC over a file, a set of files or
+    a repository, parses the result of the analysis and returns it as a dict.
     """
-    version = '0.1.0'
+    version = '0.2.0'
 
     def __init__(self):
         pass
 
-    def __analyze_file(self, message):
-        """Add information about LOC, blank and commented lines using SCC for a given file
+    @staticmethod
+    def __parse_by_file(message):
+        """Parse the JSON output of SCC by file
 
-        :param message: message from standard output after execution of SCC
-        :returns result: dict of the results of the analysis over a file
+        :param message: JSON output of the execution of SCC by file
+
+        :returns: a dict with the language and the results of each file, indexed by absolute path
         """
-        flag = False
-        results = {
-            "blanks": 0,
-            "comments": 0,
-            "loc": 0,
-            "ccn": 0
-        }
+        results = {}
+        for language in json.loads(message) or []:
+            for file_info in language.get('Files') or []:
+                location = os.path.abspath(file_info['Location'])
+                results[location] = (language['Name'], {
+                    "blanks": file_info['Blank'],
+                    "comments": file_info['Comment'],
+                    "loc": file_info['Code'],
+                    "ccn": file_info['Complexity']
+                })
 
-        for line in message.strip().split("\n"):
-            if flag:
-                if not line.startswith("────────"):
-                    file_info = line.split()[-4:]
-                    blank_lines, commented_lines, loc, complexity = map(int, file_info)
-                    results["blanks"] = blank_lines
-                    results["comments"] = commented_lines
-                    results["loc"] = loc
-                    results["ccn"] = complexity
-                    break
+        return results
 
-            if line.lower().startswith("language"):
-                flag = True
+    def __analyze_files(self, message, file_paths):
+        """Add information about LOC, blank and commented lines and code complexity
+        using SCC for a set of files
+
+        :param message: JSON output of the execution of SCC by file
+        :param file_paths: list of the file paths analyzed
+
+        :returns result: dict of the results of the analysis of each file, indexed by path
+        """
+        scc_results = self.__parse_by_file(message)
+
+        results = {}
+        for file_path in file_paths:
+            # the files not recognized by SCC are not in the output
+            _, file_results = scc_results.get(os.path.abspath(file_path), (None, {
+                "blanks": 0,
+                "comments": 0,
+                "loc": 0,
+                "ccn": 0
+            }))
+            file_results['ext'] = GraalRepository.extension(file_path)
+            results[file_path] = file_results
 
         return results
 
+    def __analyze_repository_by_file(self, repository_path, files_affected, files=None):
+        """Add information about LOC, blank and commented lines and code complexity
+        using SCC for each file of a repository, with a single execution of SCC
+
+        :param repository_path: repository path
+        :param files_affected: list of the files modified by the commit
+        :param files: if set, only these files of the repository (relative paths) are analyzed
+
+        :returns result: list of the results of the analysis of each file
+        """
+        if files is None:
+            targets = [repository_path]
+        else:
+            # as when analyzing a directory, the hidden files are skipped
+            targets = [os.path.join(repository_path, file_path) for file_path in files
+                       if not any(part.startswith('.') for part in file_path.split('/'))]
+
+        scc_results = {}
+        for i in range(0, len(targets), SCC_CHUNK_SIZE):
+            try:
+                scc_command = ['scc', '--by-file', '--format', 'json'] + targets[i:i + SCC_CHUNK_SIZE]
+                message = subprocess.check_output(scc_command).decode("utf-8")
+            except subprocess.CalledProcessError as e:
+                raise GraalError(cause="SCC failed at %s, %s" % (repository_path, e.output.decode("utf-8")))
+            finally:
+                subprocess._cleanup()
+
+            scc_results.update(self.__parse_by_file(message))
+
+        repository_path = os.path.abspath(repository_path)
+        analysis_result = []
+        for location, (language, file_results) in scc_results.items():
+            file_path = os.path.relpath(location, repository_path)
+            file_results.update({
+                'file_path': file_path,
+                'language': language,
+                'in_commit': file_path in files_affected
+            })
+            analysis_result.append(file_results)
+
+        analysis_result.sort(key=lambda file_results: file_results['file_path'])
+
+        return analysis_result
+
     def __analyze_repository(self, message):
         """Add information LOC, total files, blank, commented lines and code complexity using SCC for
            the entire repository
@@ -104,15 +169,32 @@ class SCC(Analyzer):
         """Add information using SCC
 
         :param file_path: file path
+        :param file_paths: list of file paths, analyzed with a single execution of SCC
+            (it replaces `file_path`)
         :param repository_level: set to True if analysis has to be performed on a repository
-        :returns result: dict of the results of the analysis
+        :param repository_path: repository path
+        :param files_affected: list of the files modified by the commit (repository level only)
+        :param details: if True, the repository level analysis returns the results of
+            each file instead of the ones of each language
+        :param files: paths of the files to analyze, relative to `repository_path`
+            (repository level with details only, by default all of them)
+
+        :returns result: dict of the results of the analysis; when `file_paths`
+            is set, the results of each file indexed by its path; when `details` is
+            set at repository level, a list of the results of each file
         """
         repository_level = kwargs.get('repository_level', False)
 
         if repository_level:
             file_path = kwargs['repository_path']
+            if kwargs.get('details', False):
+                return self.__analyze_repository_by_file(file_path, kwargs.get('files_affected', []),
+                                                         files=kwargs.get('files', None))
+        elif 'file_paths' in kwargs:
+            return self.__analyze_by_file(kwargs['file_paths'])
         else:
             file_path = kwargs['file_path']
+            return self.__analyze_by_file([file_path])[file_path]
 
         try:
             scc_command = ['scc', file_path]
@@ -122,10 +204,28 @@ class SCC(Analyzer):
         finally:
             subprocess._cleanup()
 
-        if repository_level:
-            results = self.__analyze_repository(message)
-        else:
-            results = self.__analyze_file(message)
-            results['ext'] = GraalRepository.extension(file_path)
+        results = self.__analyze_repository(message)
+
+        return results
+
+    def __analyze_by_file(self, file_paths):
+        """Run SCC once over a list of files, getting the results in JSON"""
+
+        results = {}
+
+        # SCC does not read the paths from a file, thus they are passed in chunks
+        # to not exceed the length of the command line
+        for i in range(0, len(file_paths), SCC_CHUNK_SIZE):
+            chunk = file_paths[i:i + SCC_CHUNK_SIZE]
+
+            try:
+                scc_command = ['scc', '--by-file', '--format', 'json'] + chunk
+                message = subprocess.check_output(scc_command).decode("utf-8")
+            except subprocess.CalledProcessError as e:
+                raise GraalError(cause="SCC failed at %s files, %s" % (len(chunk), e.output.decode("utf-8")))
+            finally:
+                subprocess._cleanup()
+
+            results.update(self.__analyze_files(message, chunk))
 
         return results
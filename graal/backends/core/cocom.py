@@ -21,14 +21,22 @@
 #     inishchith <inishchith@gmail.com>
 #
 
+import argparse
+import collections
 import logging
+import os
 
+from graal.delta import (encode,
+                         DEFAULT_KEYFRAME_INTERVAL)
 from graal.graal import (Graal,
                          GraalError,
                          GraalRepository,
                          GraalCommand,
-                         DEFAULT_WORKTREE_PATH)
+                         DEFAULT_CACHE_SIZE,
+                         DEFAULT_WORKTREE_PATH,
+                         cpu_count)
 from graal.backends.core.analyzers.cloc import Cloc
+from graal.backends.core.analyzers.linecounter import LineCounter
 from graal.backends.core.analyzers.lizard import Lizard
 from graal.backends.core.analyzers.scc import SCC
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
@@ -45,6 +53,8 @@ CATEGORY_COCOM_LIZARD_REPOSITORY = 'code_complexity_' + LIZARD_REPOSITORY
 CATEGORY_COCOM_SCC_FILE = 'code_complexity_' + SCC_FILE
 CATEGORY_COCOM_SCC_REPOSITORY = 'code_complexity_' + SCC_REPOSITORY
 
+INCREMENTAL_SNAPSHOTS_SIZE = 8
+
 logger = logging.getLogger(__name__)
 
 
@@ -78,6 +88,26 @@ class CoCom(Graal):
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
     :param details: if enable, it returns complexity data about each single function found
+        (with SCC at repository level, the data of each file instead of each language)
+    :param workers: number of processes analyzing commits in parallel
+    :param cache_path: path of the cache of the file analyses
+    :param cache_size: maximum size of the cache, in MB
+    :param blob_checkout: if enabled, the files to analyze are read from the Git
+        objects instead of checking out the whole working tree
+    :param sparse_checkout: if enabled, only the analyzed directories are checked out
+    :param resume: if enabled, the commits already emitted by a previous run are skipped
+    :param prefetch: if enabled, the next commit is checked out while the current one is analyzed
+    :param jobs: number of processes analyzing the files with Lizard (by default, the
+        number of CPUs the process can run on)
+    :param line_counter: if enabled, the blank and commented lines are counted with the
+        built-in line counter instead of CLOC
+    :param incremental: if enabled, the repository level analyses keep the results of
+        each file of the commits analyzed, and only the files modified by a commit
+        are analyzed again when the results of its parent are available
+    :param delta: if enabled, the items of the repository level analyses only contain
+        the results changed with respect to the previous item, except for the keyframes
+    :param keyframe_interval: number of items between two keyframes, which contain
+        the whole analysis
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
@@ -93,13 +123,34 @@ class CoCom(Graal):
 
     def __init__(self, uri, git_path, worktreepath=DEFAULT_WORKTREE_PATH, exec_path=None,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 workers=1, cache_path=None, cache_size=DEFAULT_CACHE_SIZE,
+                 blob_checkout=False, sparse_checkout=False, resume=False,
+                 prefetch=False, jobs=None, line_counter=False, incremental=False,
+                 delta=False, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
                  tag=None, archive=None):
         super().__init__(uri, git_path, worktreepath, exec_path=exec_path,
                          entrypoint=entrypoint, in_paths=in_paths, out_paths=out_paths, details=details,
+                         workers=workers, cache_path=cache_path, cache_size=cache_size,
+                         blob_checkout=blob_checkout, sparse_checkout=sparse_checkout,
+                         resume=resume, prefetch=prefetch,
                          tag=tag, archive=archive)
 
+        if keyframe_interval < 1:
+            raise GraalError(cause="Keyframe interval must be greater than 0")
+
+        # the worker processes can not start the pool of Lizard processes
+        if workers > 1 and jobs and jobs > 1:
+            logger.warning("Jobs ignored, the files are analyzed by a single process in each of the %s workers"
+                           % workers)
+
         self.analyzer = None
         self.analyzer_kind = None
+        self.jobs = jobs if jobs else cpu_count()
+        self.line_counter = line_counter
+        self.incremental = incremental
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self._snapshots = collections.OrderedDict()
 
     def fetch(self, category=CATEGORY_COCOM_LIZARD_FILE, paths=None,
               from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME,
@@ -121,12 +172,32 @@ class CoCom(Graal):
             raise GraalError(cause="Unknown category %s" % category)
 
         if "_file" in category:
-            self.analyzer = FileAnalyzer(self.details, self.analyzer_kind)
+            self.analyzer = FileAnalyzer(self.details, self.analyzer_kind, jobs=self.jobs,
+                                         line_counter=self.line_counter)
         else:
-            self.analyzer = RepositoryAnalyzer(self.details, self.analyzer_kind)
+            self.analyzer = RepositoryAnalyzer(self.details, self.analyzer_kind, jobs=self.jobs,
+                                               line_counter=self.line_counter)
+        self._snapshots.clear()
 
         return items
 
+    def fetch_items(self, category, **kwargs):
+        """Fetch the commits and add code complexity information, delta-encoding
+        the repository level analyses when `delta` is enabled
+
+        :param category: the category of items to fetch
+        :param kwargs: backend arguments
+
+        :returns: a generator of items
+        """
+        items = super().fetch_items(category, **kwargs)
+
+        if self.delta and self.analyzer_kind in [LIZARD_REPOSITORY, SCC_REPOSITORY]:
+            items = encode(items, self.keyframe_interval)
+
+        for item in items:
+            yield item
+
     @staticmethod
     def metadata_category(item):
         """Extracts the category from a Code item.
@@ -174,6 +245,7 @@ class CoCom(Graal):
         analysis = []
 
         if self.analyzer_kind in [LIZARD_FILE, SCC_FILE]:
+            to_analyze = []
             for committed_file in commit['files']:
 
                 file_path = committed_file['file']
@@ -209,21 +281,157 @@ class CoCom(Graal):
                     else:
                         continue
 
-                file_info = self.analyzer.analyze(local_path)
+                # the files are analyzed at once, their results are set afterwards
+                analysis.append(None)
+                to_analyze.append((len(analysis) - 1, file_path, local_path))
+
+            # the language of a file is obtained from its name (e.g., the extension),
+            # thus the files with the same content and different names are not mixed up
+            results = self._cached_analyses([local_path for _, _, local_path in to_analyze],
+                                            self.analyzer.analyze_files,
+                                            file_options=self.__file_options,
+                                            kind=self.analyzer_kind, details=self.details)
+            for i, file_path, local_path in to_analyze:
+                file_info = dict(results[local_path])
                 file_info.update({'file_path': file_path})
-                analysis.append(file_info)
+                analysis[i] = file_info
+        elif self.incremental:
+            analysis = self.__analyze_incremental(commit)
         else:
             files_affected = [file_info['file'] for file_info in commit['files']]
             analysis = self.analyzer.analyze(self.worktreepath, files_affected)
 
         return analysis
 
+    @staticmethod
+    def __file_options(local_path):
+        """Get the options of a file which alter the results of its analysis"""
+
+        return {'file_name': os.path.basename(local_path)}
+
+    def __analyze_incremental(self, commit):
+        """Analyze the files of the Git tree of a commit, reusing the results obtained
+        on its parent, when available. Merge commits and commits whose parent was not
+        analyzed are analyzed from scratch.
+
+        :param commit: a Perceval commit item
+        """
+        parents = commit.get('parents', [])
+        previous = None
+        if len(parents) == 1:
+            previous = self._snapshots.get(self.graalRepo.tree_hash(parents[0]))
+
+        if previous is None:
+            snapshot = {}
+            modified = set(self.graalRepo.tree_files(commit['commit']))
+        else:
+            # added, deleted, renamed and copied files are removed and analyzed again, if present
+            modified = set()
+            for committed_file in commit['files']:
+                modified.add(committed_file['file'])
+                if committed_file.get("newfile", None):
+                    modified.add(committed_file["newfile"])
+
+            snapshot = {file_path: row for file_path, row in previous.items() if file_path not in modified}
+
+        # the rows follow the files listed by the analysis of the whole working tree (e.g.,
+        # Lizard skips the files whose content is duplicated), thus the results are the same
+        listing = self.analyzer.source_files(self.worktreepath)
+        if listing is not None:
+            modified.update(file_path for file_path in listing if file_path not in snapshot)
+
+        present = [file_path for file_path in sorted(modified)
+                   if GraalRepository.exists(self.worktreepath + '/' + file_path)]
+        for row in self.analyzer.analyze_files(self.worktreepath, present):
+            snapshot[row['file_path']] = row
+
+        tree = self.graalRepo.tree_hash(commit['commit'])
+        self._snapshots[tree] = snapshot
+        self._snapshots.move_to_end(tree)
+        if len(self._snapshots) > INCREMENTAL_SNAPSHOTS_SIZE:
+            self._snapshots.popitem(last=False)
+
+        files_affected = [file_info['file'] for file_info in commit['files']]
+        if listing is None:
+            rows = [snapshot[file_path] for file_path in sorted(snapshot)]
+        else:
+            rows = [snapshot[file_path] for file_path in listing if file_path in snapshot]
+
+        if self.analyzer_kind == SCC_REPOSITORY and not self.details:
+            return self.__language_totals(rows)
+
+        # the rows are shared among snapshots, thus they are copied
+        return [dict(row, in_commit=row['file_path'] in files_affected) for row in rows]
+
+    @staticmethod
+    def __language_totals(rows):
+        """Sum up the results of each file by language"""
+
+        totals = {}
+        for row in rows:
+            language_totals = totals.setdefault(row['language'], {
+                "total_files": 0,
+                "blanks": 0,
+                "comments": 0,
+                "loc": 0,
+                "ccn": 0
+            })
+            language_totals['total_files'] += 1
+            for key in ['blanks', 'comments', 'loc', 'ccn']:
+                language_totals[key] += row[key]
+
+        return totals
+
+    def _analysis_scope(self):
+        """The repository level analyses depend on the whole repository"""
+
+        if self.analyzer_kind in [LIZARD_REPOSITORY, SCC_REPOSITORY]:
+            return ''
+
+        return None
+
+    def _materialize_paths(self, commit):
+        """The file level analyses only read the files modified by the commit"""
+
+        if self.analyzer_kind not in [LIZARD_FILE, SCC_FILE]:
+            return None
+
+        paths = []
+        for committed_file in commit['files']:
+            file_path = committed_file['file']
+            if self.in_paths:
+                found = [p for p in self.in_paths if file_path.endswith(p)]
+                if not found:
+                    continue
+
+            paths.append(file_path)
+            if committed_file.get("newfile", None):
+                paths.append(committed_file["newfile"])
+
+        return paths
+
+    def _reuse_analysis(self, commit, analysis):
+        """Update the files modified by the commit in a repository level analysis
+
+        :param commit: a Perceval commit item
+        :param analysis: the analysis of a commit with the same tree
+        """
+        if self.analyzer_kind == LIZARD_REPOSITORY or (self.analyzer_kind == SCC_REPOSITORY and self.details):
+            files_affected = [file_info['file'] for file_info in commit['files']]
+            for file_analysis in analysis:
+                file_analysis['in_commit'] = file_analysis['file_path'] in files_affected
+
+        return analysis
+
     def _post(self, commit):
         """Remove attributes of the Graal item obtained
 
         :param commit: a Graal commit item
         """
-        commit['files'] = [f.replace(self.worktreepath + '/', '') for f in GraalRepository.files(self.worktreepath)]
+        # the files are listed from the Git tree, skipping the hidden ones as
+        # a listing of the working tree would do
+        files = self.graalRepo.tree_files(commit['commit'])
+        commit['files'] = [f for f in files if not any(part.startswith('.') for part in f.split('/'))]
         commit.pop('refs', None)
         commit['analyzer'] = self.analyzer_kind
 
@@ -231,18 +439,27 @@ class CoCom(Graal):
 
 
 class FileAnalyzer:
-    """Class to analyse the content of files"""
+    """Class to analyse the content of files
+
+    param details: if True, it returns information about single functions
+    param kind: the analyzer kind (e.g., Lizard, SCC)
+    param jobs: number of processes analyzing the files with Lizard
+    param line_counter: if True, the blank and commented lines are counted with the
+        built-in line counter instead of CLOC
+    """
 
     ALLOWED_EXTENSIONS = ['java', 'py', 'php', 'scala', 'js', 'rb', 'cs', 'cpp', 'c', 'lua', 'go', 'swift']
     FORBIDDEN_EXTENSIONS = ['tar', 'bz2', "gz", "lz", "apk", "tbz2",
                             "lzma", "tlz", "war", "xar", "zip", "zipx"]
 
-    def __init__(self, details=False, kind=LIZARD_FILE):
+    def __init__(self, details=False, kind=LIZARD_FILE, jobs=1, line_counter=False):
         self.details = details
         self.kind = kind
+        self.jobs = jobs
 
         if self.kind == LIZARD_FILE:
-            self.cloc = Cloc()
+            # the built-in line counter returns the same results of CLOC
+            self.cloc = LineCounter() if line_counter else Cloc()
             self.lizard = Lizard()
         else:
             self.scc = SCC()
@@ -286,16 +503,62 @@ class FileAnalyzer:
 
         return file_analysis
 
+    def analyze_files(self, file_paths):
+        """Analyze the content of a set of files. When using Lizard, the blank
+        and commented lines of all the files are obtained with a single CLOC execution,
+        while the files are shared among a pool of Lizard processes. When using SCC,
+        all the files are analyzed with a single SCC execution
+
+        :param file_paths: list of file paths
+
+        :returns a dict containing the results of the analysis of each file (see `analyze`),
+            indexed by file path
+        """
+        if self.kind != LIZARD_FILE:
+            return self.scc.analyze(file_paths=file_paths)
+
+        cloc_analyses = self.cloc.analyze(file_paths=file_paths)
+
+        lizard_paths = [file_path for file_path in file_paths
+                        if GraalRepository.extension(file_path) in self.ALLOWED_EXTENSIONS]
+        lizard_analyses = self.lizard.analyze(file_paths=lizard_paths, details=self.details, jobs=self.jobs)
+
+        results = {}
+        for file_path in file_paths:
+            cloc_analysis = cloc_analyses[file_path]
+
+            if file_path not in lizard_analyses:
+                results[file_path] = cloc_analysis
+                continue
+
+            file_analysis = lizard_analyses[file_path]
+            file_analysis['blanks'] = cloc_analysis['blanks']
+            file_analysis['comments'] = cloc_analysis['comments']
+            results[file_path] = file_analysis
+
+        return results
+
+    def close(self):
+        """Release the processes used by the analyzers"""
+
+        if self.kind == LIZARD_FILE:
+            self.lizard.close()
+
 
 class RepositoryAnalyzer:
     """Class to analyse the content of a repository
 
     param kind: the analyzer kind (e.g., Lizard, SCC)
+    param jobs: number of processes analyzing the files (Lizard only)
+    param line_counter: if True, the blank and commented lines are counted with the
+        built-in line counter instead of CLOC (Lizard only)
     """
 
-    def __init__(self, details=False, kind=LIZARD_REPOSITORY):
+    def __init__(self, details=False, kind=LIZARD_REPOSITORY, jobs=1, line_counter=False):
         self.details = details
         self.kind = kind
+        self.jobs = jobs
+        self.line_counter = line_counter
 
         if kind == LIZARD_REPOSITORY:
             self.analyzer = Lizard()
@@ -327,11 +590,63 @@ class RepositoryAnalyzer:
             'files_affected': files_affected,
             'details': self.details
         }
+        if self.kind == LIZARD_REPOSITORY:
+            kwargs['jobs'] = self.jobs
+            kwargs['line_counter'] = self.line_counter
+
+        repository_analysis = self.analyzer.analyze(**kwargs)
+
+        return repository_analysis
+
+    def analyze_files(self, repository_path, file_paths):
+        """Analyze a set of files of a repository using SCC or Lizard. The files
+        not supported by the analyzer are skipped.
+
+        :param repository_path: repository path
+        :param file_paths: paths of the files to analyze, relative to `repository_path`
+
+        :returns a list containing the results of the analysis of each file
+            (see `analyze`), without the attribute `in_commit`
+        """
+        kwargs = {
+            'repository_path': repository_path,
+            'repository_level': True,
+            'files_affected': [],
+            'details': True,
+            'files': file_paths
+        }
+        if self.kind == LIZARD_REPOSITORY:
+            kwargs['details'] = self.details
+            kwargs['jobs'] = self.jobs
+            kwargs['line_counter'] = self.line_counter
 
         repository_analysis = self.analyzer.analyze(**kwargs)
+        for file_analysis in repository_analysis:
+            file_analysis.pop('in_commit', None)
 
         return repository_analysis
 
+    def source_files(self, repository_path):
+        """List the files of a repository included in the analysis of the whole
+        repository, in the order they are analyzed. Lizard skips the files whose
+        content is duplicated, while SCC analyzes all the files.
+
+        :param repository_path: repository path
+
+        :returns: the paths of the files relative to `repository_path`, or None
+            when all the files are included
+        """
+        if self.kind == LIZARD_REPOSITORY:
+            return self.analyzer.source_files(repository_path)
+
+        return None
+
+    def close(self):
+        """Release the processes used by the analyzers"""
+
+        if self.kind == LIZARD_REPOSITORY:
+            self.analyzer.close()
+
 
 class CoComCommand(GraalCommand):
     """Class to run CoCom backend from the command line."""
@@ -344,4 +659,32 @@ class CoComCommand(GraalCommand):
 
         parser = GraalCommand.setup_cmd_parser(cls.BACKEND)
 
+        group = parser.parser.add_argument_group('CoCom arguments')
+        group.add_argument('--jobs', dest='jobs',
+                           type=int, default=None,
+                           help="Number of processes analyzing the files with Lizard (default: number of CPUs available)")
+        group.add_argument('--line-counter', dest='line_counter',
+                           action='store_true', default=False,
+                           help="Count blank and commented lines with the built-in line counter instead of CLOC")
+        group.add_argument('--incremental', dest='incremental',
+                           action='store_true', default=False,
+                           help="Analyze at repository level only the files modified by each commit")
+        group.add_argument('--delta', dest='delta',
+                           action='store_true', default=False,
+                           help="Output at repository level only the results changed since the previous item")
+        group.add_argument('--keyframe-interval', dest='keyframe_interval',
+                           type=_keyframe_interval, default=DEFAULT_KEYFRAME_INTERVAL,
+                           help="Number of items between two items with the whole analysis (default: %s)"
+                                % DEFAULT_KEYFRAME_INTERVAL)
+
         return parser
+
+
+def _keyframe_interval(value):
+    """Parse the number of items between two keyframes, which must be positive"""
+
+    interval = int(value)
+    if interval < 1:
+        raise argparse.ArgumentTypeError("must be greater than 0")
+
+    return interval
@@ -28,10 +28,12 @@ from graal.graal import (Graal,
                          GraalCommand,
                          GraalError,
                          GraalRepository,
+                         DEFAULT_CACHE_SIZE,
                          DEFAULT_WORKTREE_PATH)
 from graal.backends.core.analyzers.analyzer import Analyzer
-from graal.backends.core.analyzers.jadolint import Jadolint, DEPENDENCIES
+from graal.backends.core.analyzers.jadolint import Jadolint, DEPENDENCIES, SMELLS
 from graal.backends.core.analyzers.reverse import Reverse
+from graal.backends.core.coqua import CoQua, CATEGORY_COQUA_JADOLINT
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
 
 PYREVERSE = 'pyreverse'
@@ -57,6 +59,21 @@ class CoDep(Graal):
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
     :param details: if enable, it returns fine-grained results
+    :param workers: number of processes analyzing commits in parallel
+    :param cache_path: path of the cache of the file analyses
+    :param cache_size: maximum size of the cache, in MB
+    :param blob_checkout: if enabled, the files to analyze are read from the Git
+        objects instead of checking out the whole working tree
+    :param sparse_checkout: if enabled, only the analyzed directories are checked out
+    :param resume: if enabled, the commits already emitted by a previous run are skipped
+    :param prefetch: if enabled, the next commit is checked out while the current one is analyzed
+    :param jobs: number of files of a commit analyzed at the same time by Jadolint
+    :param jadolint_host: if enabled, Jadolint is run by long-lived JVMs instead of
+        launching a JVM for each file (Java 11 or later is required)
+    :param jadolint_combined: if enabled, the dependencies and the smells of the Dockerfiles
+        are obtained on the same checkout, and each commit is returned as a CoDep item with
+        the dependencies and a CoQua item with the smells. It implies `jadolint_host`, thus
+        both analyses of a file are performed by a single request to a long-lived JVM
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
@@ -69,13 +86,23 @@ class CoDep(Graal):
 
     def __init__(self, uri, git_path, worktreepath=DEFAULT_WORKTREE_PATH, exec_path=None,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 workers=1, cache_path=None, cache_size=DEFAULT_CACHE_SIZE,
+                 blob_checkout=False, sparse_checkout=False, resume=False,
+                 prefetch=False, jobs=1, jadolint_host=False, jadolint_combined=False,
                  tag=None, archive=None):
         super().__init__(uri, git_path, worktreepath, exec_path=exec_path,
                          entrypoint=entrypoint, in_paths=in_paths, out_paths=out_paths, details=details,
+                         workers=workers, cache_path=cache_path, cache_size=cache_size,
+                         blob_checkout=blob_checkout, sparse_checkout=sparse_checkout,
+                         resume=resume, prefetch=prefetch,
                          tag=tag, archive=archive)
 
         self.analyzer_kind = None
         self.analyzer = None
+        self.jobs = jobs
+        # the combined analysis would launch two JVMs per file without the long-lived ones
+        self.jadolint_host = jadolint_host or jadolint_combined
+        self.jadolint_combined = jadolint_combined
 
     def fetch(self, category=CATEGORY_CODEP_PYREVERSE, paths=None,
               from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME,
@@ -93,7 +120,9 @@ class CoDep(Graal):
             self.analyzer = PyreverseAnalyzer()
         elif category == CATEGORY_CODEP_JADOLINT:
             self.analyzer_kind = JADOLINT
-            self.analyzer = JadolintAnalyzer(self.exec_path, analysis=DEPENDENCIES)
+            analysis = [DEPENDENCIES, SMELLS] if self.jadolint_combined else DEPENDENCIES
+            self.analyzer = JadolintAnalyzer(self.exec_path, analysis=analysis,
+                                             jadolint_host=self.jadolint_host)
         else:
             raise GraalError(cause="Unknown category %s" % category)
 
@@ -101,8 +130,33 @@ class CoDep(Graal):
                               from_date=from_date, to_date=to_date,
                               branches=branches, latest_items=latest_items)
 
+        if category == CATEGORY_CODEP_JADOLINT and self.jadolint_combined:
+            items = self.__split_items(items)
+
         return items
 
+    @staticmethod
+    def __split_items(items):
+        """Split the items with dependencies and smells into a CoDep item
+        and a CoQua item, like the ones returned by the two backends"""
+
+        for item in items:
+            analysis = item['data']['analysis']
+
+            smells_item = dict(item)
+            smells_item['backend_name'] = CoQua.__name__
+            smells_item['backend_version'] = CoQua.version
+            smells_item['category'] = CATEGORY_COQUA_JADOLINT
+            smells_item['data'] = dict(item['data'])
+            smells_item['data']['analysis'] = {file_path: {SMELLS: results[SMELLS]}
+                                               for file_path, results in analysis.items()}
+
+            item['data']['analysis'] = {file_path: {DEPENDENCIES: results[DEPENDENCIES]}
+                                        for file_path, results in analysis.items()}
+
+            yield item
+            yield smells_item
+
     @staticmethod
     def metadata_category(item):
         """Extracts the category from a Code item.
@@ -152,6 +206,7 @@ class CoDep(Graal):
 
             analysis = self.analyzer.analyze(module_path)
         else:
+            files_to_process = []
             for committed_file in commit['files']:
                 file_path = committed_file['file']
                 if self.in_paths:
@@ -161,14 +216,66 @@ class CoDep(Graal):
 
                 local_path = self.worktreepath + '/' + file_path
                 if not GraalRepository.exists(local_path):
-                    analysis.update({file_path: {DEPENDENCIES: []}})
+                    results = {DEPENDENCIES: [], SMELLS: []} if self.jadolint_combined else {DEPENDENCIES: []}
+                    analysis.update({file_path: results})
                     continue
 
-                dependencies = self.analyzer.analyze(local_path)
-                analysis.update({file_path: dependencies})
+                analysis.update({file_path: None})
+                files_to_process.append((file_path, local_path))
+
+            # Jadolint is run on `jobs` files at the same time
+            local_paths = [path[1] for path in files_to_process]
+            analyses = self._map_files(self.__analyze_dependencies, local_paths, self.jobs)
+            for (file_path, _), dependencies in zip(files_to_process, analyses):
+                analysis[file_path] = dependencies
 
         return analysis
 
+    def __analyze_dependencies(self, local_path):
+        """Get the dependencies of a file, reusing the ones obtained on a file with the same content"""
+
+        if not self.jadolint_combined:
+            return self._cached_analysis(local_path, self.analyzer.analyze, analysis=DEPENDENCIES)
+
+        file_path = local_path[len(self.worktreepath) + 1:]
+
+        # the smells refer to the file path, which is part of the cache key
+        return self._cached_analysis(local_path, self.__analyze_combined,
+                                     analysis=[DEPENDENCIES, SMELLS], file_path=file_path)
+
+    def __analyze_combined(self, local_path):
+        """Get the dependencies and the smells of a Dockerfile with a single
+        Jadolint pass, removing the working tree path from the smells"""
+
+        results = self.analyzer.analyze(local_path)
+        results[SMELLS] = [smell.replace(self.worktreepath, '') for smell in results[SMELLS]]
+
+        return results
+
+    def _analysis_options(self):
+        """The combined analysis returns the smells along with the dependencies"""
+
+        return {'jadolint_combined': self.jadolint_combined}
+
+    def _analysis_scope(self):
+        """Pyreverse analyzes the entrypoint, while Jadolint
+        analyzes the files modified by the commit"""
+
+        if self.analyzer_kind == PYREVERSE:
+            return self.entrypoint
+
+        return None
+
+    def _materialize_paths(self, commit):
+        """Jadolint only reads the files modified by the commit, while
+        Pyreverse needs the whole working tree"""
+
+        if self.analyzer_kind == PYREVERSE:
+            return None
+
+        return [f['file'] for f in commit['files']
+                if not self.in_paths or any(f['file'].endswith(p) for p in self.in_paths)]
+
     def _post(self, commit):
         """Remove attributes of the Graal item obtained
 
@@ -210,10 +317,15 @@ class PyreverseAnalyzer(Analyzer):
 
 
 class JadolintAnalyzer(Analyzer):
-    """Class to obtain a list of dependencies extracted from Dockerfiles."""
+    """Class to obtain a list of dependencies extracted from Dockerfiles.
+
+    :param exec_path: path of the Jadolint jar
+    :param analysis: the analysis to perform, or a list of them
+    :param jadolint_host: if True, Jadolint is run by long-lived JVMs
+    """
 
-    def __init__(self, exec_path, analysis=DEPENDENCIES):
-        self.analyzer = Jadolint(exec_path, analysis=analysis)
+    def __init__(self, exec_path, analysis=DEPENDENCIES, jadolint_host=False):
+        self.analyzer = Jadolint(exec_path, analysis=analysis, host=jadolint_host)
 
     def analyze(self, file_path):
         """Analyze the content of a Python project using Jadolint
@@ -230,6 +342,11 @@ class JadolintAnalyzer(Analyzer):
 
         return analysis
 
+    def close(self):
+        """Terminate the long-lived JVMs running Jadolint"""
+
+        self.analyzer.close()
+
 
 class CoDepCommand(GraalCommand):
     """Class to run CoDep backend from the command line."""
@@ -242,4 +359,18 @@ class CoDepCommand(GraalCommand):
 
         parser = GraalCommand.setup_cmd_parser(cls.BACKEND)
 
+        group = parser.parser.add_argument_group('CoDep arguments')
+        group.add_argument('--jobs', dest='jobs',
+                           type=int, default=1,
+                           help="Number of files of a commit analyzed at the same time by Jadolint")
+        group.add_argument('--jadolint-host', dest='jadolint_host',
+                           action='store_true',
+                           help="Run Jadolint with long-lived JVMs (requires Java 11 or later)")
+        group.add_argument('--jadolint-combined', dest='jadolint_combined',
+                           action='store_true',
+                           help="Get the dependencies and the smells of the Dockerfiles at once, "
+                                "returning CoDep and CoQua items. It implies --jadolint-host, since "
+                                "both analyses of a file are performed by a single request to a "
+                                "long-lived JVM (requires Java 11 or later)")
+
         return parser
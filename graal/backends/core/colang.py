@@ -25,9 +25,11 @@ import logging
 from graal.graal import (Graal,
                          GraalCommand,
                          GraalError,
+                         DEFAULT_CACHE_SIZE,
                          DEFAULT_WORKTREE_PATH)
 from graal.backends.core.analyzers.linguist import Linguist
 from graal.backends.core.analyzers.cloc import Cloc
+from graal.backends.core.analyzers.linecounter import LineCounter
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
 
 CLOC = "cloc"
@@ -53,6 +55,16 @@ class CoLang(Graal):
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
     :param details: if enable, it returns fine-grained results
+    :param workers: number of processes analyzing commits in parallel
+    :param cache_path: path of the cache of the file analyses
+    :param cache_size: maximum size of the cache, in MB
+    :param blob_checkout: if enabled, the files to analyze are read from the Git
+        objects instead of checking out the whole working tree
+    :param sparse_checkout: if enabled, only the analyzed directories are checked out
+    :param resume: if enabled, the commits already emitted by a previous run are skipped
+    :param prefetch: if enabled, the next commit is checked out while the current one is analyzed
+    :param line_counter: if enabled, the lines are counted with the built-in line counter
+        instead of CLOC
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
@@ -65,14 +77,26 @@ class CoLang(Graal):
 
     def __init__(self, uri, git_path, worktreepath=DEFAULT_WORKTREE_PATH, exec_path=None,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 workers=1, cache_path=None, cache_size=DEFAULT_CACHE_SIZE,
+                 blob_checkout=False, sparse_checkout=False, resume=False,
+                 prefetch=False, line_counter=False,
                  tag=None, archive=None):
         super().__init__(uri, git_path, worktreepath, exec_path=exec_path,
                          entrypoint=entrypoint, in_paths=in_paths, out_paths=out_paths, details=details,
+                         workers=workers, cache_path=cache_path, cache_size=cache_size,
+                         blob_checkout=blob_checkout, sparse_checkout=sparse_checkout,
+                         resume=resume, prefetch=prefetch,
                          tag=tag, archive=archive)
 
-        self.repository_path = self.worktreepath
         self.analyzer_kind = None
         self.analyzer = None
+        self.line_counter = line_counter
+
+    @property
+    def repository_path(self):
+        """Path of the repository to analyze"""
+
+        return self.worktreepath
 
     def fetch(self, category=CATEGORY_COLANG_LINGUIST, paths=None,
               from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME,
@@ -86,7 +110,8 @@ class CoLang(Graal):
         else:
             raise GraalError(cause="Unknown category %s" % category)
 
-        self.repository_analyzer = RepositoryAnalyzer(self.details, self.analyzer_kind)
+        self.repository_analyzer = RepositoryAnalyzer(self.details, self.analyzer_kind,
+                                                      line_counter=self.line_counter)
 
         items = super().fetch(category, branches=branches, latest_items=latest_items)
 
@@ -126,6 +151,16 @@ class CoLang(Graal):
 
         return analysis
 
+    def _analysis_scope(self):
+        """The whole repository is analyzed"""
+
+        return ''
+
+    def _analysis_options(self):
+        """The lines are counted either by CLOC or by the built-in line counter"""
+
+        return {'line_counter': self.line_counter}
+
     def _post(self, commit):
         """Remove attributes of the Graal item obtained
 
@@ -143,14 +178,17 @@ class RepositoryAnalyzer:
 
     :params details: if enable, it returns fine-grained results
     :param kind: the analyzer kind (e.g., LINGUIST, CLOC)
+    :param line_counter: if True, the built-in line counter is used instead of CLOC
     """
 
-    def __init__(self, details=False, kind=LINGUIST):
+    def __init__(self, details=False, kind=LINGUIST, line_counter=False):
         self.details = details
         self.kind = kind
 
         if kind == LINGUIST:
             self.analyzer = Linguist()
+        elif line_counter:
+            self.analyzer = LineCounter()
         else:
             self.analyzer = Cloc()
 
@@ -189,4 +227,9 @@ class CoLangCommand(GraalCommand):
 
         parser = GraalCommand.setup_cmd_parser(cls.BACKEND)
 
+        group = parser.parser.add_argument_group('CoLang arguments')
+        group.add_argument('--line-counter', dest='line_counter',
+                           action='store_true', default=False,
+                           help="Count lines with the built-in line counter instead of CLOC")
+
         return parser
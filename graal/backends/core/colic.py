@@ -22,13 +22,17 @@
 #
 
 import logging
+import mmap
 import os
+import re
 
 from graal.graal import (Graal,
                          GraalError,
                          GraalRepository,
                          GraalCommand,
+                         DEFAULT_CACHE_SIZE,
                          DEFAULT_WORKTREE_PATH)
+from graal.cache import DEFAULT_SHARED_CACHE_PATH
 from graal.backends.core.analyzers.nomos import Nomos
 from graal.backends.core.analyzers.scancode import ScanCode
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
@@ -41,6 +45,18 @@ CATEGORY_COLIC_NOMOS = 'code_license_' + NOMOS
 CATEGORY_COLIC_SCANCODE = 'code_license_' + SCANCODE
 CATEGORY_COLIC_SCANCODE_CLI = 'code_license_' + SCANCODE_CLI
 
+DEFAULT_PREFILTER_MAX_SIZE = 1024
+PREFILTER_WINDOW = 64 * 1024
+PREFILTER_BINARY_WINDOW = 8000
+
+BINARY = 'binary'
+TOO_LARGE = 'too_large'
+NO_SIGNALS = 'no_signals'
+
+LICENSE_SIGNALS = re.compile(rb'licen[cs]|copyright|copr\.|\(c\)|\xc2\xa9|spdx|all rights reserved|'
+                             rb'redistribut|permission is hereby granted|public domain|warrant',
+                             re.IGNORECASE)
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,6 +73,29 @@ class CoLic(Graal):
     :param entrypoint: the entrypoint of the analysis
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
+    :param workers: number of processes analyzing commits in parallel
+    :param cache_path: path of the cache of the file analyses
+    :param cache_size: maximum size of the cache, in MB
+    :param blob_checkout: if enabled, the files to analyze are read from the Git
+        objects instead of checking out the whole working tree
+    :param sparse_checkout: if enabled, only the analyzed directories are checked out
+    :param resume: if enabled, the commits already emitted by a previous run are skipped
+    :param prefetch: if enabled, the next commit is checked out while the current one is analyzed
+    :param scancode_workers: number of long-lived scancode processes scanning the files,
+        which load the license index once (by default, a scancode process is launched
+        for the files of each commit)
+    :param scancode_processes: number of processes used by scancode to scan the files
+        of a commit (SCANCODE only, when no long-lived scancode processes are used)
+    :param shared_cache: if enabled and `cache_path` is not set, the results are stored
+        in a cache shared by all the executions on the host (`DEFAULT_SHARED_CACHE_PATH`),
+        thus the files with the same content are analyzed once across repositories
+        (NOMOS and SCANCODE only)
+    :param prefilter: if enabled, the files that can not contain license or copyright
+        information (binaries, files larger than `prefilter_max_size` and files without
+        any license keyword) get an empty result without running the analyzer
+    :param prefilter_max_size: maximum size of the files analyzed when `prefilter` is
+        enabled, in KB
+    :param jobs: number of files of a commit analyzed at the same time by Nomos
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
@@ -71,9 +110,19 @@ class CoLic(Graal):
 
     def __init__(self, uri, git_path, worktreepath=DEFAULT_WORKTREE_PATH, exec_path=None,
                  entrypoint=None, in_paths=None, out_paths=None,
+                 workers=1, cache_path=None, cache_size=DEFAULT_CACHE_SIZE,
+                 blob_checkout=False, sparse_checkout=False, resume=False,
+                 prefetch=False, scancode_workers=0, scancode_processes=1, shared_cache=False,
+                 prefilter=False, prefilter_max_size=DEFAULT_PREFILTER_MAX_SIZE, jobs=1,
                  tag=None, archive=None):
+        if shared_cache and not cache_path:
+            cache_path = DEFAULT_SHARED_CACHE_PATH
+
         super().__init__(uri, git_path, worktreepath, exec_path=exec_path,
                          entrypoint=entrypoint, in_paths=in_paths, out_paths=out_paths,
+                         workers=workers, cache_path=cache_path, cache_size=cache_size,
+                         blob_checkout=blob_checkout, sparse_checkout=sparse_checkout,
+                         resume=resume, prefetch=prefetch,
                          tag=tag, archive=archive)
 
         if not GraalRepository.exists(exec_path):
@@ -81,6 +130,12 @@ class CoLic(Graal):
 
         self.analyzer_kind = None
         self.analyzer = None
+        self.scancode_workers = scancode_workers
+        self.scancode_processes = scancode_processes
+        self.shared_cache = shared_cache
+        self.prefilter = LicensePrefilter(prefilter_max_size) if prefilter else None
+        self.prefilter_stats = {}
+        self.jobs = jobs
 
     def fetch(self, category=CATEGORY_COLIC_NOMOS, paths=None,
               from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME,
@@ -96,7 +151,11 @@ class CoLic(Graal):
         else:
             raise GraalError(cause="Unknown category %s" % category)
 
-        self.analyzer = LicenseAnalyzer(self.exec_path, self.analyzer_kind)
+        self.analyzer = LicenseAnalyzer(self.exec_path, self.analyzer_kind,
+                                        scancode_workers=self.scancode_workers,
+                                        scancode_processes=self.scancode_processes)
+
+        self.prefilter_stats = {}
 
         items = super().fetch(category,
                               from_date=from_date, to_date=to_date,
@@ -104,6 +163,29 @@ class CoLic(Graal):
 
         return items
 
+    def fetch_items(self, category, **kwargs):
+        """Fetch the commits and add license information, counting the files
+        skipped by the prefilter when it is enabled
+
+        :param category: the category of items to fetch
+        :param kwargs: backend arguments
+
+        :returns: a generator of items
+        """
+        items = super().fetch_items(category, **kwargs)
+
+        for item in items:
+            if self.prefilter:
+                for license_info in item['analysis']:
+                    reason = license_info.get('prefiltered', None)
+                    if reason:
+                        self.prefilter_stats[reason] = self.prefilter_stats.get(reason, 0) + 1
+            yield item
+
+        if self.prefilter:
+            logger.info("Prefilter: %s files skipped (%s)", sum(self.prefilter_stats.values()),
+                        ', '.join('%s: %s' % (reason, n) for reason, n in sorted(self.prefilter_stats.items())))
+
     @staticmethod
     def metadata_category(item):
         """Extracts the category from a Code item.
@@ -161,21 +243,111 @@ class CoLic(Graal):
             if not GraalRepository.exists(local_path) or os.path.isdir(local_path) or os.path.islink(local_path):
                 continue
 
-            if self.analyzer_kind == NOMOS or self.analyzer_kind == SCANCODE:
-                license_info = self.analyzer.analyze(local_path)
-                license_info.update({'file_path': file_path})
-                analysis.append(license_info)
-            elif self.analyzer_kind == SCANCODE_CLI:
-                files_to_process.append((file_path, local_path))
+            files_to_process.append((file_path, local_path))
+
+        if not files_to_process:
+            return analysis
+
+        skipped = {}
+        if self.prefilter:
+            for _, local_path in files_to_process:
+                reason = self.prefilter.screen(local_path)
+                if reason:
+                    skipped[local_path] = reason
+
+        # the items follow the order of the files in the commit
+        positions = {}
+        for position, (file_path, local_path) in enumerate(files_to_process):
+            license_info = None
+            if local_path in skipped:
+                license_info = self.analyzer.empty_result()
+                license_info['prefiltered'] = skipped[local_path]
+                license_info['file_path'] = file_path
+            else:
+                positions[local_path] = position
+            analysis.append(license_info)
+
+        local_paths = list(positions)
+        if self.analyzer_kind == SCANCODE_CLI:
+            # the results are read while scancode_cli is scanning the files
+            results = self.__stream_files(local_paths)
+        else:
+            # the files are analyzed at once, skipping the ones found in the cache
+            results = self._cached_analyses(local_paths, self.__analyze_files,
+                                            kind=self.analyzer_kind).items()
 
-        if files_to_process:
-            local_paths = [path[1] for path in files_to_process]
-            analysis = self.analyzer.analyze(local_paths)
-            for i in range(len(analysis)):
-                analysis[i]['file_path'] = files_to_process[i][0]
+        for local_path, result in results:
+            position = positions[local_path]
+            license_info = dict(result)
+            license_info['file_path'] = files_to_process[position][0]
+            analysis[position] = license_info
 
         return analysis
 
+    def __stream_files(self, local_paths):
+        """Yield the results of scancode_cli as soon as each file is scanned.
+
+        The results are matched to the files by their `path`, which scancode_cli
+        reports either in full or relative to the scanned file (i.e., its name);
+        a relative path matches the first file requested not yet reported that
+        ends with it. An error is raised when scancode_cli reports a file not
+        requested or misses one of them.
+
+        :param local_paths: paths of the files to analyze
+
+        :returns: generator of the pairs of file path and result
+        """
+        if not local_paths:
+            return
+
+        pending = list(local_paths)
+        for result in self.analyzer.analyze(local_paths, stream=True):
+            local_path = self.__requested_path(pending, result.get('path', ''))
+            if local_path is None:
+                cause = "Scancode returned an unexpected result for %s" % result.get('path')
+                raise GraalError(cause=cause)
+
+            pending.remove(local_path)
+            yield local_path, result
+
+        if pending:
+            cause = "Scancode returned no result for %s" % ', '.join(sorted(pending))
+            raise GraalError(cause=cause)
+
+    @staticmethod
+    def __requested_path(local_paths, path):
+        """Find the file requested reported with `path`, or None if there is no such file"""
+
+        path = os.path.normpath(path)
+        for local_path in local_paths:
+            if os.path.normpath(local_path) == path:
+                return local_path
+
+        if os.path.isabs(path) or path == os.curdir:
+            return None
+
+        for local_path in local_paths:
+            if os.path.normpath(local_path).endswith(os.sep + path):
+                return local_path
+
+        return None
+
+    def __analyze_files(self, local_paths):
+        """Analyze a set of files. Scancode analyzes all of them at once, while
+        Nomos is run on `jobs` files at the same time"""
+
+        if self.analyzer_kind == NOMOS:
+            analyses = self._map_files(self.analyzer.analyze, local_paths, self.jobs)
+            return dict(zip(local_paths, analyses))
+
+        return self.analyzer.analyze_files(local_paths)
+
+    def _materialize_paths(self, commit):
+        """License analyzers only read the files modified by the commit"""
+
+        return [f['file'] for f in commit['files']
+                if not self.in_paths or any(f['file'].endswith(p) for p in self.in_paths)]
+
     def _post(self, commit):
         """Remove attributes of the Graal item obtained
 
@@ -193,22 +365,26 @@ class LicenseAnalyzer:
 
     :param exec_path: path of the license analyzer executable
     :param kind: the analyzer kind (e.g., NOMOS, SCANCODE, SCANCODE_CLI)
+    :param scancode_workers: number of long-lived scancode processes (SCANCODE only)
+    :param scancode_processes: number of processes used by scancode to scan a set of files
+        (SCANCODE only)
     """
 
-    def __init__(self, exec_path, kind=NOMOS):
+    def __init__(self, exec_path, kind=NOMOS, scancode_workers=0, scancode_processes=1):
         self.kind = kind
         if kind == SCANCODE:
-            self.analyzer = ScanCode(exec_path)
+            self.analyzer = ScanCode(exec_path, workers=scancode_workers, processes=scancode_processes)
         elif kind == SCANCODE_CLI:
             self.analyzer = ScanCode(exec_path, cli=True)
         else:
             self.analyzer = Nomos(exec_path)
 
-    def analyze(self, file_path):
+    def analyze(self, file_path, stream=False):
         """Analyze the content of a file using Nomos/Scancode
 
         :param file_path: file path (in case of scancode)
         :param file_paths: file paths ( in case of scancode_cli for concurrent execution on files )
+        :param stream: if True, a generator of the results of each file is returned (scancode_cli only)
 
         :returns a dict containing the results of the analysis, like the one below
         {
@@ -217,7 +393,7 @@ class LicenseAnalyzer:
         }
         """
         if self.kind == SCANCODE_CLI:
-            kwargs = {'file_paths': file_path}
+            kwargs = {'file_paths': file_path, 'stream': stream}
         else:
             kwargs = {'file_path': file_path}
 
@@ -225,6 +401,80 @@ class LicenseAnalyzer:
 
         return analysis
 
+    def analyze_files(self, file_paths):
+        """Analyze the content of a set of files using Nomos/Scancode
+
+        :param file_paths: list of file paths
+
+        :returns a dict containing the results of the analysis of each file (see `analyze`),
+            indexed by file path
+        """
+        if self.kind == SCANCODE:
+            return self.analyzer.analyze(file_paths=file_paths)
+
+        return {file_path: self.analyze(file_path) for file_path in file_paths}
+
+    def empty_result(self):
+        """Get the result of a file without license and copyright information"""
+
+        if self.kind == NOMOS:
+            return {'licenses': []}
+
+        return {'licenses': [], 'copyrights': []}
+
+    def close(self):
+        """Release the processes used by the analyzer"""
+
+        if self.kind == SCANCODE:
+            self.analyzer.close()
+
+
+class LicensePrefilter:
+    """Cheap screening of the files to analyze.
+
+    The files that can not produce license or copyright results are
+    spotted without running the license analyzers: binary files (i.e.,
+    containing NUL bytes at the beginning), files larger than `max_size`
+    and files whose head and tail do not contain any license keyword.
+    The content of the files is memory-mapped, thus only the windows
+    searched are read.
+
+    :param max_size: maximum size of the files to analyze, in KB
+    """
+    def __init__(self, max_size=DEFAULT_PREFILTER_MAX_SIZE):
+        self.max_size = max_size * 1024
+
+    def screen(self, file_path):
+        """Check whether a file has to be analyzed
+
+        :param file_path: file path
+
+        :returns: None if the file has to be analyzed, otherwise the reason
+            to skip it (i.e., BINARY, TOO_LARGE or NO_SIGNALS)
+        """
+        try:
+            with open(file_path, 'rb') as fd:
+                size = os.fstat(fd.fileno()).st_size
+                if size == 0:
+                    return NO_SIGNALS
+                if size > self.max_size:
+                    return TOO_LARGE
+
+                with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if mm.find(b'\0', 0, PREFILTER_BINARY_WINDOW) != -1:
+                        return BINARY
+
+                    if size <= 2 * PREFILTER_WINDOW:
+                        found = LICENSE_SIGNALS.search(mm)
+                    else:
+                        found = LICENSE_SIGNALS.search(mm, 0, PREFILTER_WINDOW) or \
+                            LICENSE_SIGNALS.search(mm, size - PREFILTER_WINDOW)
+        except OSError:
+            # the analyzer will report the errors
+            return None
+
+        return None if found else NO_SIGNALS
+
 
 class CoLicCommand(GraalCommand):
     """Class to run CoLic backend from the command line."""
@@ -237,4 +487,24 @@ class CoLicCommand(GraalCommand):
 
         parser = GraalCommand.setup_cmd_parser(cls.BACKEND)
 
+        group = parser.parser.add_argument_group('CoLic arguments')
+        group.add_argument('--scancode-workers', dest='scancode_workers',
+                           type=int, default=0,
+                           help="Number of long-lived scancode processes scanning the files")
+        group.add_argument('--scancode-processes', dest='scancode_processes',
+                           type=int, default=1,
+                           help="Number of processes used by scancode to scan the files of a commit")
+        group.add_argument('--shared-cache', dest='shared_cache',
+                           action='store_true',
+                           help="Store the results in the cache shared by all the executions on the host")
+        group.add_argument('--jobs', dest='jobs',
+                           type=int, default=1,
+                           help="Number of files of a commit analyzed at the same time by Nomos")
+        group.add_argument('--prefilter', dest='prefilter',
+                           action='store_true',
+                           help="Skip the files without license signals (binaries, large files, no keywords)")
+        group.add_argument('--prefilter-max-size', dest='prefilter_max_size',
+                           type=int, default=DEFAULT_PREFILTER_MAX_SIZE,
+                           help="Maximum size of the files analyzed with the prefilter, in KB")
+
         return parser
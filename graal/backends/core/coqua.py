@@ -28,6 +28,7 @@ from graal.graal import (Graal,
                          GraalCommand,
                          GraalError,
                          GraalRepository,
+                         DEFAULT_CACHE_SIZE,
                          DEFAULT_WORKTREE_PATH)
 from graal.backends.core.analyzers.analyzer import Analyzer
 from graal.backends.core.analyzers.pylint import PyLint
@@ -60,6 +61,17 @@ class CoQua(Graal):
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
     :param details: if enable, it returns fine-grained results
+    :param workers: number of processes analyzing commits in parallel
+    :param cache_path: path of the cache of the file analyses
+    :param cache_size: maximum size of the cache, in MB
+    :param blob_checkout: if enabled, the files to analyze are read from the Git
+        objects instead of checking out the whole working tree
+    :param sparse_checkout: if enabled, only the analyzed directories are checked out
+    :param resume: if enabled, the commits already emitted by a previous run are skipped
+    :param prefetch: if enabled, the next commit is checked out while the current one is analyzed
+    :param jobs: number of files of a commit analyzed at the same time by Jadolint
+    :param jadolint_host: if enabled, Jadolint is run by long-lived JVMs instead of
+        launching a JVM for each file (Java 11 or later is required)
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
@@ -72,13 +84,21 @@ class CoQua(Graal):
 
     def __init__(self, uri, git_path, worktreepath=DEFAULT_WORKTREE_PATH, exec_path=None,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 workers=1, cache_path=None, cache_size=DEFAULT_CACHE_SIZE,
+                 blob_checkout=False, sparse_checkout=False, resume=False,
+                 prefetch=False, jobs=1, jadolint_host=False,
                  tag=None, archive=None):
         super().__init__(uri, git_path, worktreepath, exec_path=exec_path,
                          entrypoint=entrypoint, in_paths=in_paths, out_paths=out_paths, details=details,
+                         workers=workers, cache_path=cache_path, cache_size=cache_size,
+                         blob_checkout=blob_checkout, sparse_checkout=sparse_checkout,
+                         resume=resume, prefetch=prefetch,
                          tag=tag, archive=archive)
 
         self.analyzer_kind = None
         self.analyzer = None
+        self.jobs = jobs
+        self.jadolint_host = jadolint_host
 
     def fetch(self, category=CATEGORY_COQUA_PYLINT, paths=None,
               from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME,
@@ -99,7 +119,8 @@ class CoQua(Graal):
             self.analyzer = ModuleAnalyzer(self.details, self.analyzer_kind)
         elif category == CATEGORY_COQUA_JADOLINT:
             self.analyzer_kind = JADOLINT
-            self.analyzer = JadolintAnalyzer(self.exec_path, analysis=SMELLS)
+            self.analyzer = JadolintAnalyzer(self.exec_path, analysis=SMELLS,
+                                             jadolint_host=self.jadolint_host)
         else:
             raise GraalError(cause="Unknown category %s" % category)
 
@@ -159,6 +180,7 @@ class CoQua(Graal):
 
             analysis = self.analyzer.analyze(module_path, self.worktreepath)
         else:
+            files_to_process = []
             for committed_file in commit['files']:
                 file_path = committed_file['file']
                 if self.in_paths:
@@ -171,12 +193,51 @@ class CoQua(Graal):
                     analysis.update({file_path: {SMELLS: []}})
                     continue
 
-                smells = self.analyzer.analyze(local_path)
-                digested_smells = {SMELLS: [smell.replace(self.worktreepath, '') for smell in smells[SMELLS]]}
-                analysis.update({file_path: digested_smells})
+                analysis.update({file_path: None})
+                files_to_process.append((file_path, local_path))
+
+            # Jadolint is run on `jobs` files at the same time
+            local_paths = [path[1] for path in files_to_process]
+            analyses = self._map_files(self.__analyze_file, local_paths, self.jobs)
+            for (file_path, _), digested_smells in zip(files_to_process, analyses):
+                analysis[file_path] = digested_smells
 
         return analysis
 
+    def __analyze_file(self, local_path):
+        """Get the smells of a file, reusing the ones obtained on a file with the same content"""
+
+        file_path = local_path[len(self.worktreepath) + 1:]
+
+        # the smells refer to the file path, which is part of the cache key
+        return self._cached_analysis(local_path, self.__analyze_smells,
+                                     analysis=SMELLS, file_path=file_path)
+
+    def _analysis_scope(self):
+        """Pylint and Flake8 analyze the entrypoint, while Jadolint
+        analyzes the files modified by the commit"""
+
+        if self.analyzer_kind in [FLAKE8, PYLINT]:
+            return self.entrypoint
+
+        return None
+
+    def _materialize_paths(self, commit):
+        """Jadolint only reads the files modified by the commit, while
+        Pylint and Flake8 need the whole working tree"""
+
+        if self.analyzer_kind in [FLAKE8, PYLINT]:
+            return None
+
+        return [f['file'] for f in commit['files']
+                if not self.in_paths or any(f['file'].endswith(p) for p in self.in_paths)]
+
+    def __analyze_smells(self, local_path):
+        """Get the smells of a Dockerfile, removing the working tree path from them"""
+
+        smells = self.analyzer.analyze(local_path)
+        return {SMELLS: [smell.replace(self.worktreepath, '') for smell in smells[SMELLS]]}
+
     def _post(self, commit):
         """Remove attributes of the Graal item obtained
 
@@ -192,10 +253,15 @@ class CoQua(Graal):
 
 
 class JadolintAnalyzer(Analyzer):
-    """Class to obtain a list of smells extracted from Dockerfiles."""
+    """Class to obtain a list of smells extracted from Dockerfiles.
 
-    def __init__(self, exec_path, analysis=SMELLS):
-        self.analyzer = Jadolint(exec_path, analysis=analysis)
+    :param exec_path: path of the Jadolint jar
+    :param analysis: the analysis to perform
+    :param jadolint_host: if True, Jadolint is run by long-lived JVMs
+    """
+
+    def __init__(self, exec_path, analysis=SMELLS, jadolint_host=False):
+        self.analyzer = Jadolint(exec_path, analysis=analysis, host=jadolint_host)
 
     def analyze(self, file_path):
         """Analyze the content of a Python project using Jadolint
@@ -212,6 +278,11 @@ class JadolintAnalyzer(Analyzer):
 
         return analysis
 
+    def close(self):
+        """Terminate the long-lived JVMs running Jadolint"""
+
+        self.analyzer.close()
+
 
 class ModuleAnalyzer(Analyzer):
     """Class to evaluate code quality in a Python project
@@ -262,4 +333,12 @@ class CoQuaCommand(GraalCommand):
 
         parser = GraalCommand.setup_cmd_parser(cls.BACKEND)
 
+        group = parser.parser.add_argument_group('CoQua arguments')
+        group.add_argument('--jobs', dest='jobs',
+                           type=int, default=1,
+                           help="Number of files of a commit analyzed at the same time by Jadolint")
+        group.add_argument('--jadolint-host', dest='jadolint_host',
+                           action='store_true',
+                           help="Run Jadolint with long-lived JVMs (requires Java 11 or later)")
+
         return parser
@@ -28,6 +28,7 @@ from graal.graal import (Graal,
                          GraalCommand,
                          GraalError,
                          GraalRepository,
+                         DEFAULT_CACHE_SIZE,
                          DEFAULT_WORKTREE_PATH)
 from graal.backends.core.analyzers.bandit import Bandit
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
@@ -51,6 +52,14 @@ class CoVuln(Graal):
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
     :param details: if enable, it returns fine-grained results
+    :param workers: number of processes analyzing commits in parallel
+    :param cache_path: path of the cache of the file analyses
+    :param cache_size: maximum size of the cache, in MB
+    :param blob_checkout: if enabled, the files to analyze are read from the Git
+        objects instead of checking out the whole working tree
+    :param sparse_checkout: if enabled, only the analyzed directories are checked out
+    :param resume: if enabled, the commits already emitted by a previous run are skipped
+    :param prefetch: if enabled, the next commit is checked out while the current one is analyzed
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
@@ -63,9 +72,15 @@ class CoVuln(Graal):
 
     def __init__(self, uri, git_path, worktreepath=DEFAULT_WORKTREE_PATH, exec_path=None,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 workers=1, cache_path=None, cache_size=DEFAULT_CACHE_SIZE,
+                 blob_checkout=False, sparse_checkout=False, resume=False,
+                 prefetch=False,
                  tag=None, archive=None):
         super().__init__(uri, git_path, worktreepath, exec_path=exec_path,
                          entrypoint=entrypoint, in_paths=in_paths, out_paths=out_paths, details=details,
+                         workers=workers, cache_path=cache_path, cache_size=cache_size,
+                         blob_checkout=blob_checkout, sparse_checkout=sparse_checkout,
+                         resume=resume, prefetch=prefetch,
                          tag=tag, archive=archive)
 
         if not self.entrypoint:
@@ -121,6 +136,11 @@ class CoVuln(Graal):
 
         return analysis
 
+    def _analysis_scope(self):
+        """The analysis is performed on the entrypoint"""
+
+        return self.entrypoint
+
     def _post(self, commit):
         """Remove attributes of the Graal item obtained
 
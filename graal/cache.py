@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_SHARED_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.graal', 'cache', 'analyses.db')
+CACHE_TIMEOUT = 60
+CACHE_FLUSH_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """Persistent cache of analysis results.
+
+    The results are stored in a SQLite database at `path` and indexed
+    by a key, which usually identifies the content of the analyzed
+    file (i.e., its Git blob SHA), the analyzer and the options used.
+    When the size of the stored results exceeds `max_size`, the least
+    recently used entries are evicted.
+
+    The connection to the database is opened on demand by every
+    process, thus the cache can be shared by the workers of a Graal
+    backend and by several Graal executions. The number of hits, misses
+    and evictions is stored with the entries, thus `stats` reports the
+    use of the cache by all of them. Within a process, the accesses
+    of several threads are serialized.
+
+    Reads do not write to the database: the access times of the entries
+    found and the number of hits and misses are kept in memory and
+    written at once with the next `set`, every `CACHE_FLUSH_SIZE` reads
+    or when `flush` is called. The size of the entries is kept as a
+    running total along with the statistics.
+
+    :param path: path of the database file
+    :param max_size: maximum size of the results stored, in MB
+    """
+    def __init__(self, path, max_size=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size * 1024 * 1024
+
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+        self._accessed = {}
+        self._counts = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def key(*parts, **options):
+        """Build a cache key out of a set of values and options
+
+        :param parts: values identifying the entry (e.g., blob SHA, analyzer)
+        :param options: options that alter the results of the analysis
+
+        :returns: the key as a hex string
+        """
+        raw = json.dumps([parts, options], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Get the value stored for `key`
+
+        :param key: the key of the entry
+
+        :returns: the value stored or None if it is not found
+        """
+        with self._lock:
+            conn = self.__connection()
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._counts['misses'] += 1
+            else:
+                self._accessed[key] = time.time()
+                self._counts['hits'] += 1
+
+            if sum(self._counts.values()) >= CACHE_FLUSH_SIZE:
+                self.flush()
+
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        """Store `value` for `key`
+
+        :param key: the key of the entry
+        :param value: a JSON serializable value
+        """
+        raw = json.dumps(value)
+
+        with self._lock:
+            with self.__transaction() as conn:
+                row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                conn.execute("INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                             (key, raw, len(raw), time.time()))
+                self.__count(conn, 'size', len(raw) - (row[0] if row else 0))
+                self.__write_accesses(conn)
+                self.__evict(conn)
+            self.__reset_accesses()
+
+    def flush(self):
+        """Write the access times and the hits and misses kept in memory"""
+
+        with self._lock:
+            if not self._accessed and not any(self._counts.values()):
+                return
+
+            with self.__transaction() as conn:
+                self.__write_accesses(conn)
+            self.__reset_accesses()
+
+    def size(self):
+        """Get the size in bytes of the values stored"""
+
+        with self._lock:
+            return self.__value(self.__connection(), 'size')
+
+    def stats(self):
+        """Get the statistics of the use of the cache
+
+        :returns: a dict with the number of hits, misses and evictions,
+            and the number and size in bytes of the entries stored
+        """
+        stats = {name: 0 for name in ['hits', 'misses', 'evictions']}
+
+        with self._lock:
+            self.flush()
+            conn = self.__connection()
+            stats.update(conn.execute("SELECT name, value FROM stats"))
+            stats['entries'] = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            stats['size'] = stats.get('size', 0)
+
+        return stats
+
+    def clear(self):
+        """Remove all the entries and the statistics of the cache"""
+
+        with self._lock:
+            with self.__transaction() as conn:
+                conn.execute("DELETE FROM entries")
+                conn.execute("DELETE FROM stats")
+            self.__reset_accesses()
+
+    @staticmethod
+    def __count(conn, name, value=1):
+        conn.execute("INSERT OR IGNORE INTO stats (name, value) VALUES (?, 0)", (name,))
+        conn.execute("UPDATE stats SET value = value + ? WHERE name = ?", (value, name))
+
+    @staticmethod
+    def __value(conn, name):
+        row = conn.execute("SELECT value FROM stats WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def __write_accesses(self, conn):
+        """Write the access times and the counters kept in memory"""
+
+        conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?",
+                         [(accessed, key) for key, accessed in self._accessed.items()])
+        for name, value in self._counts.items():
+            if value:
+                self.__count(conn, name, value)
+
+    def __reset_accesses(self):
+        self._accessed = {}
+        self._counts = {name: 0 for name in self._counts}
+
+    @contextlib.contextmanager
+    def __transaction(self):
+        """Run a set of statements in a single transaction"""
+
+        conn = self.__connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def __evict(self, conn):
+        """Evict the least recently used entries once `max_size` is exceeded"""
+
+        excess = self.__value(conn, 'size') - self.max_size
+        if excess <= 0:
+            return
+
+        victims = []
+        freed = 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self.__count(conn, 'size', -freed)
+        self.__count(conn, 'evictions', len(victims))
+        logger.debug("%s entries evicted from cache %s" % (len(victims), self.path))
+
+    def __connection(self):
+        if self._conn and self._pid == os.getpid():
+            return self._conn
+
+        dirpath = os.path.dirname(self.path)
+        if dirpath and not os.path.exists(dirpath):
+            os.makedirs(dirpath, exist_ok=True)
+
+        # the connection may be shared by the threads of a process (e.g., prefetch pipeline)
+        conn = sqlite3.connect(self.path, timeout=CACHE_TIMEOUT, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                     "key TEXT PRIMARY KEY, value TEXT, size INTEGER, accessed REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+        # the running total of the size is computed once on the databases lacking it
+        conn.execute("INSERT OR IGNORE INTO stats (name, value) "
+                     "SELECT 'size', COALESCE(SUM(size), 0) FROM entries")
+
+        # the accesses kept in memory by the parent process are not written by its children
+        self._conn = conn
+        self._pid = os.getpid()
+        self.__reset_accesses()
+
+        return conn
+
+
+def analyzer_signature(analyzer):
+    """Identify an analyzer by its class and the versions of the tools it wraps
+
+    :param analyzer: an analyzer object (e.g., `FileAnalyzer`, `LicenseAnalyzer`)
+
+    :returns: a string signature
+    """
+    parts = ['%s-%s' % (type(analyzer).__name__, getattr(analyzer, 'version', None))]
+
+    for name, value in sorted(vars(analyzer).items()):
+        version = getattr(value, 'version', None)
+        if version and hasattr(value, 'analyze'):
+            parts.append('%s-%s' % (type(value).__name__, version))
+
+    return ':'.join(parts)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+CHECKPOINTS_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoints:
+    """Persistent record of the commits emitted by Graal runs.
+
+    The hashes of the commits are stored in a SQLite database at `path`,
+    grouped by run. A run is identified by the backend, the category and
+    the options that alter the items produced, thus an interrupted run
+    can be resumed skipping the commits already emitted.
+
+    :param path: path of the database file
+    """
+    def __init__(self, path):
+        self.path = path
+
+        self._conn = None
+        self._pid = None
+
+    @staticmethod
+    def run_id(*parts, **options):
+        """Identify a run out of a set of values and options
+
+        :param parts: values identifying the run (e.g., backend, category)
+        :param options: options that alter the items produced
+
+        :returns: the identifier as a hex string
+        """
+        raw = json.dumps([parts, options], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def emitted(self, run):
+        """Get the hashes of the commits emitted by a run
+
+        :param run: the identifier of the run
+
+        :returns: a set of commit hashes
+        """
+        conn = self.__connection()
+        rows = conn.execute("SELECT hash FROM checkpoints WHERE run = ?", (run,))
+        return {row[0] for row in rows}
+
+    def add(self, run, hash):
+        """Record that a commit was emitted by a run
+
+        :param run: the identifier of the run
+        :param hash: the hash of the commit
+        """
+        conn = self.__connection()
+        conn.execute("INSERT OR REPLACE INTO checkpoints (run, hash, emitted) VALUES (?, ?, ?)",
+                     (run, hash, time.time()))
+
+    def clear(self, run):
+        """Remove the commits recorded for a run
+
+        :param run: the identifier of the run
+        """
+        conn = self.__connection()
+        conn.execute("DELETE FROM checkpoints WHERE run = ?", (run,))
+
+    def __connection(self):
+        if self._conn and self._pid == os.getpid():
+            return self._conn
+
+        dirpath = os.path.dirname(self.path)
+        if dirpath and not os.path.exists(dirpath):
+            os.makedirs(dirpath, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=CHECKPOINTS_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS checkpoints ("
+                     "run TEXT, hash TEXT, emitted REAL, PRIMARY KEY (run, hash))")
+
+        self._conn = conn
+        self._pid = os.getpid()
+
+        return conn
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+
+from .graal import GraalError
+
+DEFAULT_KEYFRAME_INTERVAL = 100
+ROW_KEY = 'file_path'
+
+
+def encode(commits, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+    """Delta-encode the analyses of a sequence of commits.
+
+    Every `keyframe_interval` commits (and for the first one), the analysis
+    is kept as is and the commit is marked as keyframe. For the rest of the
+    commits, the analysis only contains the entries added or changed with
+    respect to the previous commit, and the keys of the entries removed are
+    listed in the attribute `delta`. The analyses can be either lists of rows,
+    identified by their `file_path`, or dicts (e.g., results by language).
+
+    :param commits: a generator of Graal commit items
+    :param keyframe_interval: number of commits between two keyframes
+
+    :returns: a generator of the Graal commit items encoded
+    """
+    previous = None
+    previous_hash = None
+    ncommits = 0
+
+    for commit in commits:
+        entries = _index(commit['analysis'])
+
+        if previous is None or ncommits % keyframe_interval == 0:
+            commit['delta'] = {'keyframe': True}
+        else:
+            changed = {key: entry for key, entry in entries.items()
+                       if key not in previous or previous[key] != entry}
+            removed = sorted(key for key in previous if key not in entries)
+
+            if isinstance(commit['analysis'], list):
+                commit['analysis'] = [changed[key] for key in sorted(changed)]
+            else:
+                commit['analysis'] = changed
+
+            commit['delta'] = {
+                'keyframe': False,
+                'base': previous_hash,
+                'removed': removed
+            }
+
+        previous = entries
+        previous_hash = commit['commit']
+        ncommits += 1
+
+        yield commit
+
+
+def decode(items):
+    """Reconstruct the full analyses of a sequence of delta-encoded items.
+
+    The items must be in the order they were produced, starting from a
+    keyframe. The lists of rows rebuilt are sorted by `file_path`.
+
+    :param items: a generator of Graal items or Graal commit items
+
+    :returns: a generator of the items with their full analysis
+
+    :raises GraalError: raised when the items can not be reconstructed
+        (e.g., an item is missing)
+    """
+    previous = None
+    previous_hash = None
+
+    for item in items:
+        commit = item['data'] if 'data' in item else item
+        delta = commit.pop('delta', None)
+
+        if delta is None or delta['keyframe']:
+            entries = _index(commit['analysis'])
+        else:
+            if previous is None:
+                raise GraalError(cause="Missing keyframe before %s" % commit['commit'])
+            if delta['base'] != previous_hash:
+                cause = "Missing base %s of %s, found %s" % (delta['base'], commit['commit'], previous_hash)
+                raise GraalError(cause=cause)
+
+            entries = dict(previous)
+            for key in delta['removed']:
+                entries.pop(key, None)
+            entries.update(_index(commit['analysis']))
+
+        if isinstance(commit['analysis'], list):
+            commit['analysis'] = [entries[key] for key in sorted(entries)]
+        else:
+            commit['analysis'] = entries
+
+        previous = entries
+        previous_hash = commit['commit']
+
+        yield item
+
+
+def read_items(fd):
+    """Read the items written by Graal (or Perceval) as a sequence of JSON documents
+
+    :param fd: file object to read from
+
+    :returns: a generator of items
+    """
+    decoder = json.JSONDecoder()
+    content = fd.read()
+    pos = 0
+
+    while True:
+        while pos < len(content) and content[pos].isspace():
+            pos += 1
+        if pos == len(content):
+            break
+
+        item, pos = decoder.raw_decode(content, pos)
+        yield item
+
+
+def _index(analysis):
+    """Index the entries of an analysis by key"""
+
+    if isinstance(analysis, list):
+        return {row[ROW_KEY]: row for row in analysis}
+
+    return dict(analysis)
@@ -23,15 +23,27 @@
 #
 
 import argparse
+import collections
+import concurrent.futures
+import copy
+import fcntl
 from glob import glob
+import hashlib
 import io
 import importlib
+import json
 import logging
+import multiprocessing
+import multiprocessing.pool
 import os
 import pkgutil
+import queue
 import shutil
+import subprocess
 import sys
+import threading
 import tarfile
+import traceback
 
 from grimoirelab_toolkit.datetime import (datetime_utcnow,
                                           str_to_datetime)
@@ -44,9 +56,21 @@ from perceval.errors import BaseError, RepositoryError
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
 
 from ._version import __version__
+from .cache import (AnalysisCache,
+                    analyzer_signature,
+                    DEFAULT_CACHE_SIZE)
+from .checkpoints import Checkpoints
 
 CATEGORY_GRAAL = 'graal'
 DEFAULT_WORKTREE_PATH = '/tmp/worktrees/'
+TREE_ANALYSES_SIZE = 256
+TREE_FILES_SIZE = 32
+CHECKPOINTS_SUFFIX = '-checkpoints.db'
+PREFETCH_SUFFIX = '-prefetch'
+PREFETCH_QUEUE_SIZE = 2
+PREFETCH_TIMEOUT = 0.5
+WORKER_LOCK_SUFFIX = '.lock'
+WORKER_MAX_TASKS = None
 GIT_EXEC_PATH = '/usr/bin/git'
 
 logger = logging.getLogger(__name__)
@@ -78,6 +102,16 @@ class Graal(Git):
     method `_analyze(self, commit)` as well as tweak
     the item generated by redefining the method `_post(commit)`.
 
+    When the analysis only depends on the content of a directory of the
+    repository, `_analysis_scope(self)` can be redefined to return its path.
+    Then, the commits where the tree of that directory was already analyzed
+    are neither checked out nor analyzed again, and the stored analysis is
+    passed to `_reuse_analysis(self, commit, analysis)`.
+
+    When `blob_checkout` is set and `_materialize_paths(self, commit)` returns
+    the paths needed by the analysis of a commit, only those files are written
+    to the working tree, instead of checking out the whole commit.
+
     :param uri: URI of the Git repository
     :param git_path: path to where is/to clone the repository
     :param worktreepath: the directory where to store the working tree
@@ -86,18 +120,36 @@ class Graal(Git):
     :param in_paths: the target paths of the analysis
     :param out_paths: the paths to be excluded from the analysis
     :param details: if enable, it returns fine-grained results
+    :param workers: number of processes analyzing commits concurrently,
+        each one on its own working tree
+    :param cache_path: path of the cache where the results of the file
+        analyses are stored, the cache is disabled if None
+    :param cache_size: maximum size of the cache, in MB
+    :param blob_checkout: if enabled, the backends that analyze only some files
+        of each commit read them from the Git objects instead of checking out
+        the whole working tree
+    :param sparse_checkout: if enabled, only the paths returned by `_sparse_paths`
+        (by default, the analysis scope) are checked out
+    :param resume: if enabled, the commits emitted are recorded in a checkpoint
+        store next to `gitpath`, and those already emitted by a previous run with
+        the same category and options are skipped
+    :param prefetch: if enabled, the next commit is checked out on a second working
+        tree while the current one is analyzed, and the items already analyzed are
+        returned meanwhile (ignored when `workers` is greater than 1)
     :param tag: label used to mark the data
     :param archive: archive to store/retrieve items
 
     :raises RepositoryError: raised when there was an error cloning or
         updating the repository.
     """
-    version = '0.6.1'
+    version = '0.7.0'
 
     CATEGORIES = [CATEGORY_GRAAL]
 
     def __init__(self, uri, gitpath, worktreepath=DEFAULT_WORKTREE_PATH, exec_path=None,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 workers=1, cache_path=None, cache_size=DEFAULT_CACHE_SIZE,
+                 blob_checkout=False, sparse_checkout=False, resume=False, prefetch=False,
                  tag=None, archive=None):
         super().__init__(uri, gitpath, tag=tag, archive=archive)
         self.uri = uri
@@ -108,12 +160,21 @@ class Graal(Git):
         self.in_paths = in_paths
         self.out_paths = out_paths
         self.details = details
+        self.workers = workers
+        self.cache = AnalysisCache(cache_path, cache_size) if cache_path else None
+        self.blob_checkout = blob_checkout
+        self.sparse_checkout = sparse_checkout
+        self.checkpoints = Checkpoints(self.gitpath.rstrip('/') + CHECKPOINTS_SUFFIX) if resume else None
+        self.prefetch = prefetch
 
         if not GraalRepository.exists(worktreepath):
             os.mkdir(worktreepath)
 
         self.worktreepath = os.path.join(worktreepath, os.path.split(self.gitpath)[1])
+        self._base_worktreepath = self.worktreepath
         self.graalRepo = None
+        self._tree_analyses = collections.OrderedDict()
+        self._tree_lock = threading.Lock()
 
     def fetch(self, category=CATEGORY_GRAAL,
               from_date=DEFAULT_DATETIME, to_date=DEFAULT_LAST_DATETIME,
@@ -179,28 +240,56 @@ class Graal(Git):
             kwargs['branches'] = [branch]
 
         self.graalRepo = self.__create_graal_repository(branch)
+        self._tree_analyses.clear()
 
         commits = super().fetch_items(category, **kwargs)
-        for commit in commits:
-            try:
-                if self._filter_commit(commit):
-                    continue
 
-                self.graalRepo.checkout(commit['commit'])
-                commit['analysis'] = self._analyze(commit)
+        run = None
+        if self.checkpoints:
+            run = self.__run_id(category, from_date=kwargs.get('from_date'), to_date=kwargs.get('to_date'),
+                                branches=kwargs.get('branches'))
+            commits = self.__skip_emitted(commits, run)
+
+        if self.workers > 1:
+            if self.prefetch:
+                logger.warning("Prefetch ignored, the commits are analyzed by %s workers" % self.workers)
+            items = self.__fetch_parallel(commits, branch)
+        elif self.prefetch:
+            items = self.__fetch_prefetch(commits, branch)
+        else:
+            items = self.__fetch_sequential(commits)
 
-                commit = self._post(commit)
-                yield commit
+        # the working tree and the resources held by the analyzer (e.g., pools of processes)
+        # are released also when the fetch fails or the items are no longer consumed
+        try:
+            for item in items:
+                yield item
                 icommits += 1
-            except Exception as e:
-                logger.error("Analysis failed at %s" % commit['commit'])
-                raise e
 
-        self.graalRepo.prune()
+                # the item is recorded once the consumer has asked for the next one
+                if self.checkpoints:
+                    self.checkpoints.add(run, item['commit'])
+
+            # the run is complete, thus there is nothing left to resume
+            if self.checkpoints:
+                self.checkpoints.clear(run)
+        finally:
+            items.close()
+            self.graalRepo.prune()
+
+            analyzer = getattr(self, 'analyzer', None)
+            if hasattr(analyzer, 'close'):
+                analyzer.close()
 
         logger.info("Fetch process completed: %s commits inspected",
                     icommits)
 
+        if self.cache:
+            stats = self.cache.stats()
+            logger.info("Cache %s: %s hits, %s misses, %s evictions, %s entries",
+                        self.cache.path, stats['hits'], stats['misses'],
+                        stats['evictions'], stats['entries'])
+
     def metadata(self, item, filter_classified=False):
         """Add metadata to an item.
 
@@ -261,6 +350,471 @@ class Graal(Git):
         """
         return commit
 
+    def _analysis_scope(self):
+        """Get the path of the directory, relative to the root of the repository,
+        whose content fully determines the results of `_analyze`
+
+        :returns: the path ('' for the whole repository) or None when the analysis
+            depends on the commit itself (e.g., on the files it modifies)
+        """
+        return None
+
+    def _materialize_paths(self, commit):
+        """Get the paths of the files read by `_analyze`, when it does not need
+        the whole working tree (e.g., it only analyzes the files modified by the commit)
+
+        :param commit: a Perceval commit item
+
+        :returns: a list of paths relative to the root of the repository or None
+            if the whole working tree is needed
+        """
+        return None
+
+    def _sparse_paths(self):
+        """Get the paths of the working tree read by `_analyze`, which restrict
+        the checkout of the commits when `sparse_checkout` is enabled. By default,
+        they are the analysis scope.
+
+        :returns: a list of paths relative to the root of the repository or None
+            if the whole working tree is needed
+        """
+        scope = self._analysis_scope()
+        if not scope or os.path.normpath(scope) == '.':
+            return None
+
+        return [scope]
+
+    def _analysis_options(self):
+        """Get the options of the backend, besides the ones handled by Graal (e.g.,
+        `entrypoint`, `details`), which alter the results of `_analyze`
+
+        :returns: a dict of options
+        """
+        return {}
+
+    def _reuse_analysis(self, commit, analysis):
+        """Adapt an analysis obtained on another commit with the same tree
+
+        :param commit: a Perceval commit item
+        :param analysis: the analysis stored for the tree of the commit
+
+        :returns: the analysis of `commit`
+        """
+        return analysis
+
+    def _cached_analysis(self, local_path, analyze, **options):
+        """Analyze a file, reusing the results obtained on a file with the same content.
+
+        When the cache is enabled, the results are stored using as key the
+        blob SHA of the file, the backend, the analyzer and the `options`
+        which affect the results. Thus, files already analyzed in other commits,
+        branches or repositories are not analyzed again.
+
+        :param local_path: path of the file in the working tree
+        :param analyze: function that performs the analysis of `local_path`
+        :param options: options which alter the results of the analysis
+
+        :returns: the results of the analysis
+        """
+        if not self.cache:
+            return analyze(local_path)
+
+        key = self.cache.key(GraalRepository.blob_hash(local_path),
+                             self.__class__.__name__, self.version,
+                             analyzer_signature(self.analyzer), **options)
+        result = self.cache.get(key)
+        if result is None:
+            result = analyze(local_path)
+            self.cache.set(key, result)
+
+        return result
+
+    def _cached_analyses(self, local_paths, analyze, file_options=None, **options):
+        """Analyze a set of files at once, reusing the results obtained on files with
+        the same content. Only the files not found in the cache are passed to `analyze`.
+
+        :param local_paths: paths of the files in the working tree
+        :param analyze: function that performs the analysis of a list of paths and
+            returns the results indexed by path
+        :param file_options: function that returns the options of each file which
+            alter the results of the analysis (e.g., its extension)
+        :param options: options which alter the results of the analysis
+
+        :returns: the results of the analysis, indexed by path
+        """
+        if not self.cache:
+            return analyze(local_paths) if local_paths else {}
+
+        signature = analyzer_signature(self.analyzer)
+        keys = {}
+        results = {}
+        for local_path in local_paths:
+            key_options = dict(options, **file_options(local_path)) if file_options else options
+            key = self.cache.key(GraalRepository.blob_hash(local_path),
+                                 self.__class__.__name__, self.version,
+                                 signature, **key_options)
+            result = self.cache.get(key)
+            if result is None:
+                keys[local_path] = key
+            else:
+                results[local_path] = result
+
+        if keys:
+            analyses = analyze(list(keys))
+            for local_path, key in keys.items():
+                results[local_path] = analyses[local_path]
+                self.cache.set(key, analyses[local_path])
+
+        return results
+
+    @staticmethod
+    def _map_files(analyze, local_paths, jobs=1):
+        """Analyze a set of files using a bounded pool of threads. It suits
+        analyzers that run an external process for each file.
+
+        :param analyze: function that performs the analysis of a file
+        :param local_paths: paths of the files in the working tree
+        :param jobs: maximum number of files analyzed at the same time
+
+        :returns: the results of the analysis, in the order of `local_paths`
+        """
+        jobs = min(jobs or 1, len(local_paths))
+        if jobs < 2:
+            return [analyze(local_path) for local_path in local_paths]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(analyze, local_paths))
+
+    def _process_commit(self, commit):
+        """Check out a commit on the working tree and run the analysis on it
+
+        :param commit: a Perceval commit item
+
+        :returns: the Graal commit item
+        """
+        self.__checkout(self.graalRepo, commit)
+        commit['analysis'] = self.__analyze(commit)
+
+        return self._post(commit)
+
+    def __analyze(self, commit):
+        """Analyze a commit checked out. When it is checked out on a working tree
+        other than the one of the backend (e.g., the one of a worker), the paths of
+        that working tree are replaced with the ones of the backend, thus the results
+        do not depend on the working tree where the commit was analyzed"""
+
+        analysis = self._analyze(commit)
+        if self.worktreepath == self._base_worktreepath:
+            return analysis
+
+        return _replace_worktree(analysis, self.worktreepath + '/', self._base_worktreepath + '/')
+
+    def __checkout(self, repo, commit):
+        paths = self._materialize_paths(commit) if self.blob_checkout else None
+        if paths is None:
+            repo.checkout(commit['commit'])
+        else:
+            repo.materialize(commit['commit'], paths)
+
+    def __fetch_sequential(self, commits):
+        for commit in commits:
+            try:
+                if self._filter_commit(commit):
+                    continue
+
+                tree = self.__scope_tree(commit)
+                analysis = self.__stored_analysis(tree)
+                if analysis is not None:
+                    yield self.__reuse(commit, analysis)
+                    continue
+
+                commit = self._process_commit(commit)
+                self.__store_analysis(tree, commit['analysis'])
+                yield commit
+            except Exception as e:
+                logger.error("Analysis failed at %s" % commit['commit'])
+                raise e
+
+    def __fetch_prefetch(self, commits, branch=None):
+        """Analyze the commits in a pipeline of threads.
+
+        While a commit is analyzed on a working tree, a thread checks out the
+        next one on a second working tree, and the items already analyzed are
+        returned (e.g., to be serialized). The queues between the stages are
+        bounded, thus only a few commits are held by the pipeline at a time.
+        The working trees are passed along with the commits, thus the stages
+        do not alter the repository and working tree of the backend.
+        """
+        prefetch_repo = GraalRepository(self.uri, self.gitpath)
+        worktreepath = self.worktreepath + PREFETCH_SUFFIX
+        if GraalRepository.exists(worktreepath):
+            shutil.rmtree(worktreepath)
+        prefetch_repo.worktree(worktreepath, branch, detach=True, checkout=not self.blob_checkout,
+                               sparse_paths=self.__worktree_sparse_paths())
+
+        main_repo = self.graalRepo
+        free = queue.Queue()
+        free.put(main_repo)
+        free.put(prefetch_repo)
+
+        checked_out = queue.Queue(maxsize=PREFETCH_QUEUE_SIZE)
+        analyzed = queue.Queue(maxsize=PREFETCH_QUEUE_SIZE)
+        stop = threading.Event()
+
+        threads = [threading.Thread(target=self.__checkout_stage, args=(commits, free, checked_out, analyzed, stop)),
+                   threading.Thread(target=self.__analysis_stage, args=(free, checked_out, analyzed, stop))]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item, error = analyzed.get()
+                if error:
+                    raise error
+                if item is None:
+                    break
+
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+            prefetch_repo.prune()
+
+    def __checkout_stage(self, commits, free, checked_out, analyzed, stop):
+        """Check out the commits on the working trees not in use. An error
+        is queued behind the commits checked out before, thus the items of
+        these commits are returned before the error is raised"""
+
+        commit = None
+        try:
+            for commit in commits:
+                if self._filter_commit(commit):
+                    continue
+
+                # the commits whose tree was already analyzed are not checked out
+                tree = self.__scope_tree(commit)
+                analysis = self.__stored_analysis(tree)
+                if analysis is not None:
+                    if not _put(checked_out, (commit, None, tree, analysis, None), stop):
+                        return
+                    continue
+
+                repo = _get(free, stop)
+                if repo is None:
+                    return
+
+                self.__checkout(repo, commit)
+                if not _put(checked_out, (commit, repo, tree, None, None), stop):
+                    return
+
+            _put(checked_out, (None, None, None, None, None), stop)
+        except Exception as e:
+            if commit:
+                logger.error("Analysis failed at %s" % commit['commit'])
+            _put(checked_out, (None, None, None, None, e), stop)
+
+    def __analysis_stage(self, free, checked_out, analyzed, stop):
+        """Analyze the commits checked out and free their working trees.
+
+        The commits are analyzed by a copy of the backend bound to the working
+        tree of each commit, which shares the analyzers and the results stored
+        (e.g., the analyses of the trees) with the backend.
+        """
+        backend = copy.copy(self)
+
+        while True:
+            entry = _get(checked_out, stop)
+            if entry is None:
+                return
+
+            commit, repo, tree, analysis, error = entry
+            if commit is None:
+                _put(analyzed, (None, error), stop)
+                return
+
+            try:
+                if repo:
+                    backend.graalRepo = repo
+                    backend.worktreepath = repo.worktreepath
+
+                    # the tree may have been analyzed while the commit was checked out
+                    analysis = backend.__stored_analysis(tree)
+
+                if analysis is not None:
+                    item = backend.__reuse(commit, analysis)
+                else:
+                    commit['analysis'] = backend.__analyze(commit)
+                    item = backend._post(commit)
+                    backend.__store_analysis(tree, item['analysis'])
+            except Exception as e:
+                logger.error("Analysis failed at %s" % commit['commit'])
+                _put(analyzed, (None, e), stop)
+                return
+
+            if repo:
+                free.put(repo)
+            if not _put(analyzed, (item, None), stop):
+                return
+
+    def __fetch_parallel(self, commits, branch=None):
+        """Analyze the commits using a pool of worker processes.
+
+        Every worker owns a working tree, so several commits are checked out
+        and analyzed at the same time. The number of commits in flight is
+        bounded and the items are returned in the same order of `commits`.
+        """
+        sparse_paths = self.__worktree_sparse_paths()
+        for i in range(self.workers):
+            repo = GraalRepository(self.uri, self.gitpath)
+            worktreepath = '%s-%s' % (self.worktreepath, i)
+            if GraalRepository.exists(worktreepath):
+                shutil.rmtree(worktreepath)
+            repo.worktree(worktreepath, branch, detach=True, checkout=not self.blob_checkout,
+                          sparse_paths=sparse_paths)
+
+        pool = multiprocessing.get_context('fork').Pool(processes=self.workers,
+                                                        initializer=_init_worker,
+                                                        initargs=(self, branch, sparse_paths),
+                                                        maxtasksperchild=WORKER_MAX_TASKS)
+        pending = collections.deque()
+        try:
+            for commit in commits:
+                if self._filter_commit(commit):
+                    continue
+
+                tree = self.__scope_tree(commit)
+                analysis = self.__stored_analysis(tree)
+                if analysis is not None:
+                    pending.append((None, self.__reuse(commit, analysis)))
+                else:
+                    pending.append((tree, pool.apply_async(_process_in_worker, (commit,))))
+
+                if len(pending) >= 2 * self.workers:
+                    yield self.__collect(*pending.popleft())
+
+            while pending:
+                yield self.__collect(*pending.popleft())
+
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+            self.__prune_worker_worktrees()
+
+    def __prune_worker_worktrees(self):
+        """Delete the working trees of the workers, including the ones
+        created by the workers which replaced others"""
+
+        slot = 0
+        while True:
+            worktreepath = '%s-%s' % (self.worktreepath, slot)
+            lockpath = worktreepath + WORKER_LOCK_SUFFIX
+            if not GraalRepository.exists(worktreepath) and not GraalRepository.exists(lockpath):
+                break
+
+            if GraalRepository.exists(worktreepath):
+                repo = GraalRepository(self.uri, self.gitpath)
+                repo.worktreepath = worktreepath
+                repo.prune()
+            if GraalRepository.exists(lockpath):
+                os.remove(lockpath)
+
+            slot += 1
+
+    def __collect(self, tree, result):
+        if not isinstance(result, multiprocessing.pool.AsyncResult):
+            return result
+
+        commit, error = result.get()
+        if error:
+            logger.error("Analysis failed at %s" % commit['commit'])
+            raise GraalError(cause=error)
+
+        self.__store_analysis(tree, commit['analysis'])
+        return commit
+
+    def __run_id(self, category, **selection):
+        """Identify the run by the options that alter the items produced, and
+        by the arguments selecting the commits (e.g., `from_date`, `branches`)"""
+
+        return self.checkpoints.run_id(self.__class__.__name__, self.origin, category,
+                                       entrypoint=self.entrypoint, in_paths=self.in_paths,
+                                       out_paths=self.out_paths, details=self.details,
+                                       selection=selection, **self._analysis_options())
+
+    def __skip_emitted(self, commits, run):
+        emitted = self.checkpoints.emitted(run)
+        if emitted:
+            logger.info("Resuming fetch process, %s commits already emitted", len(emitted))
+
+        for commit in commits:
+            if commit['commit'] in emitted:
+                continue
+
+            yield commit
+
+    def __reuse(self, commit, analysis):
+        logger.debug("Analysis of the tree of %s reused" % commit['commit'])
+
+        commit['analysis'] = self._reuse_analysis(commit, analysis)
+        return self._post(commit)
+
+    def __scope_tree(self, commit):
+        """Get the SHA of the tree analyzed at `commit`, if any"""
+
+        scope = self._analysis_scope()
+        if scope is None:
+            return None
+
+        return self.graalRepo.tree_hash(commit['commit'], scope)
+
+    def __tree_key(self, tree):
+        """Build the cache key of the analysis of a tree, out of the options and
+        the analyzers of the backend which alter the results"""
+
+        signatures = sorted(analyzer_signature(value) for value in vars(self).values()
+                            if hasattr(value, 'analyze'))
+
+        return self.cache.key('tree', tree, self.__class__.__name__, self.version,
+                              getattr(self, 'analyzer_kind', None), signatures,
+                              entrypoint=self.entrypoint, details=self.details,
+                              worktreepath=self._base_worktreepath,
+                              **self._analysis_options())
+
+    def __stored_analysis(self, tree):
+        """Get the analysis stored for `tree`, looking first in memory and then in the cache"""
+
+        if not tree:
+            return None
+
+        with self._tree_lock:
+            serialized = self._tree_analyses.get(tree)
+            if serialized is not None:
+                self._tree_analyses.move_to_end(tree)
+
+        if serialized is not None:
+            return json.loads(serialized)
+
+        if self.cache:
+            return self.cache.get(self.__tree_key(tree))
+
+        return None
+
+    def __store_analysis(self, tree, analysis):
+        if not tree:
+            return
+
+        serialized = json.dumps(analysis)
+        with self._tree_lock:
+            self._tree_analyses[tree] = serialized
+            if len(self._tree_analyses) > TREE_ANALYSES_SIZE:
+                self._tree_analyses.popitem(last=False)
+
+        if self.cache:
+            self.cache.set(self.__tree_key(tree), analysis)
+
     def __create_graal_repository(self, branch=None):
         if not GraalRepository.exists(self.gitpath):
             repo = GraalRepository.clone(self.uri, self.gitpath)
@@ -270,9 +824,119 @@ class Graal(Git):
         if GraalRepository.exists(self.worktreepath):
             shutil.rmtree(self.worktreepath)
 
-        repo.worktree(self.worktreepath, branch)
+        repo.worktree(self.worktreepath, branch, checkout=not self.blob_checkout,
+                      sparse_paths=self.__worktree_sparse_paths())
         return repo
 
+    def __worktree_sparse_paths(self):
+        if not self.sparse_checkout:
+            return None
+
+        paths = self._sparse_paths()
+        if not paths:
+            logger.warning("Sparse checkout disabled, the analysis needs the whole working tree")
+
+        return paths
+
+
+_worker_backend = None
+_worker_lock = None
+
+
+def _get(pipe, stop):
+    """Get an element from a queue of the prefetch pipeline, unless it is stopped"""
+
+    while not stop.is_set():
+        try:
+            return pipe.get(timeout=PREFETCH_TIMEOUT)
+        except queue.Empty:
+            continue
+
+    return None
+
+
+def _put(pipe, element, stop):
+    """Put an element in a queue of the prefetch pipeline, unless it is stopped"""
+
+    while not stop.is_set():
+        try:
+            pipe.put(element, timeout=PREFETCH_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+
+def _init_worker(backend, branch=None, sparse_paths=None):
+    """Set up a worker process of the pool used by `Graal.fetch_items`.
+
+    The backend is inherited from the parent process (the pool is forked)
+    and bound to the first working tree `<worktreepath>-<slot>` not locked
+    by other workers. The lock is released by the system when the worker
+    exits, thus the workers replacing others (e.g., after a crash) take
+    over their working trees. When no working tree is free, a new one is
+    created on the next slot.
+    """
+    global _worker_backend
+    global _worker_lock
+
+    slot = 0
+    while True:
+        worktreepath = '%s-%s' % (backend.worktreepath, slot)
+        lock = open(worktreepath + WORKER_LOCK_SUFFIX, 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except OSError:
+            lock.close()
+            slot += 1
+
+    repo = GraalRepository(backend.uri, backend.gitpath)
+    if GraalRepository.exists(worktreepath):
+        repo.worktreepath = worktreepath
+    else:
+        repo.worktree(worktreepath, branch, detach=True, checkout=not backend.blob_checkout,
+                      sparse_paths=sparse_paths)
+
+    backend.worktreepath = worktreepath
+    backend.graalRepo = repo
+
+    _worker_backend = backend
+    _worker_lock = lock
+
+
+def _replace_worktree(value, worktree, base_worktree):
+    """Replace the paths of a working tree with the ones of the base working tree
+    within the strings (keys included) of the results of an analysis"""
+
+    if isinstance(value, str):
+        return value.replace(worktree, base_worktree)
+    if isinstance(value, dict):
+        return {_replace_worktree(k, worktree, base_worktree): _replace_worktree(v, worktree, base_worktree)
+                for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_worktree(v, worktree, base_worktree) for v in value]
+
+    return value
+
+
+def _process_in_worker(commit):
+    """Analyze a commit within a worker process.
+
+    Exceptions are returned as text, since they may not be picklable.
+    """
+    try:
+        item = _worker_backend._process_commit(commit)
+
+        # the accesses to the cache are written once per commit, since the workers are terminated
+        if _worker_backend.cache:
+            _worker_backend.cache.flush()
+
+        return item, None
+    except Exception:
+        return commit, traceback.format_exc()
+
 
 class GraalRepository(GitRepository):
     """Manage a Graal repository.
@@ -288,33 +952,57 @@ class GraalRepository(GitRepository):
         super().__init__(uri, dirpath)
         self.worktreepath = None
 
-    def worktree(self, worktreepath, branch=None):
+        self._cat_file = None
+        self._materialized = []
+        self._tree_files = collections.OrderedDict()
+
+    def worktree(self, worktreepath, branch=None, detach=False, checkout=True, sparse_paths=None):
         """Create a working tree of the cloned repository with the active branch
         set to `branch`
 
         :param worktreepath: the path where the working tree will be located
         :param branch: the name of the branch. If None, the branch is set to the default branch
+        :param detach: if True, the HEAD of the working tree is detached, thus
+            several working trees can be created from the same branch
+        :param checkout: if False, the files are not checked out
+        :param sparse_paths: if set, the working tree is restricted to these paths
+            (see `sparse_checkout`) and the files are checked out only by `checkout`
         """
         self.worktreepath = worktreepath
 
         cmd_worktree = [GIT_EXEC_PATH, 'worktree', 'add', self.worktreepath]
+        if detach:
+            cmd_worktree.insert(3, '--detach')
+        if not checkout or sparse_paths:
+            cmd_worktree.insert(3, '--no-checkout')
         if branch:
             cmd_worktree.append(branch)
 
+        # clear the working trees deleted without being pruned (e.g., by interrupted executions)
+        self._exec([GIT_EXEC_PATH, 'worktree', 'prune'], cwd=self.dirpath, env=self.gitenv)
+
         try:
             self._exec(cmd_worktree, cwd=self.dirpath, env=self.gitenv)
             logger.debug("Git worktree %s created!" % self.worktreepath)
         except RepositoryError as e:
             if 'already' in e.msg:
                 logger.debug("Git worktree %s not created. %s" % (self.worktreepath, e.msg))
+                return
             else:
                 raise e
 
+        if sparse_paths:
+            self.sparse_checkout(sparse_paths, branch if branch else 'HEAD')
+
     def prune(self):
         """Delete a working tree from disk
 
         :param worktreepath: directory where the working tree is located
         """
+        if self._cat_file:
+            self._cat_file.close()
+            self._cat_file = None
+
         GraalRepository.delete(self.worktreepath)
         cmd_worktree = [GIT_EXEC_PATH, 'worktree', 'prune']
         try:
@@ -337,6 +1025,181 @@ class GraalRepository(GitRepository):
             cause = "Impossible to checkout the worktree %s at %s" % (self.worktreepath, hash)
             raise RepositoryError(cause=cause)
 
+    def materialize(self, hash, paths):
+        """Write some files of a given commit to the working tree, without checking it out
+
+        The content of the files is read from a long-lived `git cat-file --batch`
+        process. The files written by the previous call are removed, while the
+        paths which do not exist at `hash` are ignored.
+
+        :param hash: the hash of a commit
+        :param paths: a list of file paths relative to the root of the repository
+        """
+        for local_path in self._materialized:
+            if os.path.lexists(local_path) and not os.path.isdir(local_path):
+                os.remove(local_path)
+        self._materialized = []
+
+        if not self._cat_file:
+            self._cat_file = CatFileBatch(self.dirpath, env=self.gitenv)
+
+        for mode, sha, path in self.__ls_tree(hash, paths):
+            local_path = os.path.join(self.worktreepath, path)
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+
+            if os.path.lexists(local_path) and not os.path.isdir(local_path):
+                os.remove(local_path)
+
+            # submodules are checked out as empty directories
+            if mode == '160000':
+                os.makedirs(local_path, exist_ok=True)
+                continue
+
+            content = self._cat_file.read(sha)
+            if mode == '120000':
+                os.symlink(content.decode('utf-8', errors='surrogateescape'), local_path)
+            else:
+                with open(local_path, 'wb') as fd:
+                    fd.write(content)
+                if mode == '100755':
+                    os.chmod(local_path, 0o755)
+
+            self._materialized.append(local_path)
+
+        logger.debug("%s files of %s written to %s" % (len(self._materialized), hash, self.worktreepath))
+
+    def __ls_tree(self, hash, paths, chunk_size=1000):
+        """Get mode, SHA and path of the blobs in `paths` at a given commit"""
+
+        entries = []
+        paths = sorted(set(paths))
+
+        for i in range(0, len(paths), chunk_size):
+            cmd_ls_tree = [GIT_EXEC_PATH, 'ls-tree', '-z', '--full-tree', hash, '--']
+            cmd_ls_tree.extend(paths[i:i + chunk_size])
+
+            try:
+                outs = self._exec(cmd_ls_tree, cwd=self.dirpath, env=self.gitenv)
+            except RepositoryError:
+                cause = "Impossible to list the files of %s at %s" % (self.dirpath, hash)
+                raise RepositoryError(cause=cause)
+
+            entries.extend([(mode, sha, path) for mode, kind, sha, path in self.__parse_ls_tree(outs)
+                            if kind != 'tree'])
+
+        return entries
+
+    def tree_files(self, hash):
+        """List the files of a given commit, as recorded in its Git tree.
+
+        The lists are memoized by tree SHA, thus identical trees are listed only once.
+
+        :param hash: the hash of a commit
+
+        :returns: a list of file paths relative to the root of the repository
+        """
+        tree = self.tree_hash(hash)
+        if tree is None:
+            cause = "Impossible to find the tree of %s at %s" % (self.dirpath, hash)
+            raise RepositoryError(cause=cause)
+
+        if tree in self._tree_files:
+            self._tree_files.move_to_end(tree)
+            return list(self._tree_files[tree])
+
+        cmd_ls_tree = [GIT_EXEC_PATH, 'ls-tree', '-r', '-z', '--full-tree', tree]
+        try:
+            outs = self._exec(cmd_ls_tree, cwd=self.dirpath, env=self.gitenv)
+        except RepositoryError:
+            cause = "Impossible to list the files of %s at %s" % (self.dirpath, hash)
+            raise RepositoryError(cause=cause)
+
+        # submodules are not files
+        files = [path for _, kind, _, path in self.__parse_ls_tree(outs) if kind == 'blob']
+
+        self._tree_files[tree] = files
+        if len(self._tree_files) > TREE_FILES_SIZE:
+            self._tree_files.popitem(last=False)
+
+        return list(files)
+
+    @staticmethod
+    def __parse_ls_tree(outs):
+        """Parse the output of `git ls-tree -z` into (mode, type, SHA, path) tuples"""
+
+        entries = []
+        for entry in outs.split(b'\0'):
+            if not entry:
+                continue
+
+            info, path = entry.split(b'\t', 1)
+            mode, kind, sha = info.decode('utf-8').split(' ')
+            entries.append((mode, kind, sha, path.decode('utf-8', errors='surrogateescape')))
+
+        return entries
+
+    def tree_hash(self, hash, path=''):
+        """Get the SHA of the tree of a directory at a given commit
+
+        :param hash: the hash of a commit
+        :param path: the path of the directory, relative to the root
+            of the repository ('' for the root tree)
+
+        :returns: the SHA of the tree or None if `path` does not exist
+        """
+        path = self.__relative_path(path)
+
+        rev = hash + ':' + path if path else hash + '^{tree}'
+        cmd_rev_parse = [GIT_EXEC_PATH, 'rev-parse', '--verify', '-q', rev]
+
+        try:
+            outs = self._exec(cmd_rev_parse, cwd=self.dirpath, env=self.gitenv)
+        except RepositoryError:
+            return None
+
+        return outs.decode('utf-8').strip()
+
+    def sparse_checkout(self, paths, rev='HEAD'):
+        """Restrict the working tree to a set of directories, using sparse-checkout
+        in cone mode. The paths pointing to a file at `rev` are replaced by their
+        parent directory, while the files in the root directory are always checked out.
+
+        :param paths: a list of paths relative to the root of the repository
+        :param rev: the revision used to tell files and directories apart
+        """
+        dirs = set()
+        for path in paths:
+            path = self.__relative_path(path)
+            if path and self.__object_type(rev, path) == 'blob':
+                path = os.path.dirname(path)
+            if path:
+                dirs.add(path)
+
+        cmd_sparse = [GIT_EXEC_PATH, 'sparse-checkout', 'set', '--cone']
+        cmd_sparse.extend(sorted(dirs))
+
+        try:
+            self._exec(cmd_sparse, cwd=self.worktreepath, env=self.gitenv)
+            logger.debug("Git worktree %s restricted to %s" % (self.worktreepath, sorted(dirs)))
+        except RepositoryError:
+            cause = "Impossible to set the sparse checkout of the worktree %s" % self.worktreepath
+            raise RepositoryError(cause=cause)
+
+    def __object_type(self, rev, path):
+        cmd_cat_file = [GIT_EXEC_PATH, 'cat-file', '-t', rev + ':' + path]
+
+        try:
+            outs = self._exec(cmd_cat_file, cwd=self.dirpath, env=self.gitenv)
+        except RepositoryError:
+            return None
+
+        return outs.decode('utf-8').strip()
+
+    @staticmethod
+    def __relative_path(path):
+        path = os.path.normpath(path).strip('/') if path else ''
+        return '' if path == '.' else path
+
     def archive(self, hash):
         """Create an archive using the git archive command
 
@@ -430,6 +1293,21 @@ class GraalRepository(GitRepository):
         ext = file_path.split(".")[-1]
         return ext
 
+    @staticmethod
+    def blob_hash(file_path):
+        """Calculate the SHA that Git assigns to the content of a file
+
+        :param file_path: the path of the file
+
+        :returns: the blob SHA as a hex string
+        """
+        blob = hashlib.sha1(b'blob %d\0' % os.path.getsize(file_path))
+        with open(file_path, 'rb') as fd:
+            for chunk in iter(lambda: fd.read(65536), b''):
+                blob.update(chunk)
+
+        return blob.hexdigest()
+
     @staticmethod
     def files(dir_path):
         """List all files in a target dir
@@ -461,6 +1339,62 @@ class GraalRepository(GitRepository):
         logger.debug("%s deleted!" % target_path)
 
 
+class CatFileBatch:
+    """Long-lived `git cat-file --batch` process to read objects of a repository.
+
+    The process is started on demand and restarted if it dies.
+
+    :param dirpath: local directory where the repository is stored
+    :param env: environment variables of the git process
+    """
+    def __init__(self, dirpath, env=None):
+        self.dirpath = dirpath
+        self.env = env
+        self.proc = None
+
+    def read(self, obj):
+        """Read the content of a Git object
+
+        :param obj: the SHA of the object or any other name accepted by git (e.g., <commit>:<path>)
+
+        :returns: the content of the object as bytes
+
+        :raises RepositoryError: when the object does not exist
+        """
+        if not self.proc or self.proc.poll() is not None:
+            self.__start()
+
+        self.proc.stdin.write(obj.encode('utf-8') + b'\n')
+        self.proc.stdin.flush()
+
+        header = self.proc.stdout.readline().decode('utf-8').split()
+        if len(header) != 3:
+            raise RepositoryError(cause="Object %s not found in %s" % (obj, self.dirpath))
+
+        size = int(header[2])
+        content = self.proc.stdout.read(size)
+        self.proc.stdout.read(1)
+
+        return content
+
+    def close(self):
+        """Terminate the git process"""
+
+        if not self.proc:
+            return
+
+        self.proc.stdin.close()
+        self.proc.wait()
+        self.proc.stdout.close()
+        self.proc = None
+
+    def __start(self):
+        cmd_cat_file = [GIT_EXEC_PATH, 'cat-file', '--batch']
+        self.proc = subprocess.Popen(cmd_cat_file, cwd=self.dirpath, env=self.env,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        logger.debug("Git cat-file process started on %s" % self.dirpath)
+
+
 class GraalCommand(GitCommand):
     """Class to run GraalRepository backend from the command line."""
 
@@ -509,6 +1443,26 @@ class GraalCommand(GitCommand):
         group.add_argument('--details', dest='details',
                            action='store_true', default=False,
                            help="include details")
+        group.add_argument('--workers', dest='workers',
+                           type=int, default=1,
+                           help="number of processes analyzing commits in parallel")
+        group.add_argument('--cache-path', dest='cache_path', default=None,
+                           help="Path of the cache of the file analyses")
+        group.add_argument('--cache-size', dest='cache_size',
+                           type=int, default=DEFAULT_CACHE_SIZE,
+                           help="Maximum size of the cache, in MB")
+        group.add_argument('--blob-checkout', dest='blob_checkout',
+                           action='store_true', default=False,
+                           help="Read only the analyzed files from Git objects, instead of checking out each commit")
+        group.add_argument('--sparse-checkout', dest='sparse_checkout',
+                           action='store_true', default=False,
+                           help="Check out only the analyzed directories (e.g., the entrypoint)")
+        group.add_argument('--resume', dest='resume',
+                           action='store_true', default=False,
+                           help="Skip the commits already emitted by a previous run with the same options")
+        group.add_argument('--prefetch', dest='prefetch',
+                           action='store_true', default=False,
+                           help="Check out the next commit while the current one is analyzed")
 
         # Required arguments
         parser.parser.add_argument('uri',
@@ -589,6 +1543,17 @@ class GraalCommandArgumentParser:
                            help="produce a JSON line for each output item")
 
 
+def cpu_count():
+    """Get the number of CPUs the process can run on, which may be lower than
+    the number of CPUs of the host (e.g., when the process is bound to a set of
+    CPUs via its affinity or a cgroup cpuset)"""
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
 def fetch(backend_class, backend_args, category):
     """Fetch items using the given backend.
 
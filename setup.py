@@ -90,6 +90,9 @@ setup(name="graal",
           'graal.backends.core',
           'graal.backends.core.analyzers'
       ],
+      package_data={
+          'graal.backends.core.analyzers': ['*.java']
+      },
       namespace_packages=['graal', 'graal.backends'],
       install_requires=[
           'lizard==1.16.6',
@@ -101,7 +104,8 @@ setup(name="graal",
           'bandit>=1.4.0'
       ],
       scripts=[
-          'bin/graal'
+          'bin/graal',
+          'bin/graal-snapshots'
       ],
       cmdclass=cmdclass,
       zip_safe=False)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+from graal.cache import (AnalysisCache,
+                         analyzer_signature,
+                         DEFAULT_CACHE_SIZE)
+from graal.backends.core.analyzers.cloc import Cloc
+from graal.backends.core.analyzers.lizard import Lizard
+from graal.backends.core.cocom import FileAnalyzer
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """AnalysisCache tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+        self.cache_path = os.path.join(self.tmp_path, 'cache', 'analyses.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        cache = AnalysisCache(self.cache_path)
+        self.assertEqual(cache.path, self.cache_path)
+        self.assertEqual(cache.max_size, DEFAULT_CACHE_SIZE * 1024 * 1024)
+        self.assertFalse(os.path.exists(self.cache_path))
+
+        cache = AnalysisCache(self.cache_path, max_size=1)
+        self.assertEqual(cache.max_size, 1024 * 1024)
+
+    def test_key(self):
+        """Test whether keys depend on the parts and the options"""
+
+        key = AnalysisCache.key('abc', 'CoCom', details=True, kind='lizard_file')
+
+        self.assertEqual(key, AnalysisCache.key('abc', 'CoCom', kind='lizard_file', details=True))
+        self.assertNotEqual(key, AnalysisCache.key('abc', 'CoCom', details=False, kind='lizard_file'))
+        self.assertNotEqual(key, AnalysisCache.key('abd', 'CoCom', details=True, kind='lizard_file'))
+
+    def test_get_set(self):
+        """Test whether values are stored and retrieved"""
+
+        cache = AnalysisCache(self.cache_path)
+        self.assertIsNone(cache.get('key'))
+
+        cache.set('key', {'licenses': ['GPL-3.0']})
+        self.assertTrue(os.path.exists(self.cache_path))
+        self.assertDictEqual(cache.get('key'), {'licenses': ['GPL-3.0']})
+
+        # The values are persisted across instances
+        cache = AnalysisCache(self.cache_path)
+        self.assertDictEqual(cache.get('key'), {'licenses': ['GPL-3.0']})
+
+        cache.clear()
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.size(), 0)
+
+    def test_eviction(self):
+        """Test whether the least recently used entries are evicted"""
+
+        cache = AnalysisCache(self.cache_path, max_size=1)
+        value = 'x' * (400 * 1024)
+
+        cache.set('a', value)
+        cache.set('b', value)
+        self.assertIsNotNone(cache.get('a'))
+
+        cache.set('c', value)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertLessEqual(cache.size(), cache.max_size)
+
+    def test_stats(self):
+        """Test whether hits, misses and evictions are counted"""
+
+        cache = AnalysisCache(self.cache_path, max_size=1)
+        self.assertDictEqual(cache.stats(), {'hits': 0, 'misses': 0, 'evictions': 0,
+                                             'entries': 0, 'size': 0})
+
+        value = 'x' * (400 * 1024)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', value)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('a'))
+
+        cache.set('b', value)
+        cache.set('c', value)
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['size'], cache.size())
+
+        # The statistics are shared by the instances using the same database
+        cache = AnalysisCache(self.cache_path, max_size=1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['misses'], 2)
+
+        cache.clear()
+        self.assertDictEqual(cache.stats(), {'hits': 0, 'misses': 0, 'evictions': 0,
+                                             'entries': 0, 'size': 0})
+
+    def test_size(self):
+        """Test whether the running total of the size matches the entries stored"""
+
+        def entries_size():
+            with sqlite3.connect(self.cache_path) as conn:
+                return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+        cache = AnalysisCache(self.cache_path, max_size=1)
+        cache.set('a', 'x' * 1000)
+        cache.set('b', 'x' * 2000)
+        self.assertEqual(cache.size(), entries_size())
+
+        cache.set('a', 'x' * 10)
+        self.assertEqual(cache.size(), entries_size())
+
+        cache.set('c', 'x' * (1024 * 1024 - 100))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.size(), entries_size())
+        self.assertLessEqual(cache.size(), cache.max_size)
+
+        # The total is computed on the databases lacking it
+        with sqlite3.connect(self.cache_path) as conn:
+            conn.execute("DELETE FROM stats WHERE name = 'size'")
+
+        cache = AnalysisCache(self.cache_path, max_size=1)
+        self.assertEqual(cache.size(), entries_size())
+        self.assertGreater(cache.size(), 0)
+
+    def test_flush(self):
+        """Test whether reads are written to the database in batches"""
+
+        def stored_stats():
+            with sqlite3.connect(self.cache_path) as conn:
+                return dict(conn.execute("SELECT name, value FROM stats"))
+
+        def accessed(key):
+            with sqlite3.connect(self.cache_path) as conn:
+                return conn.execute("SELECT accessed FROM entries WHERE key = ?", (key,)).fetchone()[0]
+
+        cache = AnalysisCache(self.cache_path)
+        cache.set('a', 'x')
+        before = accessed('a')
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertNotIn('hits', stored_stats())
+        self.assertNotIn('misses', stored_stats())
+        self.assertEqual(accessed('a'), before)
+
+        cache.flush()
+        self.assertEqual(stored_stats()['hits'], 1)
+        self.assertEqual(stored_stats()['misses'], 1)
+        self.assertGreater(accessed('a'), before)
+
+        # The reads are written with the next write
+        self.assertIsNotNone(cache.get('a'))
+        cache.set('b', 'x')
+        self.assertEqual(stored_stats()['hits'], 2)
+
+        # The reads are written once they reach the flush size
+        with unittest.mock.patch('graal.cache.CACHE_FLUSH_SIZE', 3):
+            for _ in range(3):
+                self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(stored_stats()['hits'], 5)
+
+    def test_threads(self):
+        """Test whether the cache can be used by several threads at the same time"""
+
+        cache = AnalysisCache(self.cache_path)
+        errors = []
+
+        def use_cache(n):
+            try:
+                for i in range(50):
+                    key = '%s-%s' % (n, i)
+                    cache.set(key, {'n': n, 'i': i})
+                    self.assertDictEqual(cache.get(key), {'n': n, 'i': i})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=use_cache, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertListEqual(errors, [])
+        self.assertEqual(cache.stats()['entries'], 200)
+        self.assertEqual(cache.stats()['hits'], 200)
+
+    def test_analyzer_signature(self):
+        """Test whether signatures include the versions of the wrapped tools"""
+
+        signature = analyzer_signature(FileAnalyzer())
+        self.assertIn('FileAnalyzer', signature)
+        self.assertIn('Lizard-' + Lizard.version, signature)
+        self.assertIn('Cloc-' + Cloc.version, signature)
+
+
+if __name__ == "__main__":
+    unittest.main()
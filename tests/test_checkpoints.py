@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from graal.checkpoints import Checkpoints
+
+
+class TestCheckpoints(unittest.TestCase):
+    """Checkpoints tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+        self.path = os.path.join(self.tmp_path, 'repos', 'checkpoints.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        checkpoints = Checkpoints(self.path)
+        self.assertEqual(checkpoints.path, self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_run_id(self):
+        """Test whether run identifiers depend on the parts and the options"""
+
+        run = Checkpoints.run_id('CoCom', 'code_complexity_lizard_file', details=True, in_paths=None)
+
+        self.assertEqual(run, Checkpoints.run_id('CoCom', 'code_complexity_lizard_file', in_paths=None, details=True))
+        self.assertNotEqual(run, Checkpoints.run_id('CoCom', 'code_complexity_lizard_file', details=False))
+        self.assertNotEqual(run, Checkpoints.run_id('CoLic', 'code_complexity_lizard_file', details=True))
+
+    def test_add_emitted(self):
+        """Test whether the commits emitted are recorded per run"""
+
+        checkpoints = Checkpoints(self.path)
+        self.assertSetEqual(checkpoints.emitted('run'), set())
+
+        checkpoints.add('run', '075f0c6161db5a3b1c8eca45e08b88469bb148b9')
+        checkpoints.add('run', '4f3b403d47fb291a9a942a62d62c24faa79244c8')
+        checkpoints.add('run', '4f3b403d47fb291a9a942a62d62c24faa79244c8')
+        checkpoints.add('other', '825b4da7ca740f7f2abbae1b3402908a44d130cd')
+        self.assertTrue(os.path.exists(self.path))
+
+        # The checkpoints are persisted across instances
+        checkpoints = Checkpoints(self.path)
+        self.assertSetEqual(checkpoints.emitted('run'), {'075f0c6161db5a3b1c8eca45e08b88469bb148b9',
+                                                         '4f3b403d47fb291a9a942a62d62c24faa79244c8'})
+        self.assertSetEqual(checkpoints.emitted('other'), {'825b4da7ca740f7f2abbae1b3402908a44d130cd'})
+
+        checkpoints.clear('run')
+        self.assertSetEqual(checkpoints.emitted('run'), set())
+        self.assertEqual(len(checkpoints.emitted('other')), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
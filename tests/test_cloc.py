@@ -82,6 +82,41 @@ class TestCloc(TestCaseAnalyzer):
         self.assertIn('total_files', result)
         self.assertEqual(type(result['total_files']), int)
 
+    def test_analyze_files(self):
+        """Test whether cloc returns the data of several files with a single execution"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        other_path = os.path.join(self.tmp_data_path, 'Dockerfile')
+        cloc = Cloc()
+
+        with unittest.mock.patch('subprocess.check_output', wraps=subprocess.check_output) as check_output:
+            results = cloc.analyze(file_paths=[file_path, other_path])
+            self.assertEqual(check_output.call_count, 1)
+
+        self.assertListEqual(sorted(results.keys()), sorted([file_path, other_path]))
+
+        result = results[file_path]
+        self.assertEqual(result['blanks'], 27)
+        self.assertEqual(result['comments'], 31)
+        self.assertEqual(result['loc'], 67)
+        self.assertEqual(result['ext'], 'py')
+
+        # the results are the same obtained analyzing the files one by one
+        for path in [file_path, other_path]:
+            self.assertDictEqual(results[path], cloc.analyze(file_path=path))
+
+        self.assertDictEqual(cloc.analyze(file_paths=[]), {})
+
+    @unittest.mock.patch('subprocess.check_output')
+    def test_analyze_files_not_recognized(self, check_output_mock):
+        """Test whether the files not included in the output of cloc have no lines"""
+
+        check_output_mock.return_value = b'{"header": {"n_files": 0}, "SUM": {"blank": 0}}'
+
+        cloc = Cloc()
+        results = cloc.analyze(file_paths=['/tmp/data.bin'])
+        self.assertDictEqual(results, {'/tmp/data.bin': {'blanks': 0, 'comments': 0, 'loc': 0, 'ext': 'bin'}})
+
     @unittest.mock.patch('subprocess.check_output')
     def test_analyze_error(self, check_output_mock):
         """Test whether an exception is thrown in case of errors"""
@@ -93,6 +128,9 @@ class TestCloc(TestCaseAnalyzer):
         with self.assertRaises(GraalError):
             _ = cloc.analyze(**kwargs)
 
+        with self.assertRaises(GraalError):
+            _ = cloc.analyze(file_paths=[kwargs['file_path']])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -21,12 +21,19 @@
 #     inishchith <inishchith@gmail.com>
 #
 
+import io
 import os
+import subprocess
 import unittest.mock
 
+from graal.delta import (decode,
+                         DEFAULT_KEYFRAME_INTERVAL)
 from graal.graal import GraalError
-from graal.graal import GraalCommandArgumentParser
+from graal.graal import (GraalCommandArgumentParser,
+                         GraalRepository,
+                         cpu_count)
 from graal.backends.core.analyzers.cloc import Cloc
+from graal.backends.core.analyzers.linecounter import LineCounter
 from graal.backends.core.analyzers.lizard import Lizard
 from graal.backends.core.cocom import (CATEGORY_COCOM_LIZARD_FILE,
                                        CATEGORY_COCOM_LIZARD_REPOSITORY,
@@ -35,7 +42,9 @@ from graal.backends.core.cocom import (CATEGORY_COCOM_LIZARD_FILE,
                                        CoCom,
                                        FileAnalyzer,
                                        RepositoryAnalyzer,
-                                       CoComCommand)
+                                       CoComCommand,
+                                       SCC_FILE,
+                                       logger)
 from perceval.utils import DEFAULT_DATETIME
 from base_analyzer import (ANALYZER_TEST_FILE,
                            TestCaseAnalyzer)
@@ -70,6 +79,33 @@ class TestCoComBackend(TestCaseRepo):
         cc = CoCom('http://example.com', self.git_path, self.worktree_path)
         self.assertEqual(cc.origin, 'http://example.com')
         self.assertEqual(cc.tag, 'http://example.com')
+        self.assertEqual(cc.jobs, cpu_count())
+
+        self.assertFalse(cc.line_counter)
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, jobs=2, line_counter=True)
+        self.assertEqual(cc.jobs, 2)
+        self.assertTrue(cc.line_counter)
+        self.assertFalse(cc.incremental)
+        self.assertFalse(cc.delta)
+        self.assertEqual(cc.keyframe_interval, DEFAULT_KEYFRAME_INTERVAL)
+
+        # the worker processes analyze the files with a single process
+        with self.assertLogs(logger, level='WARNING') as cm:
+            cc = CoCom('http://example.com', self.git_path, self.worktree_path, workers=2, jobs=2)
+            self.assertEqual(cm.output[0], 'WARNING:graal.backends.core.cocom:Jobs ignored, the files are '
+                                           'analyzed by a single process in each of the 2 workers')
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, incremental=True,
+                   delta=True, keyframe_interval=10)
+        self.assertTrue(cc.incremental)
+        self.assertTrue(cc.delta)
+        self.assertEqual(cc.keyframe_interval, 10)
+
+        for keyframe_interval in [0, -1]:
+            with self.assertRaises(GraalError):
+                _ = CoCom('http://example.com', self.git_path, self.worktree_path,
+                          delta=True, keyframe_interval=keyframe_interval)
 
     def test_fetch_lizard_file(self):
         """Test whether commits are properly processed via file level"""
@@ -88,9 +124,25 @@ class TestCoComBackend(TestCaseRepo):
             self.assertTrue('Author' in commit['data'])
             self.assertTrue('Commit' in commit['data'])
             self.assertTrue('files' in commit['data'])
+            self.assertIn('perceval/backends/core/github.py', commit['data']['files'])
+            self.assertNotIn('.travis.yml', commit['data']['files'])
             self.assertTrue('parents' in commit['data'])
             self.assertFalse('refs' in commit['data'])
 
+    def test_fetch_lizard_file_blob_checkout(self):
+        """Test whether the files analyzed are read from the Git objects"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path)
+        expected = [commit['data'] for commit in cc.fetch()]
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, blob_checkout=True)
+        commits = [commit['data'] for commit in cc.fetch()]
+
+        self.assertEqual(len(commits), len(expected))
+        for commit, expected_commit in zip(commits, expected):
+            self.assertListEqual(commit['analysis'], expected_commit['analysis'])
+            self.assertListEqual(sorted(commit['files']), sorted(expected_commit['files']))
+
     def test_fetch_scc_file(self):
         """Test whether commits are properly processed via file level"""
 
@@ -111,6 +163,36 @@ class TestCoComBackend(TestCaseRepo):
             self.assertTrue('parents' in commit['data'])
             self.assertFalse('refs' in commit['data'])
 
+    def test_fetch_cache_file_names(self):
+        """Test whether the cached results of a file are not reused on files with the same
+        content and a different name"""
+
+        def analyze_files(file_paths):
+            return {file_path: {'ext': GraalRepository.extension(file_path)} for file_path in file_paths}
+
+        origin_path = os.path.join(self.tmp_path, 'samecontent')
+        git_path = os.path.join(self.tmp_path, 'samecontent.git')
+        git = ['git', '-c', 'user.name=graal', '-c', 'user.email=graal@example.com']
+        subprocess.check_call(['git', 'init', '-q', origin_path])
+
+        for file_names in [['a.py'], ['b.txt', 'c.js']]:
+            for file_name in file_names:
+                with open(os.path.join(origin_path, file_name), 'w') as fd:
+                    fd.write('def f(x):\n    return x if x else 0\n')
+            subprocess.check_call(git + ['add', '.'], cwd=origin_path)
+            subprocess.check_call(git + ['commit', '-q', '-m', ' '.join(file_names)], cwd=origin_path)
+        subprocess.check_call(['git', 'clone', '-q', '--bare', origin_path, git_path])
+
+        cache_path = os.path.join(self.tmp_path, 'cache.db')
+        cc = CoCom('http://example.com', git_path, self.worktree_path, cache_path=cache_path)
+        with unittest.mock.patch.object(FileAnalyzer, 'analyze_files', side_effect=analyze_files):
+            commits = [commit['data']['analysis'] for commit in cc.fetch()]
+
+        self.assertEqual(len(commits), 2)
+        self.assertListEqual([(row['file_path'], row['ext']) for row in commits[0]], [('a.py', 'py')])
+        self.assertListEqual(sorted((row['file_path'], row['ext']) for row in commits[1]),
+                             [('b.txt', 'txt'), ('c.js', 'js')])
+
     def test_fetch_lizard_repository(self):
         """Test whether commits are properly processed via repository level"""
 
@@ -129,6 +211,148 @@ class TestCoComBackend(TestCaseRepo):
             self.assertTrue('parents' in commit['data'])
             self.assertFalse('refs' in commit['data'])
 
+    def test_fetch_lizard_repository_incremental(self):
+        """Test whether only the files modified by each commit are analyzed via repository level"""
+
+        analyze_files = RepositoryAnalyzer.analyze_files
+        analyzed = []
+
+        def spy(analyzer, repository_path, file_paths):
+            analyzed.append(file_paths)
+            return analyze_files(analyzer, repository_path, file_paths)
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, incremental=True)
+        with unittest.mock.patch.object(RepositoryAnalyzer, 'analyze_files', spy):
+            commits = [commit['data'] for commit in cc.fetch(category="code_complexity_lizard_repository")]
+
+        self.assertEqual(len(commits), 6)
+        self.assertEqual(len(analyzed[0]), 12)
+        self.assertTrue(all(len(file_paths) <= 2 for file_paths in analyzed[1:]))
+
+        # the results are the same of an analysis from scratch of each commit
+        with unittest.mock.patch('graal.backends.core.cocom.INCREMENTAL_SNAPSHOTS_SIZE', 0):
+            expected = [commit['data'] for commit in cc.fetch(category="code_complexity_lizard_repository")]
+
+        for commit, expected_commit in zip(commits, expected):
+            self.assertListEqual(commit['analysis'], expected_commit['analysis'])
+
+        # the results match the ones of the analysis of the whole working tree
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path)
+        expected = [commit['data'] for commit in cc.fetch(category="code_complexity_lizard_repository")]
+
+        for commit, expected_commit in zip(commits, expected):
+            self.assertListEqual(commit['analysis'], expected_commit['analysis'])
+
+    def test_fetch_lizard_repository_incremental_duplicated(self):
+        """Test whether the files with duplicated content are skipped via repository level
+        as in the analysis of the whole working tree"""
+
+        origin_path = os.path.join(self.tmp_path, 'duplicated')
+        git_path = os.path.join(self.tmp_path, 'duplicated.git')
+        git = ['git', '-c', 'user.name=graal', '-c', 'user.email=graal@example.com']
+        subprocess.check_call(['git', 'init', '-q', origin_path])
+
+        changes = [
+            ('a.py', 'def f(x):\n    return x if x else 0\n'),
+            ('b.py', 'def f(x):\n    return x if x else 0\n'),
+            ('c.py', 'def g(y):\n    # comment\n    return y\n'),
+            ('a.py', 'def h(z):\n\n    return z or 1\n')
+        ]
+        for file_name, content in changes:
+            with open(os.path.join(origin_path, file_name), 'w') as fd:
+                fd.write(content)
+            subprocess.check_call(git + ['add', '.'], cwd=origin_path)
+            subprocess.check_call(git + ['commit', '-q', '-m', file_name], cwd=origin_path)
+        subprocess.check_call(['git', 'clone', '-q', '--bare', origin_path, git_path])
+
+        cc = CoCom('http://example.com', git_path, self.worktree_path, incremental=True, line_counter=True)
+        commits = [commit['data'] for commit in cc.fetch(category="code_complexity_lizard_repository")]
+
+        cc = CoCom('http://example.com', git_path, self.worktree_path, line_counter=True)
+        expected = [commit['data'] for commit in cc.fetch(category="code_complexity_lizard_repository")]
+
+        self.assertEqual(len(commits), 4)
+        self.assertEqual(len(expected[1]['analysis']), 1)
+        for commit, expected_commit in zip(commits, expected):
+            self.assertListEqual(commit['analysis'], expected_commit['analysis'])
+
+    @unittest.mock.patch('graal.backends.core.analyzers.scc.SCC.analyze')
+    def test_fetch_scc_repository_incremental(self, mock_analyze):
+        """Test whether the totals of each language are updated incrementally via repository level"""
+
+        def analyze(**kwargs):
+            return [{'file_path': file_path, 'language': 'Python',
+                     'blanks': 1, 'comments': 2, 'loc': 3, 'ccn': 4, 'in_commit': False}
+                    for file_path in kwargs['files'] if file_path.endswith('.py')]
+
+        mock_analyze.side_effect = analyze
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, incremental=True)
+        commits = [commit['data'] for commit in cc.fetch(category="code_complexity_scc_repository")]
+
+        self.assertEqual(len(commits), 6)
+        self.assertEqual(mock_analyze.call_count, 5)
+
+        for commit in commits:
+            num_files = len([f for f in commit['files'] if f.endswith('.py')])
+            expected = {
+                'Python': {
+                    'total_files': num_files,
+                    'blanks': num_files,
+                    'comments': 2 * num_files,
+                    'loc': 3 * num_files,
+                    'ccn': 4 * num_files
+                }
+            }
+            self.assertDictEqual(commit['analysis'], expected)
+
+    @unittest.mock.patch('graal.backends.core.analyzers.scc.SCC.analyze')
+    def test_fetch_scc_repository_delta(self, mock_analyze):
+        """Test whether the analyses are delta-encoded via repository level"""
+
+        def analyze(**kwargs):
+            repository_path = kwargs['repository_path']
+            results = []
+            for root, dirs, files in os.walk(repository_path):
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                for file_name in files:
+                    file_path = os.path.join(root, file_name)
+                    results.append({'file_path': os.path.relpath(file_path, repository_path),
+                                    'loc': os.path.getsize(file_path)})
+
+            return results
+
+        mock_analyze.side_effect = analyze
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, details=True)
+        expected = [commit for commit in cc.fetch(category="code_complexity_scc_repository")]
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, details=True,
+                   delta=True, keyframe_interval=4)
+        commits = [commit for commit in cc.fetch(category="code_complexity_scc_repository")]
+
+        self.assertEqual(len(commits), 6)
+        keyframes = [commit['data']['delta']['keyframe'] for commit in commits]
+        self.assertListEqual(keyframes, [True, False, False, False, True, False])
+
+        for commit, expected_commit in zip(commits, expected):
+            self.assertLessEqual(len(commit['data']['analysis']), len(expected_commit['data']['analysis']))
+        self.assertLess(sum(len(commit['data']['analysis']) for commit in commits),
+                        sum(len(commit['data']['analysis']) for commit in expected))
+
+        commits = list(decode(commits))
+        for commit, expected_commit in zip(commits, expected):
+            expected_commit['data']['analysis'].sort(key=lambda file_analysis: file_analysis['file_path'])
+            self.assertDictEqual(commit['data'], expected_commit['data'])
+
+        # the file level analyses are not encoded
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, delta=True)
+        with unittest.mock.patch('graal.backends.core.cocom.FileAnalyzer.analyze_files') as mock_files:
+            mock_files.side_effect = lambda file_paths: {file_path: {} for file_path in file_paths}
+            commits = [commit for commit in cc.fetch(category="code_complexity_scc_file")]
+
+        self.assertTrue(all('delta' not in commit['data'] for commit in commits))
+
     def test_fetch_scc_repository(self):
         """Test whether commits are properly processed via repository level"""
 
@@ -147,6 +371,25 @@ class TestCoComBackend(TestCaseRepo):
             self.assertTrue('parents' in commit['data'])
             self.assertFalse('refs' in commit['data'])
 
+    def test_fetch_scc_repository_details(self):
+        """Test whether the results of each file are returned via repository level"""
+
+        cc = CoCom('http://example.com', self.git_path, self.worktree_path, details=True)
+        commits = [commit for commit in cc.fetch(category="code_complexity_scc_repository")]
+
+        self.assertEqual(len(commits), 6)
+
+        for commit in commits:
+            self.assertEqual(commit['category'], CATEGORY_COCOM_SCC_REPOSITORY)
+            analysis = commit['data']['analysis']
+            self.assertIsInstance(analysis, list)
+
+            for file_analysis in analysis:
+                self.assertIn('file_path', file_analysis)
+                self.assertIn('in_commit', file_analysis)
+                self.assertIn('ccn', file_analysis)
+                self.assertIn('loc', file_analysis)
+
     def test_fetch_unknown(self):
         """Test whether commits are properly processed"""
 
@@ -238,6 +481,13 @@ class TestFileAnalyzer(TestCaseAnalyzer):
         self.assertIsInstance(file_analyzer.cloc, Cloc)
         self.assertIsInstance(file_analyzer.lizard, Lizard)
         self.assertTrue(file_analyzer.details)
+        self.assertEqual(file_analyzer.jobs, 1)
+
+        file_analyzer = FileAnalyzer(jobs=4)
+        self.assertEqual(file_analyzer.jobs, 4)
+
+        file_analyzer = FileAnalyzer(line_counter=True)
+        self.assertIsInstance(file_analyzer.cloc, LineCounter)
 
     def test_analyze_no_functions(self):
         """Test whether the analyze method works"""
@@ -281,6 +531,33 @@ class TestFileAnalyzer(TestCaseAnalyzer):
             self.assertIn('start', fd)
             self.assertIn('end', fd)
 
+    def test_analyze_files(self):
+        """Test whether the analyze_files method returns the results of each file"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        other_path = os.path.join(self.tmp_data_path, 'Dockerfile')
+        file_analyzer = FileAnalyzer(details=True)
+
+        results = file_analyzer.analyze_files([file_path, other_path])
+
+        self.assertDictEqual(results[file_path], file_analyzer.analyze(file_path))
+        self.assertDictEqual(results[other_path], file_analyzer.analyze(other_path))
+        self.assertNotIn('ccn', results[other_path])
+
+    @unittest.mock.patch('subprocess.check_output')
+    def test_analyze_files_scc(self, check_output_mock):
+        """Test whether the files are analyzed with a single SCC execution"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        other_path = os.path.join(self.tmp_data_path, 'Dockerfile')
+        check_output_mock.return_value = b'[]'
+
+        file_analyzer = FileAnalyzer(kind=SCC_FILE)
+        results = file_analyzer.analyze_files([file_path, other_path])
+
+        check_output_mock.assert_called_once()
+        self.assertListEqual(list(results.keys()), [file_path, other_path])
+
 
 class TestRepositoryAnalyzer(TestCaseAnalyzer):
     """RepositoryAnalyzer tests"""
@@ -299,6 +576,13 @@ class TestRepositoryAnalyzer(TestCaseAnalyzer):
         self.assertIsInstance(repository_analyzer, RepositoryAnalyzer)
         self.assertIsInstance(repository_analyzer.analyzer, Lizard)
         self.assertTrue(repository_analyzer.details)
+        self.assertEqual(repository_analyzer.jobs, 1)
+
+        self.assertFalse(repository_analyzer.line_counter)
+
+        repository_analyzer = RepositoryAnalyzer(jobs=4, line_counter=True)
+        self.assertEqual(repository_analyzer.jobs, 4)
+        self.assertTrue(repository_analyzer.line_counter)
 
     def test_analyze(self):
         """Test whether the analyze method works"""
@@ -318,6 +602,14 @@ class TestRepositoryAnalyzer(TestCaseAnalyzer):
         self.assertIn('blanks', file_analysis)
         self.assertIn('comments', file_analysis)
 
+    def test_close(self):
+        """Test whether the pool of processes of Lizard is released"""
+
+        repository_analyzer = RepositoryAnalyzer(jobs=2)
+        with unittest.mock.patch.object(Lizard, 'close') as close_mock:
+            repository_analyzer.close()
+            close_mock.assert_called_once_with()
+
 
 class TestCoComCommand(unittest.TestCase):
     """CoComCommand tests"""
@@ -344,6 +636,37 @@ class TestCoComCommand(unittest.TestCase):
         self.assertEqual(parsed_args.git_path, '/tmp/gitpath')
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertIsNone(parsed_args.jobs)
+        self.assertFalse(parsed_args.line_counter)
+        self.assertFalse(parsed_args.incremental)
+        self.assertFalse(parsed_args.delta)
+        self.assertEqual(parsed_args.keyframe_interval, DEFAULT_KEYFRAME_INTERVAL)
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath',
+                '--jobs', '8',
+                '--line-counter',
+                '--incremental',
+                '--delta',
+                '--keyframe-interval', '20']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.jobs, 8)
+        self.assertTrue(parsed_args.line_counter)
+        self.assertTrue(parsed_args.incremental)
+        self.assertTrue(parsed_args.delta)
+        self.assertEqual(parsed_args.keyframe_interval, 20)
+
+        for keyframe_interval in ['0', '-1']:
+            args = ['http://example.com/',
+                    '--git-path', '/tmp/gitpath',
+                    '--delta',
+                    '--keyframe-interval', keyframe_interval]
+
+            with unittest.mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+                with self.assertRaises(SystemExit):
+                    _ = parser.parse(*args)
+            self.assertIn('--keyframe-interval: must be greater than 0', stderr.getvalue())
 
 
 if __name__ == "__main__":
@@ -37,6 +37,8 @@ from graal.backends.core.codep import (CATEGORY_CODEP_PYREVERSE,
                                        JadolintAnalyzer,
                                        CoDepCommand,
                                        logger)
+from graal.backends.core.coqua import (CATEGORY_COQUA_JADOLINT,
+                                       CoQua)
 from graal.graal import GraalError
 from perceval.utils import DEFAULT_DATETIME
 from base_analyzer import (TestCaseAnalyzer,
@@ -172,6 +174,21 @@ class TestCoDepJadolintBackend(TestCaseRepo):
         self.assertEqual(cd.origin, 'http://example.com')
         self.assertEqual(cd.tag, 'test')
         self.assertEqual(cd.exec_path, JADOLINT_PATH)
+        self.assertEqual(cd.jobs, 1)
+        self.assertFalse(cd.jadolint_host)
+        self.assertFalse(cd.jadolint_combined)
+
+        cd = CoDep('http://example.com', self.git_path, self.worktree_path, exec_path=JADOLINT_PATH, jobs=3,
+                   jadolint_host=True, jadolint_combined=True)
+        self.assertEqual(cd.jobs, 3)
+        self.assertTrue(cd.jadolint_host)
+        self.assertTrue(cd.jadolint_combined)
+
+        # the combined analysis is performed by the long-lived JVMs
+        cd = CoDep('http://example.com', self.git_path, self.worktree_path, exec_path=JADOLINT_PATH,
+                   jadolint_combined=True)
+        self.assertTrue(cd.jadolint_host)
+        self.assertDictEqual(cd._analysis_options(), {'jadolint_combined': True})
 
     def test_fetch(self):
         """Test whether commits are properly processed"""
@@ -229,6 +246,51 @@ class TestCoDepJadolintBackend(TestCaseRepo):
         expected_deps.sort()
         self.assertListEqual(analysis['Dockerfile'][DEPENDENCIES], expected_deps)
 
+    def test_fetch_jobs(self):
+        """Test whether the files of a commit analyzed at the same time are returned in order"""
+
+        in_paths = ['Dockerfile', 'Dockerfile-full', 'Dockerfile-secured']
+        cd = CoDep('http://example.com', self.git_path, self.worktree_path,
+                   exec_path=JADOLINT_PATH, in_paths=in_paths)
+        expected = [commit['data']['analysis'] for commit in cd.fetch(category=CATEGORY_CODEP_JADOLINT)]
+
+        cd = CoDep('http://example.com', self.git_path, self.worktree_path,
+                   exec_path=JADOLINT_PATH, in_paths=in_paths, jobs=3)
+        commits = [commit['data']['analysis'] for commit in cd.fetch(category=CATEGORY_CODEP_JADOLINT)]
+
+        self.assertEqual(len(commits), len(expected))
+        for analysis, expected_analysis in zip(commits, expected):
+            self.assertListEqual(list(analysis.keys()), list(expected_analysis.keys()))
+            self.assertDictEqual(analysis, expected_analysis)
+
+    def test_fetch_combined(self):
+        """Test whether the combined analysis returns the items of CoDep and CoQua"""
+
+        in_paths = ['Dockerfile', 'Dockerfile-full', 'Dockerfile-secured']
+        cd = CoDep('http://example.com', self.git_path, self.worktree_path,
+                   exec_path=JADOLINT_PATH, in_paths=in_paths)
+        expected_deps = [commit for commit in cd.fetch(category=CATEGORY_CODEP_JADOLINT)]
+
+        cq = CoQua('http://example.com', self.git_path, self.worktree_path,
+                   exec_path=JADOLINT_PATH, in_paths=in_paths)
+        expected_smells = [commit for commit in cq.fetch(category=CATEGORY_COQUA_JADOLINT)]
+
+        cd = CoDep('http://example.com', self.git_path, self.worktree_path,
+                   exec_path=JADOLINT_PATH, in_paths=in_paths, jadolint_combined=True)
+        items = [item for item in cd.fetch(category=CATEGORY_CODEP_JADOLINT)]
+
+        self.assertEqual(len(items), len(expected_deps) + len(expected_smells))
+
+        deps = items[0::2]
+        smells = items[1::2]
+        for item, expected in zip(deps + smells, expected_deps + expected_smells):
+            self.assertEqual(item['backend_name'], expected['backend_name'])
+            self.assertEqual(item['backend_version'], expected['backend_version'])
+            self.assertEqual(item['category'], expected['category'])
+            self.assertEqual(item['uuid'], expected['uuid'])
+            self.assertEqual(item['data']['commit'], expected['data']['commit'])
+            self.assertDictEqual(item['data']['analysis'], expected['data']['analysis'])
+
     def test_fetch_empty(self):
         """Test whether no commits are returned"""
 
@@ -356,13 +418,19 @@ class TestCoDepCommand(unittest.TestCase):
         self.assertEqual(parsed_args.git_path, '/tmp/gitpath')
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertEqual(parsed_args.jobs, 1)
+        self.assertFalse(parsed_args.jadolint_host)
+        self.assertFalse(parsed_args.jadolint_combined)
 
         args = ['http://example.com/',
                 '--git-path', '/tmp/gitpath',
                 '--tag', 'test',
                 '--exec-path', JADOLINT_PATH,
                 '--category', CATEGORY_CODEP_JADOLINT,
-                '--in-paths', 'Dockerfile', 'Dockerfile-full', 'Dockerfile-secured']
+                '--in-paths', 'Dockerfile', 'Dockerfile-full', 'Dockerfile-secured',
+                '--jobs', '3',
+                '--jadolint-host',
+                '--jadolint-combined']
 
         parsed_args = parser.parse(*args)
         self.assertEqual(parsed_args.uri, 'http://example.com/')
@@ -372,6 +440,9 @@ class TestCoDepCommand(unittest.TestCase):
         self.assertEqual(parsed_args.category, CATEGORY_CODEP_JADOLINT),
         self.assertEqual(parsed_args.exec_path, JADOLINT_PATH)
         self.assertListEqual(parsed_args.in_paths, ['Dockerfile', 'Dockerfile-full', 'Dockerfile-secured'])
+        self.assertEqual(parsed_args.jobs, 3)
+        self.assertTrue(parsed_args.jadolint_host)
+        self.assertTrue(parsed_args.jadolint_combined)
 
 
 if __name__ == "__main__":
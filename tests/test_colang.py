@@ -30,6 +30,7 @@ import unittest.mock
 from graal.graal import GraalCommandArgumentParser
 from graal.backends.core.analyzers.linguist import Linguist
 from graal.backends.core.analyzers.cloc import Cloc
+from graal.backends.core.analyzers.linecounter import LineCounter
 from graal.backends.core.colang import (CATEGORY_COLANG_LINGUIST,
                                         CATEGORY_COLANG_CLOC,
                                         CLOC,
@@ -56,6 +57,12 @@ class TestCoLangBackend(TestCaseRepo):
             self.worktree_path, os.path.split(cl.gitpath)[1]))
         self.assertEqual(cl.origin, 'http://example.com')
         self.assertEqual(cl.tag, 'test')
+        self.assertFalse(cl.line_counter)
+
+        cl = CoLang('http://example.com', self.git_path,
+                    self.worktree_path, line_counter=True)
+        self.assertTrue(cl.line_counter)
+        self.assertDictEqual(cl._analysis_options(), {'line_counter': True})
 
     def test_fetch_linguist(self):
         """Test whether commits are properly processed"""
@@ -96,6 +103,25 @@ class TestCoLangBackend(TestCaseRepo):
         self.assertIn('total_files', result)
         self.assertEqual(type(result['total_files']), int)
 
+    def test_fetch_line_counter(self):
+        """Test whether the lines are counted with the built-in line counter"""
+
+        cl = CoLang('http://example.com', self.git_path, tag="test", line_counter=True)
+        commits = [commit for commit in cl.fetch(category=CATEGORY_COLANG_CLOC)]
+
+        self.assertEqual(len(commits), 6)
+        self.assertIsInstance(cl.repository_analyzer.analyzer, LineCounter)
+
+        commit = commits[0]
+        self.assertEqual(commit['category'], CATEGORY_COLANG_CLOC)
+        results = commit['data']['analysis']
+        result = results['Python']
+
+        self.assertEqual(type(result['blanks']), int)
+        self.assertEqual(type(result['comments']), int)
+        self.assertEqual(type(result['loc']), int)
+        self.assertEqual(type(result['total_files']), int)
+
     def test_fetch_unknown(self):
         """Test whether commits are properly processed"""
 
@@ -180,6 +206,9 @@ class TestRepositoryAnalyzer(TestCaseAnalyzer):
         self.assertIsInstance(repo_analyzer, RepositoryAnalyzer)
         self.assertIsInstance(repo_analyzer.analyzer, Cloc)
 
+        repo_analyzer = RepositoryAnalyzer(kind=CLOC, line_counter=True)
+        self.assertIsInstance(repo_analyzer.analyzer, LineCounter)
+
     def test_analyze(self):
         """Test whether the analyze method works"""
 
@@ -228,6 +257,14 @@ class TestCoLangCommand(unittest.TestCase):
         self.assertEqual(parsed_args.git_path, '/tmp/gitpath')
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertFalse(parsed_args.line_counter)
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath',
+                '--line-counter']
+
+        parsed_args = parser.parse(*args)
+        self.assertTrue(parsed_args.line_counter)
 
 
 if __name__ == "__main__":
@@ -22,8 +22,12 @@
 #
 
 import os
+import shutil
+import subprocess
+import tempfile
 import unittest.mock
 
+from graal.cache import DEFAULT_SHARED_CACHE_PATH
 from graal.graal import (GraalCommandArgumentParser,
                          GraalError)
 from graal.backends.core.analyzers.nomos import Nomos
@@ -31,11 +35,17 @@ from graal.backends.core.analyzers.scancode import ScanCode
 from graal.backends.core.colic import (CATEGORY_COLIC_NOMOS,
                                        CATEGORY_COLIC_SCANCODE,
                                        CATEGORY_COLIC_SCANCODE_CLI,
+                                       DEFAULT_PREFILTER_MAX_SIZE,
                                        NOMOS,
                                        SCANCODE,
                                        SCANCODE_CLI,
+                                       BINARY,
+                                       TOO_LARGE,
+                                       NO_SIGNALS,
+                                       PREFILTER_WINDOW,
                                        CoLic,
                                        LicenseAnalyzer,
+                                       LicensePrefilter,
                                        CoLicCommand)
 from perceval.utils import DEFAULT_DATETIME
 from base_analyzer import (ANALYZER_TEST_FILE,
@@ -85,6 +95,30 @@ class TestCoLicBackend(TestCaseRepo):
         self.assertIsNone(cl.analyzer)
         self.assertIsNone(cl.analyzer_kind)
 
+        self.assertEqual(cl.scancode_workers, 0)
+        self.assertEqual(cl.scancode_processes, 1)
+        self.assertFalse(cl.shared_cache)
+        self.assertIsNone(cl.cache)
+        self.assertIsNone(cl.prefilter)
+        self.assertDictEqual(cl.prefilter_stats, {})
+        self.assertEqual(cl.jobs, 1)
+
+        cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=NOMOS_PATH,
+                   scancode_workers=4, scancode_processes=2, shared_cache=True,
+                   prefilter=True, prefilter_max_size=10, jobs=4)
+        self.assertEqual(cl.scancode_workers, 4)
+        self.assertEqual(cl.scancode_processes, 2)
+        self.assertTrue(cl.shared_cache)
+        self.assertEqual(cl.cache.path, DEFAULT_SHARED_CACHE_PATH)
+        self.assertIsInstance(cl.prefilter, LicensePrefilter)
+        self.assertEqual(cl.prefilter.max_size, 10 * 1024)
+        self.assertEqual(cl.jobs, 4)
+
+        cache_path = os.path.join(self.tmp_path, 'cache.db')
+        cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=NOMOS_PATH,
+                   cache_path=cache_path, shared_cache=True)
+        self.assertEqual(cl.cache.path, cache_path)
+
         with self.assertRaises(GraalError):
             _ = CoLic('http://example.com', self.git_path, worktreepath=self.worktree_path, exec_path="/tmp/invalid")
 
@@ -130,6 +164,108 @@ class TestCoLicBackend(TestCaseRepo):
         self.assertFalse('parents' in commit['data'])
         self.assertFalse('refs' in commit['data'])
 
+    @unittest.mock.patch.object(LicenseAnalyzer, 'analyze_files')
+    def test_fetch_shared_cache(self, mock_analyze_files):
+        """Test whether the files analyzed in a repository are not analyzed again in another one"""
+
+        mock_analyze_files.side_effect = lambda file_paths: {file_path: {'licenses': [], 'copyrights': []}
+                                                             for file_path in file_paths}
+
+        cache_path = os.path.join(self.tmp_path, 'shared', 'cache.db')
+        fork_path = os.path.join(self.tmp_path, 'graaltest-fork')
+        subprocess.check_call(['git', 'clone', '-q', '--bare', self.git_path, fork_path])
+
+        with unittest.mock.patch('graal.backends.core.colic.DEFAULT_SHARED_CACHE_PATH', cache_path):
+            cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=NOMOS_PATH,
+                       shared_cache=True)
+            commits = [commit for commit in cl.fetch()]
+            nfiles = sum(len(call[0][0]) for call in mock_analyze_files.call_args_list)
+            self.assertGreater(nfiles, 0)
+
+            mock_analyze_files.reset_mock()
+            cl = CoLic('http://example.com/fork', fork_path, self.worktree_path, exec_path=NOMOS_PATH,
+                       shared_cache=True)
+            fork_commits = [commit for commit in cl.fetch()]
+            mock_analyze_files.assert_not_called()
+
+        self.assertEqual(len(fork_commits), len(commits))
+        for commit, fork_commit in zip(commits, fork_commits):
+            self.assertEqual(fork_commit['data']['analysis'], commit['data']['analysis'])
+
+        stats = cl.cache.stats()
+        self.assertEqual(stats['misses'], nfiles)
+        self.assertEqual(stats['hits'], nfiles)
+
+    @unittest.mock.patch.object(LicenseAnalyzer, 'analyze')
+    def test_fetch_jobs(self, mock_analyze):
+        """Test whether the files of a commit analyzed at the same time are returned in order"""
+
+        mock_analyze.side_effect = lambda file_path: {'licenses': [os.path.basename(file_path)]}
+
+        cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=NOMOS_PATH)
+        expected = [commit['data']['analysis'] for commit in cl.fetch()]
+
+        cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=NOMOS_PATH, jobs=4)
+        commits = [commit['data']['analysis'] for commit in cl.fetch()]
+
+        self.assertListEqual(commits, expected)
+        for analysis in commits:
+            for license_info in analysis:
+                self.assertListEqual(license_info['licenses'], [os.path.basename(license_info['file_path'])])
+
+    @unittest.mock.patch.object(LicenseAnalyzer, 'analyze_files')
+    def test_fetch_prefilter(self, mock_analyze_files):
+        """Test whether the files without license signals are not analyzed"""
+
+        mock_analyze_files.side_effect = lambda file_paths: {file_path: {'licenses': ['GPL']}
+                                                             for file_path in file_paths}
+
+        cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=NOMOS_PATH)
+        expected = [commit['data']['analysis'] for commit in cl.fetch()]
+        nfiles = sum(len(call[0][0]) for call in mock_analyze_files.call_args_list)
+
+        mock_analyze_files.reset_mock()
+        cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=NOMOS_PATH,
+                   prefilter=True)
+        commits = [commit['data']['analysis'] for commit in cl.fetch()]
+        nanalyzed = sum(len(call[0][0]) for call in mock_analyze_files.call_args_list)
+
+        self.assertEqual(len(commits), len(expected))
+        nskipped = 0
+        for analysis, expected_analysis in zip(commits, expected):
+            self.assertEqual(len(analysis), len(expected_analysis))
+            for license_info, expected_info in zip(analysis, expected_analysis):
+                self.assertEqual(license_info['file_path'], expected_info['file_path'])
+                if 'prefiltered' in license_info:
+                    self.assertListEqual(license_info['licenses'], [])
+                    nskipped += 1
+                else:
+                    self.assertDictEqual(license_info, expected_info)
+
+        self.assertGreater(nskipped, 0)
+        self.assertEqual(nanalyzed, nfiles - nskipped)
+        self.assertEqual(sum(cl.prefilter_stats.values()), nskipped)
+
+    def test_fetch_scancode_workers(self):
+        """Test whether commits are properly processed by long-lived scancode processes"""
+
+        cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=SCANCODE_PATH,
+                   in_paths=['perceval/backends/core/github.py'])
+        expected = [commit['data']['analysis'] for commit in cl.fetch(category=CATEGORY_COLIC_SCANCODE)]
+
+        cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=SCANCODE_PATH,
+                   in_paths=['perceval/backends/core/github.py'], scancode_workers=2)
+        commits = [commit['data']['analysis'] for commit in cl.fetch(category=CATEGORY_COLIC_SCANCODE)]
+
+        self.assertEqual(len(commits), len(expected))
+        for analysis, expected_analysis in zip(commits, expected):
+            self.assertEqual(analysis[0]['file_path'], expected_analysis[0]['file_path'])
+            self.assertEqual(analysis[0]['licenses'], expected_analysis[0]['licenses'])
+            self.assertEqual(analysis[0]['copyrights'], expected_analysis[0]['copyrights'])
+
+        # the workers are terminated at the end of the fetch process
+        self.assertIsNone(cl.analyzer.analyzer._workers)
+
     def test_fetch_scancode_cli(self):
         """Test whether commits are properly processed"""
 
@@ -151,6 +287,86 @@ class TestCoLicBackend(TestCaseRepo):
         self.assertFalse('parents' in commit['data'])
         self.assertFalse('refs' in commit['data'])
 
+    def test_fetch_scancode_cli_paths(self):
+        """Test whether the results of scancode_cli are matched to the files by path"""
+
+        scancode_path = os.path.join(self.tmp_path, 'scancode')
+        os.makedirs(os.path.join(scancode_path, 'etc', 'scripts'))
+        exec_path = os.path.join(scancode_path, 'etc', 'scripts', 'scancli.py')
+        open(exec_path, 'w').close()
+        configure_path = os.path.join(scancode_path, 'configure')
+        with open(configure_path, 'w') as fd:
+            fd.write('#!/bin/sh\n')
+        os.chmod(configure_path, 0o755)
+
+        def scan(file_paths, stream=False):
+            self.assertTrue(stream)
+            for file_path in reversed(file_paths):
+                yield {'path': file_path, 'licenses': [os.path.basename(file_path)], 'copyrights': []}
+
+        with unittest.mock.patch.object(LicenseAnalyzer, 'analyze', side_effect=scan):
+            cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=exec_path)
+            commits = [commit for commit in cl.fetch(category=CATEGORY_COLIC_SCANCODE_CLI)]
+
+        self.assertEqual(len(commits), 6)
+        for commit in commits:
+            for license_info in commit['data']['analysis']:
+                self.assertListEqual(license_info['licenses'], [os.path.basename(license_info['file_path'])])
+
+        # the files are reported in the order of the commit
+        expected = ['perceval/__init__.py', 'perceval/_version.py', 'perceval/archive.py',
+                    'perceval/backend.py', 'perceval/backends/__init__.py',
+                    'perceval/backends/core/__init__.py', 'perceval/backends/core/git.py',
+                    'perceval/backends/core/github.py', 'perceval/backends/core/mbox.py',
+                    'perceval/client.py', 'perceval/errors.py', 'perceval/utils.py']
+        self.assertListEqual([license_info['file_path'] for license_info in commits[0]['data']['analysis']],
+                             expected)
+
+        # scancode_cli reports the name of each file scanned, in the order they are requested
+        def scan_names(file_paths, stream=False):
+            for file_path in file_paths:
+                yield {'path': os.path.basename(file_path), 'licenses': [file_path], 'copyrights': []}
+
+        with unittest.mock.patch.object(LicenseAnalyzer, 'analyze', side_effect=scan_names):
+            cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=exec_path)
+            commits = [commit for commit in cl.fetch(category=CATEGORY_COLIC_SCANCODE_CLI)]
+
+        self.assertListEqual([license_info['file_path'] for license_info in commits[0]['data']['analysis']],
+                             expected)
+        for commit in commits:
+            for license_info in commit['data']['analysis']:
+                self.assertTrue(license_info['licenses'][0].endswith('/' + license_info['file_path']))
+
+        # the paths relative to the working tree are matched in any order
+        def scan_relative(file_paths, stream=False):
+            for file_path in reversed(file_paths):
+                path = file_path.split('/graaltest/', 1)[1]
+                yield {'path': path, 'licenses': [path], 'copyrights': []}
+
+        with unittest.mock.patch.object(LicenseAnalyzer, 'analyze', side_effect=scan_relative):
+            cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=exec_path)
+            commits = [commit for commit in cl.fetch(category=CATEGORY_COLIC_SCANCODE_CLI)]
+
+        for commit in commits:
+            for license_info in commit['data']['analysis']:
+                self.assertListEqual(license_info['licenses'], [license_info['file_path']])
+
+        def scan_missing(file_paths, stream=False):
+            yield from list(scan(file_paths, stream))[1:]
+
+        with unittest.mock.patch.object(LicenseAnalyzer, 'analyze', side_effect=scan_missing):
+            cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=exec_path)
+            with self.assertRaisesRegex(GraalError, 'no result'):
+                _ = [commit for commit in cl.fetch(category=CATEGORY_COLIC_SCANCODE_CLI)]
+
+        def scan_unexpected(file_paths, stream=False):
+            yield from scan(file_paths + ['unexpected.py'], stream)
+
+        with unittest.mock.patch.object(LicenseAnalyzer, 'analyze', side_effect=scan_unexpected):
+            cl = CoLic('http://example.com', self.git_path, self.worktree_path, exec_path=exec_path)
+            with self.assertRaisesRegex(GraalError, 'unexpected result for unexpected.py'):
+                _ = [commit for commit in cl.fetch(category=CATEGORY_COLIC_SCANCODE_CLI)]
+
     def test_fetch_unknown(self):
         """Test whether commits are properly processed"""
 
@@ -278,6 +494,100 @@ class TestLicenseAnalyzer(TestCaseAnalyzer):
         self.assertIn('licenses', analysis[0])
         self.assertIn('copyrights', analysis[0])
 
+    def test_analyze_files(self):
+        """Test whether the analyze_files method returns the results of each file"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        license_analyzer = LicenseAnalyzer(NOMOS_PATH)
+        results = license_analyzer.analyze_files([file_path])
+
+        self.assertDictEqual(results[file_path], license_analyzer.analyze(file_path))
+
+        license_analyzer = LicenseAnalyzer(SCANCODE_PATH, kind=SCANCODE, scancode_workers=2)
+        results = license_analyzer.analyze_files([file_path])
+
+        self.assertIn('licenses', results[file_path])
+        self.assertIn('copyrights', results[file_path])
+        license_analyzer.close()
+
+    def test_empty_result(self):
+        """Test whether the empty results have the fields of each analyzer"""
+
+        license_analyzer = LicenseAnalyzer(NOMOS_PATH)
+        self.assertDictEqual(license_analyzer.empty_result(), {'licenses': []})
+
+        license_analyzer = LicenseAnalyzer(SCANCODE_PATH, kind=SCANCODE)
+        self.assertDictEqual(license_analyzer.empty_result(), {'licenses': [], 'copyrights': []})
+
+
+class TestLicensePrefilter(unittest.TestCase):
+    """LicensePrefilter tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def write(self, name, content):
+        file_path = os.path.join(self.tmp_path, name)
+        with open(file_path, 'wb') as fd:
+            fd.write(content)
+        return file_path
+
+    def test_init(self):
+        """Test whether the maximum size is set in bytes"""
+
+        prefilter = LicensePrefilter()
+        self.assertEqual(prefilter.max_size, DEFAULT_PREFILTER_MAX_SIZE * 1024)
+
+        prefilter = LicensePrefilter(max_size=1)
+        self.assertEqual(prefilter.max_size, 1024)
+
+    def test_screen(self):
+        """Test whether the files with license signals are analyzed"""
+
+        prefilter = LicensePrefilter()
+
+        file_path = self.write('a.py', b'# Copyright (C) 2015-2020 Bitergia\nimport os\n')
+        self.assertIsNone(prefilter.screen(file_path))
+
+        file_path = self.write('b.js', b'/*! SPDX-License-Identifier: MIT */\n')
+        self.assertIsNone(prefilter.screen(file_path))
+
+        file_path = self.write('c.c', b'/* \xc2\xa9 Bitergia */\n')
+        self.assertIsNone(prefilter.screen(file_path))
+
+        # the signals are searched at the tail of the files too
+        file_path = self.write('d.py', b'x = 1\n' * PREFILTER_WINDOW + b'# Licensed under the GPL\n')
+        self.assertIsNone(prefilter.screen(file_path))
+
+        # the files that can not be read are left to the analyzers
+        self.assertIsNone(prefilter.screen(os.path.join(self.tmp_path, 'missing')))
+
+    def test_screen_skipped(self):
+        """Test whether the files without license signals are skipped"""
+
+        prefilter = LicensePrefilter(max_size=1)
+
+        file_path = self.write('a.py', b'import os\n')
+        self.assertEqual(prefilter.screen(file_path), NO_SIGNALS)
+
+        file_path = self.write('empty.py', b'')
+        self.assertEqual(prefilter.screen(file_path), NO_SIGNALS)
+
+        file_path = self.write('a.png', b'\x89PNG\r\n\x1a\n\x00\x00 copyright')
+        self.assertEqual(prefilter.screen(file_path), BINARY)
+
+        file_path = self.write('bundle.js', b'/* Copyright */' + b'x' * 1024)
+        self.assertEqual(prefilter.screen(file_path), TOO_LARGE)
+
+        # the signals in the middle of large files are not searched
+        prefilter = LicensePrefilter()
+        content = b'x = 1\n' * PREFILTER_WINDOW
+        file_path = self.write('b.py', content + b'# Copyright\n' + content)
+        self.assertEqual(prefilter.screen(file_path), NO_SIGNALS)
+
 
 class TestCoLicCommand(unittest.TestCase):
     """CoLicCommand tests"""
@@ -307,6 +617,30 @@ class TestCoLicCommand(unittest.TestCase):
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
         self.assertEqual(parsed_args.exec_path, '/tmp/execpath')
+        self.assertEqual(parsed_args.scancode_workers, 0)
+        self.assertEqual(parsed_args.scancode_processes, 1)
+        self.assertFalse(parsed_args.shared_cache)
+        self.assertFalse(parsed_args.prefilter)
+        self.assertEqual(parsed_args.prefilter_max_size, DEFAULT_PREFILTER_MAX_SIZE)
+        self.assertEqual(parsed_args.jobs, 1)
+
+        args = ['http://example.com/',
+                '--git-path', '/tmp/gitpath',
+                '--exec-path', '/tmp/execpath',
+                '--scancode-workers', '4',
+                '--scancode-processes', '2',
+                '--shared-cache',
+                '--prefilter',
+                '--prefilter-max-size', '10',
+                '--jobs', '4']
+
+        parsed_args = parser.parse(*args)
+        self.assertEqual(parsed_args.scancode_workers, 4)
+        self.assertEqual(parsed_args.scancode_processes, 2)
+        self.assertTrue(parsed_args.shared_cache)
+        self.assertTrue(parsed_args.prefilter)
+        self.assertEqual(parsed_args.prefilter_max_size, 10)
+        self.assertEqual(parsed_args.jobs, 4)
 
 
 if __name__ == "__main__":
@@ -107,6 +107,19 @@ class TestCoQuaBackend(TestCaseRepo):
         self.assertEqual(type(result['warnings']), int)
         self.assertNotIn('lines', result)
 
+    def test_fetch_flake8_workers(self):
+        """Test whether the results do not depend on the worker analyzing the commit"""
+
+        cq = CoQua('http://example.com', self.git_path,
+                   self.worktree_path, entrypoint="perceval", details=True)
+        expected = [commit['data']['analysis'] for commit in cq.fetch(category=CATEGORY_COQUA_FLAKE8)]
+
+        cq = CoQua('http://example.com', self.git_path,
+                   self.worktree_path, entrypoint="perceval", details=True, workers=2)
+        commits = [commit['data']['analysis'] for commit in cq.fetch(category=CATEGORY_COQUA_FLAKE8)]
+
+        self.assertListEqual(commits, expected)
+
     def test_fetch_error(self):
         """Test whether an exception is thrown when the module isn't defined and the category is pylint or flake8"""
 
@@ -195,6 +208,13 @@ class TestCoQuaJadolintBackend(TestCaseRepo):
         self.assertEqual(cq.origin, 'http://example.com')
         self.assertEqual(cq.tag, 'test')
         self.assertEqual(cq.exec_path, JADOLINT_PATH)
+        self.assertEqual(cq.jobs, 1)
+        self.assertFalse(cq.jadolint_host)
+
+        cq = CoQua('http://example.com', self.git_path, self.worktree_path, exec_path=JADOLINT_PATH, jobs=3,
+                   jadolint_host=True)
+        self.assertEqual(cq.jobs, 3)
+        self.assertTrue(cq.jadolint_host)
 
     def test_fetch(self):
         """Test whether commits are properly processed"""
@@ -269,6 +289,23 @@ class TestCoQuaJadolintBackend(TestCaseRepo):
         expected_smells.sort()
         self.assertListEqual(analysis['Dockerfile'][SMELLS], expected_smells)
 
+    def test_fetch_jobs(self):
+        """Test whether the files of a commit analyzed at the same time are returned in order"""
+
+        in_paths = ['Dockerfile', 'Dockerfile-full', 'Dockerfile-secured']
+        cq = CoQua('http://example.com', self.git_path, self.worktree_path,
+                   exec_path=JADOLINT_PATH, in_paths=in_paths)
+        expected = [commit['data']['analysis'] for commit in cq.fetch(category=CATEGORY_COQUA_JADOLINT)]
+
+        cq = CoQua('http://example.com', self.git_path, self.worktree_path,
+                   exec_path=JADOLINT_PATH, in_paths=in_paths, jobs=3)
+        commits = [commit['data']['analysis'] for commit in cq.fetch(category=CATEGORY_COQUA_JADOLINT)]
+
+        self.assertEqual(len(commits), len(expected))
+        for analysis, expected_analysis in zip(commits, expected):
+            self.assertListEqual(list(analysis.keys()), list(expected_analysis.keys()))
+            self.assertDictEqual(analysis, expected_analysis)
+
     def test_fetch_empty(self):
         """Test whether no commits are returned"""
 
@@ -429,13 +466,17 @@ class TestCoDepCommand(unittest.TestCase):
         self.assertEqual(parsed_args.git_path, '/tmp/gitpath')
         self.assertEqual(parsed_args.tag, 'test')
         self.assertEqual(parsed_args.from_date, DEFAULT_DATETIME)
+        self.assertEqual(parsed_args.jobs, 1)
+        self.assertFalse(parsed_args.jadolint_host)
 
         args = ['http://example.com/',
                 '--git-path', '/tmp/gitpath',
                 '--tag', 'test',
                 '--exec-path', JADOLINT_PATH,
                 '--category', CATEGORY_COQUA_JADOLINT,
-                '--in-paths', 'Dockerfile', 'Dockerfile-full', 'Dockerfile-secured']
+                '--in-paths', 'Dockerfile', 'Dockerfile-full', 'Dockerfile-secured',
+                '--jobs', '3',
+                '--jadolint-host']
 
         parsed_args = parser.parse(*args)
         self.assertEqual(parsed_args.uri, 'http://example.com/')
@@ -445,6 +486,8 @@ class TestCoDepCommand(unittest.TestCase):
         self.assertEqual(parsed_args.category, CATEGORY_COQUA_JADOLINT),
         self.assertEqual(parsed_args.exec_path, JADOLINT_PATH)
         self.assertListEqual(parsed_args.in_paths, ['Dockerfile', 'Dockerfile-full', 'Dockerfile-secured'])
+        self.assertEqual(parsed_args.jobs, 3)
+        self.assertTrue(parsed_args.jadolint_host)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import copy
+import io
+import json
+import unittest
+
+from graal.delta import (decode,
+                         encode,
+                         read_items)
+from graal.graal import GraalError
+
+
+def row(file_path, loc):
+    return {'file_path': file_path, 'loc': loc, 'in_commit': False}
+
+
+COMMITS = [
+    {'commit': 'a', 'analysis': [row('b.py', 1), row('a.py', 1)]},
+    {'commit': 'b', 'analysis': [row('a.py', 2), row('b.py', 1)]},
+    {'commit': 'c', 'analysis': [row('a.py', 2), row('b.py', 1), row('c.py', 3)]},
+    {'commit': 'd', 'analysis': [row('c.py', 3)]},
+    {'commit': 'e', 'analysis': [row('c.py', 4), row('d.py', 5)]}
+]
+
+
+class TestDelta(unittest.TestCase):
+    """Delta encoding tests"""
+
+    def test_encode(self):
+        """Test whether only the rows changed are kept, except for the keyframes"""
+
+        commits = list(encode(copy.deepcopy(COMMITS), keyframe_interval=3))
+
+        self.assertDictEqual(commits[0]['delta'], {'keyframe': True})
+        self.assertListEqual(commits[0]['analysis'], COMMITS[0]['analysis'])
+
+        self.assertDictEqual(commits[1]['delta'], {'keyframe': False, 'base': 'a', 'removed': []})
+        self.assertListEqual(commits[1]['analysis'], [row('a.py', 2)])
+
+        self.assertDictEqual(commits[2]['delta'], {'keyframe': False, 'base': 'b', 'removed': []})
+        self.assertListEqual(commits[2]['analysis'], [row('c.py', 3)])
+
+        self.assertDictEqual(commits[3]['delta'], {'keyframe': True})
+        self.assertListEqual(commits[3]['analysis'], [row('c.py', 3)])
+
+        self.assertDictEqual(commits[4]['delta'], {'keyframe': False, 'base': 'd', 'removed': []})
+        self.assertListEqual(commits[4]['analysis'], [row('c.py', 4), row('d.py', 5)])
+
+        commits = list(encode(copy.deepcopy(COMMITS)))
+        self.assertDictEqual(commits[3]['delta'], {'keyframe': False, 'base': 'c', 'removed': ['a.py', 'b.py']})
+        self.assertListEqual(commits[3]['analysis'], [])
+
+    def test_encode_dict(self):
+        """Test whether the analyses indexed by key are encoded"""
+
+        commits = [
+            {'commit': 'a', 'analysis': {'Python': {'loc': 1}, 'Java': {'loc': 2}}},
+            {'commit': 'b', 'analysis': {'Python': {'loc': 3}}}
+        ]
+        commits = list(encode(commits))
+
+        self.assertDictEqual(commits[1]['analysis'], {'Python': {'loc': 3}})
+        self.assertDictEqual(commits[1]['delta'], {'keyframe': False, 'base': 'a', 'removed': ['Java']})
+
+    def test_decode(self):
+        """Test whether the full analyses are reconstructed"""
+
+        for keyframe_interval in [1, 2, 3, 100]:
+            commits = list(encode(copy.deepcopy(COMMITS), keyframe_interval=keyframe_interval))
+            items = [{'data': commit} for commit in commits]
+
+            decoded = [item['data'] for item in decode(items)]
+
+            for commit, expected in zip(decoded, COMMITS):
+                self.assertNotIn('delta', commit)
+                self.assertEqual(commit['commit'], expected['commit'])
+                self.assertListEqual(commit['analysis'],
+                                     sorted(expected['analysis'], key=lambda r: r['file_path']))
+
+    def test_decode_not_encoded(self):
+        """Test whether the items not encoded are returned as they are"""
+
+        decoded = list(decode(copy.deepcopy(COMMITS)))
+        self.assertListEqual([commit['commit'] for commit in decoded], ['a', 'b', 'c', 'd', 'e'])
+
+    def test_decode_missing_keyframe(self):
+        """Test whether an exception is thrown when the first item is not a keyframe"""
+
+        commits = list(encode(copy.deepcopy(COMMITS)))
+
+        with self.assertRaises(GraalError):
+            _ = list(decode(commits[1:]))
+
+    def test_decode_missing_base(self):
+        """Test whether an exception is thrown when an item is missing"""
+
+        commits = list(encode(copy.deepcopy(COMMITS)))
+        del commits[2]
+
+        with self.assertRaises(GraalError):
+            _ = list(decode(commits))
+
+    def test_read_items(self):
+        """Test whether the items written in sequence are read"""
+
+        content = '\n'.join([json.dumps(commit, indent=4, sort_keys=True) for commit in COMMITS]) + '\n'
+        items = list(read_items(io.StringIO(content)))
+
+        self.assertListEqual(items, COMMITS)
+        self.assertListEqual(list(read_items(io.StringIO(''))), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,8 +24,12 @@
 import io
 import os
 import shutil
+import sqlite3
+import subprocess
 import tarfile
 import tempfile
+import threading
+import time
 import unittest
 import unittest.mock
 
@@ -34,13 +38,19 @@ from perceval.errors import RepositoryError
 from perceval.utils import DEFAULT_DATETIME, DEFAULT_LAST_DATETIME
 
 import graal
-from graal.graal import (DEFAULT_WORKTREE_PATH,
+from graal.graal import (CHECKPOINTS_SUFFIX,
+                         DEFAULT_CACHE_SIZE,
+                         DEFAULT_WORKTREE_PATH,
+                         PREFETCH_SUFFIX,
+                         WORKER_LOCK_SUFFIX,
                          CATEGORY_GRAAL,
                          GIT_EXEC_PATH,
                          Graal,
                          GraalCommand,
+                         GraalError,
                          GraalRepository,
                          GraalCommandArgumentParser,
+                         cpu_count,
                          logger)
 from base_repo import TestCaseRepo
 
@@ -71,16 +81,28 @@ class MockedGraalRepository(GraalRepository):
                       encoding=encoding)
 
 
+class MockedAnalyzer:
+
+    version = '0.1.0'
+
+    def analyze(self, file_path):
+        return {}
+
+
 class MockedGraal(Graal):
 
     CATEGORIES = [CATEGORY_MOCKED]
 
     def __init__(self, uri, gitpath, worktreepath=DEFAULT_WORKTREE_PATH,
                  entrypoint=None, in_paths=None, out_paths=None, details=False,
+                 workers=1, cache_path=None, cache_size=DEFAULT_CACHE_SIZE,
+                 blob_checkout=False, sparse_checkout=False, resume=False, prefetch=False,
                  tag=None, archive=None, raise_exception=False):
         super().__init__(uri, gitpath, worktreepath=worktreepath, entrypoint=entrypoint,
                          in_paths=in_paths, out_paths=out_paths, details=details,
-                         tag=tag, archive=archive)
+                         workers=workers, cache_path=cache_path, cache_size=cache_size,
+                         blob_checkout=blob_checkout, sparse_checkout=sparse_checkout,
+                         resume=resume, prefetch=prefetch, tag=tag, archive=archive)
         self.raise_exception = raise_exception
 
     def fetch(self, category=CATEGORY_MOCKED, paths=None,
@@ -143,6 +165,58 @@ class MockedGraal(Graal):
         return commit
 
 
+class SlowMockedGraal(MockedGraal):
+    """Backend taking a while to analyze a commit, and reporting the working tree used"""
+
+    def _analyze(self, commit, paths=None):
+        time.sleep(0.2)
+        return {'worktree': self.worktreepath}
+
+
+class ScopedMockedGraal(MockedGraal):
+    """Backend analyzing the content of the `perceval` directory"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.analyzed = []
+
+    def _analysis_scope(self):
+        return 'perceval'
+
+    def _analyze(self, commit, paths=None):
+        self.analyzed.append(commit['commit'])
+        files = GraalRepository.files(os.path.join(self.worktreepath, 'perceval'))
+        return {'num_files': len(files)}
+
+    def _reuse_analysis(self, commit, analysis):
+        analysis['reused'] = True
+        return analysis
+
+
+class PathsMockedGraal(ScopedMockedGraal):
+    """Backend returning paths of the working tree"""
+
+    def _analyze(self, commit, paths=None):
+        self.analyzed.append(commit['commit'])
+        return {'path': os.path.join(self.worktreepath, 'perceval'),
+                os.path.join(self.worktreepath, 'perceval'): ['at %s/setup.py' % self.worktreepath, 1]}
+
+
+class BlobMockedGraal(MockedGraal):
+    """Backend analyzing the files modified by each commit"""
+
+    def _materialize_paths(self, commit):
+        return [f.get('newfile', f['file']) for f in commit['files']]
+
+    def _analyze(self, commit, paths=None):
+        files = []
+        for root, dirs, names in os.walk(self.worktreepath):
+            files.extend([os.path.relpath(os.path.join(root, name), self.worktreepath)
+                          for name in names if name != '.git'])
+
+        return {'files': sorted(files)}
+
+
 class MockedGraalCommand(GraalCommand):
     BACKEND = MockedGraal
 
@@ -187,6 +261,7 @@ class TestGraalBackend(TestCaseRepo):
         self.assertIsNone(graal.in_paths)
         self.assertIsNone(graal.out_paths)
         self.assertFalse(graal.details)
+        self.assertEqual(graal.workers, 1)
         self.assertIsNone(graal.exec_path)
 
         # When tag is empty or None it will be set to the value in uri
@@ -267,11 +342,446 @@ class TestGraalBackend(TestCaseRepo):
         self.assertFalse('parents' in commit['data'])
         self.assertFalse('refs' in commit['data'])
 
+    def test_fetch_analysis_close_analyzer(self):
+        """Test whether the analyzer is closed at the end of the fetch"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        mocked.analyzer = unittest.mock.Mock()
+        commits = [commit for commit in mocked.fetch()]
+
+        self.assertEqual(len(commits), 6)
+        mocked.analyzer.close.assert_called_once_with()
+
+        # the analyzer is closed also when the items are no longer consumed
+        mocked.analyzer = unittest.mock.Mock()
+        items = mocked.fetch()
+        _ = next(items)
+        items.close()
+
+        mocked.analyzer.close.assert_called_once_with()
+        self.assertFalse(os.path.exists(mocked.worktreepath))
+
+        # and when the fetch fails
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, raise_exception=True)
+        mocked.analyzer = unittest.mock.Mock()
+        with self.assertRaises(Exception):
+            _ = [commit for commit in mocked.fetch()]
+
+        mocked.analyzer.close.assert_called_once_with()
+        self.assertFalse(os.path.exists(mocked.worktreepath))
+
     def test_fetch_analysis_on_error(self):
         mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, raise_exception=True)
         with self.assertRaises(Exception):
             _ = [commit for commit in mocked.fetch()]
 
+    def test_fetch_analysis_same_tree(self):
+        """Test whether the analysis of an already analyzed tree is reused"""
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path)
+        commits = [commit for commit in mocked.fetch()]
+
+        self.assertEqual(len(commits), 6)
+        self.assertListEqual(mocked.analyzed, ['075f0c6161db5a3b1c8eca45e08b88469bb148b9',
+                                               'aa57404bbfcd4c7e4d1f93308cf9299524394adb',
+                                               'd256c971afce9e2ddca0b34d74a4d3ce7f57dd4d'])
+
+        analyses = [commit['data']['analysis'] for commit in commits]
+        self.assertDictEqual(analyses[0], {'num_files': 12})
+        self.assertDictEqual(analyses[1], {'num_files': 12, 'reused': True})
+        self.assertDictEqual(analyses[2], {'num_files': 12, 'reused': True})
+        self.assertDictEqual(analyses[3], {'num_files': 13})
+        self.assertDictEqual(analyses[4], {'num_files': 13})
+        self.assertDictEqual(analyses[5], {'num_files': 12, 'reused': True})
+
+        # Analyses are shared with the workers and stored in the cache
+        cache_path = os.path.join(self.tmp_path, 'cache.db')
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                   workers=2, cache_path=cache_path)
+        commits = [commit for commit in mocked.fetch()]
+        self.assertListEqual([commit['data']['analysis']['num_files'] for commit in commits],
+                             [analysis['num_files'] for analysis in analyses])
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                   cache_path=cache_path)
+        commits = [commit for commit in mocked.fetch()]
+        self.assertListEqual(mocked.analyzed, [])
+        for commit in commits:
+            self.assertTrue(commit['data']['analysis']['reused'])
+
+    def test_fetch_analysis_same_tree_options(self):
+        """Test whether the analyses stored for a tree are only reused with the same options"""
+
+        cache_path = os.path.join(self.tmp_path, 'cache.db')
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                   cache_path=cache_path)
+        mocked.analyzer = MockedAnalyzer()
+        _ = [commit for commit in mocked.fetch()]
+        self.assertEqual(len(mocked.analyzed), 3)
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                   cache_path=cache_path, entrypoint='perceval')
+        mocked.analyzer = MockedAnalyzer()
+        _ = [commit for commit in mocked.fetch()]
+        self.assertEqual(len(mocked.analyzed), 3)
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                   cache_path=cache_path)
+        mocked.analyzer = MockedAnalyzer()
+        with unittest.mock.patch.object(MockedAnalyzer, 'version', '0.2.0'):
+            _ = [commit for commit in mocked.fetch()]
+        self.assertEqual(len(mocked.analyzed), 3)
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                   cache_path=cache_path)
+        mocked.analyzer = MockedAnalyzer()
+        with unittest.mock.patch.object(ScopedMockedGraal, '_analysis_options', return_value={'option': True}):
+            _ = [commit for commit in mocked.fetch()]
+        self.assertEqual(len(mocked.analyzed), 3)
+
+        # the commits whose tree was already analyzed are not checked out
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                   cache_path=cache_path, prefetch=True)
+        mocked.analyzer = MockedAnalyzer()
+        with unittest.mock.patch.object(GraalRepository, 'checkout') as checkout_mock:
+            commits = [commit for commit in mocked.fetch()]
+        self.assertEqual(len(commits), 6)
+        self.assertListEqual(mocked.analyzed, [])
+        checkout_mock.assert_not_called()
+
+    def test_fetch_analysis_same_tree_paths(self):
+        """Test whether the paths of the working tree do not depend on where the commits are analyzed"""
+
+        def analyses(mocked):
+            # the commits whose analysis is reused depend on the order they are analyzed
+            commits = [commit['data']['analysis'] for commit in mocked.fetch()]
+            for analysis in commits:
+                analysis.pop('reused', None)
+            return commits
+
+        mocked = PathsMockedGraal('http://example.com', self.git_path, self.worktree_path)
+        expected = analyses(mocked)
+        for analysis in expected:
+            self.assertEqual(analysis['path'], os.path.join(mocked.worktreepath, 'perceval'))
+
+        cache_path = os.path.join(self.tmp_path, 'cache.db')
+        mocked = PathsMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                  workers=2, cache_path=cache_path)
+        self.assertListEqual(analyses(mocked), expected)
+
+        mocked = PathsMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                  prefetch=True)
+        self.assertListEqual(analyses(mocked), expected)
+
+    def test_cached_analysis(self):
+        """Test whether the analysis of files with the same content is reused"""
+
+        cache_path = os.path.join(self.tmp_path, 'cache.db')
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             cache_path=cache_path, cache_size=10)
+        mocked.analyzer = MockedAnalyzer()
+        self.assertEqual(mocked.cache.path, cache_path)
+        self.assertEqual(mocked.cache.max_size, 10 * 1024 * 1024)
+
+        file_a = os.path.join(self.tmp_path, 'a.py')
+        file_b = os.path.join(self.tmp_path, 'b.py')
+        for file_path in [file_a, file_b]:
+            with open(file_path, 'w') as fd:
+                fd.write('print("graal")\n')
+
+        analyze = unittest.mock.Mock(return_value={'loc': 1})
+
+        self.assertDictEqual(mocked._cached_analysis(file_a, analyze, details=False), {'loc': 1})
+        self.assertDictEqual(mocked._cached_analysis(file_b, analyze, details=False), {'loc': 1})
+        self.assertEqual(analyze.call_count, 1)
+
+        self.assertDictEqual(mocked._cached_analysis(file_b, analyze, details=True), {'loc': 1})
+        self.assertEqual(analyze.call_count, 2)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        self.assertIsNone(mocked.cache)
+        self.assertDictEqual(mocked._cached_analysis(file_a, analyze), {'loc': 1})
+        self.assertEqual(analyze.call_count, 3)
+
+    def test_cached_analyses(self):
+        """Test whether only the files not found in the cache are analyzed at once"""
+
+        cache_path = os.path.join(self.tmp_path, 'cache.db')
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, cache_path=cache_path)
+        mocked.analyzer = MockedAnalyzer()
+
+        file_paths = []
+        for name, content in [('a.py', 'print("graal")\n'), ('b.py', 'print("graal")\n'), ('c.py', 'pass\n')]:
+            file_path = os.path.join(self.tmp_path, name)
+            with open(file_path, 'w') as fd:
+                fd.write(content)
+            file_paths.append(file_path)
+
+        def analyze(paths):
+            return {path: {'file': os.path.basename(path)} for path in paths}
+
+        analyze = unittest.mock.Mock(side_effect=analyze)
+
+        results = mocked._cached_analyses(file_paths[:1], analyze)
+        self.assertDictEqual(results, {file_paths[0]: {'file': 'a.py'}})
+        analyze.assert_called_once_with([file_paths[0]])
+
+        # b.py has the same content of a.py
+        results = mocked._cached_analyses(file_paths, analyze)
+        self.assertDictEqual(results, {file_paths[0]: {'file': 'a.py'},
+                                       file_paths[1]: {'file': 'a.py'},
+                                       file_paths[2]: {'file': 'c.py'}})
+        analyze.assert_called_with([file_paths[2]])
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        self.assertEqual(len(mocked._cached_analyses(file_paths, analyze)), 3)
+        self.assertDictEqual(mocked._cached_analyses([], analyze), {})
+        self.assertEqual(analyze.call_count, 3)
+
+    def test_map_files(self):
+        """Test whether the files are analyzed by a bounded pool of threads, keeping their order"""
+
+        lock = threading.Lock()
+        running = []
+        max_running = []
+
+        def analyze(path):
+            with lock:
+                running.append(path)
+                max_running.append(len(running))
+
+            # the first files are the slowest ones
+            threading.Event().wait(0.05 if path < 'c' else 0.01)
+
+            with lock:
+                running.remove(path)
+            return {'file': path, 'thread': threading.get_ident()}
+
+        file_paths = ['a', 'b', 'c', 'd', 'e', 'f']
+        results = Graal._map_files(analyze, file_paths, jobs=3)
+        self.assertListEqual([result['file'] for result in results], file_paths)
+        self.assertLessEqual(max(max_running), 3)
+        self.assertGreater(max(max_running), 1)
+
+        max_running.clear()
+        results = Graal._map_files(analyze, file_paths)
+        self.assertListEqual([result['file'] for result in results], file_paths)
+        self.assertEqual(max(max_running), 1)
+        self.assertEqual({result['thread'] for result in results}, {threading.get_ident()})
+
+        self.assertListEqual(Graal._map_files(analyze, [], jobs=3), [])
+
+    def test_fetch_analysis_workers(self):
+        """Test whether commits analyzed in parallel are returned in order"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        expected = [commit['data'] for commit in mocked.fetch()]
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, workers=3)
+        commits = [commit['data'] for commit in mocked.fetch()]
+
+        self.assertEqual(len(commits), 6)
+        self.assertListEqual(commits, expected)
+        self.assertFalse(os.path.exists(mocked.worktreepath))
+        for i in range(3):
+            self.assertFalse(os.path.exists(mocked.worktreepath + '-' + str(i)))
+
+    @unittest.mock.patch('graal.graal.WORKER_MAX_TASKS', 1)
+    def test_fetch_analysis_workers_replaced(self):
+        """Test whether the workers replacing others take over their working trees"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        expected = [commit['data'] for commit in mocked.fetch()]
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path, workers=2)
+        commits = [commit['data'] for commit in mocked.fetch()]
+
+        self.assertListEqual([commit['commit'] for commit in commits],
+                             [commit['commit'] for commit in expected])
+        self.assertListEqual([commit['analysis']['num_files'] for commit in commits], [12, 12, 12, 13, 13, 12])
+        for i in range(3):
+            self.assertFalse(os.path.exists(mocked.worktreepath + '-' + str(i)))
+            self.assertFalse(os.path.exists(mocked.worktreepath + '-' + str(i) + WORKER_LOCK_SUFFIX))
+
+    def test_fetch_analysis_blob_checkout(self):
+        """Test whether only the files modified by the commits are written to the working tree"""
+
+        mocked = BlobMockedGraal('http://example.com', self.git_path, self.worktree_path, blob_checkout=True)
+        commits = [commit['data'] for commit in mocked.fetch()]
+
+        self.assertEqual(len(commits), 6)
+        self.assertEqual(len(commits[0]['analysis']['files']), 12)
+        self.assertListEqual(commits[1]['analysis']['files'], ['.travis.yml'])
+        self.assertListEqual(commits[2]['analysis']['files'], ['.gitattributes', '.gitignore'])
+        self.assertListEqual(commits[4]['analysis']['files'], ['perceval/backends/graal.py'])
+        self.assertListEqual(commits[5]['analysis']['files'], [])
+
+        # Backends not opting in check out the whole commit
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, blob_checkout=True)
+        expected = [commit['data'] for commit in MockedGraal('http://example.com', self.git_path,
+                                                             self.worktree_path).fetch()]
+        self.assertListEqual([commit['data'] for commit in mocked.fetch()], expected)
+
+    def test_fetch_analysis_sparse_checkout(self):
+        """Test whether only the analysis scope is checked out"""
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path)
+        expected = [commit['data'] for commit in mocked.fetch()]
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path, sparse_checkout=True)
+        self.assertListEqual(mocked._sparse_paths(), ['perceval'])
+        self.assertListEqual([commit['data'] for commit in mocked.fetch()], expected)
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path,
+                                   workers=2, sparse_checkout=True)
+        self.assertListEqual([commit['data']['analysis']['num_files'] for commit in mocked.fetch()],
+                             [commit['analysis']['num_files'] for commit in expected])
+
+    def test_fetch_analysis_sparse_checkout_no_scope(self):
+        """Test whether the sparse checkout is disabled when the whole working tree is analyzed"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, sparse_checkout=True)
+        self.assertIsNone(mocked._sparse_paths())
+
+        with self.assertLogs(logger, level='WARNING') as cm:
+            commits = [commit for commit in mocked.fetch()]
+            self.assertEqual(cm.output[0], 'WARNING:graal.graal:Sparse checkout disabled, '
+                                           'the analysis needs the whole working tree')
+
+        self.assertEqual(len(commits), 6)
+
+    def test_fetch_analysis_prefetch(self):
+        """Test whether commits analyzed by the prefetch pipeline are returned in order"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        expected = [commit['data'] for commit in mocked.fetch()]
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, prefetch=True)
+        commits = [commit['data'] for commit in mocked.fetch()]
+
+        self.assertListEqual(commits, expected)
+        self.assertEqual(mocked.worktreepath, os.path.join(self.worktree_path, 'graaltest'))
+        self.assertFalse(os.path.exists(mocked.worktreepath))
+        self.assertFalse(os.path.exists(mocked.worktreepath + PREFETCH_SUFFIX))
+
+        mocked = ScopedMockedGraal('http://example.com', self.git_path, self.worktree_path, prefetch=True)
+        commits = [commit['data'] for commit in mocked.fetch()]
+        self.assertListEqual([commit['analysis']['num_files'] for commit in commits], [12, 12, 12, 13, 13, 12])
+        self.assertEqual(len(mocked.analyzed), 3)
+
+    def test_fetch_analysis_prefetch_interrupted(self):
+        """Test whether the prefetch pipeline is stopped when the items are no longer consumed"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, prefetch=True)
+        items = mocked.fetch()
+        _ = next(items)
+        items.close()
+
+        self.assertEqual(threading.active_count(), 1)
+        self.assertFalse(os.path.exists(mocked.worktreepath + PREFETCH_SUFFIX))
+
+    def test_fetch_analysis_prefetch_on_error(self):
+        """Test whether errors raised in the prefetch pipeline are propagated"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             prefetch=True, raise_exception=True)
+        with self.assertRaises(Exception):
+            _ = [commit for commit in mocked.fetch()]
+        self.assertEqual(threading.active_count(), 1)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, prefetch=True)
+        with unittest.mock.patch.object(GraalRepository, 'checkout', side_effect=RepositoryError(cause='oops!')):
+            with self.assertRaises(RepositoryError):
+                _ = [commit for commit in mocked.fetch()]
+        self.assertEqual(threading.active_count(), 1)
+
+    def test_fetch_analysis_prefetch_backend(self):
+        """Test whether the prefetch pipeline does not alter the working tree of the backend"""
+
+        mocked = SlowMockedGraal('http://example.com', self.git_path, self.worktree_path, prefetch=True)
+        worktreepath = mocked.worktreepath
+
+        analyzed_on = []
+        for commit in mocked.fetch():
+            self.assertEqual(mocked.worktreepath, worktreepath)
+            self.assertEqual(mocked.graalRepo.worktreepath, worktreepath)
+            analyzed_on.append(commit['data']['analysis']['worktree'])
+
+        self.assertEqual(len(analyzed_on), 6)
+        self.assertIn(worktreepath + PREFETCH_SUFFIX, analyzed_on)
+
+    def test_fetch_analysis_prefetch_checkout_error(self):
+        """Test whether the items checked out before a checkout error are returned before raising it"""
+
+        checkout = GraalRepository.checkout
+        checked_out = []
+
+        def failing_checkout(repo, hash):
+            if len(checked_out) == 2:
+                raise RepositoryError(cause='oops!')
+            checked_out.append(hash)
+            return checkout(repo, hash)
+
+        mocked = SlowMockedGraal('http://example.com', self.git_path, self.worktree_path, prefetch=True)
+        commits = []
+        with unittest.mock.patch.object(GraalRepository, 'checkout', autospec=True, side_effect=failing_checkout):
+            with self.assertRaises(RepositoryError):
+                for commit in mocked.fetch():
+                    commits.append(commit['data']['commit'])
+
+        self.assertListEqual(commits, checked_out)
+        self.assertEqual(threading.active_count(), 1)
+
+    def test_fetch_resume(self):
+        """Test whether the commits emitted by a previous run are skipped"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, resume=True)
+        self.assertEqual(mocked.checkpoints.path, self.git_path + CHECKPOINTS_SUFFIX)
+
+        # the run is interrupted after receiving three commits, thus the
+        # last one is not recorded as emitted
+        items = mocked.fetch()
+        commits = [next(items)['data']['commit'] for _ in range(3)]
+        items.close()
+        self.assertTrue(os.path.exists(mocked.checkpoints.path))
+
+        # the checkpoints depend on the options of the run and on the commits selected
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, resume=True, details=True)
+        self.assertEqual(len([commit for commit in mocked.fetch()]), 6)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, resume=True)
+        items = mocked.fetch(to_date=str_to_datetime('2019-01-01'))
+        self.assertEqual(len([commit for commit in items]), 3)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, resume=True)
+        resumed = [commit['data']['commit'] for commit in mocked.fetch()]
+        self.assertEqual(len(resumed), 4)
+        self.assertEqual(resumed[0], commits[2])
+        self.assertListEqual(commits[:2] + resumed, self.__commit_hashes())
+
+        # the checkpoints of the runs are removed once they are complete
+        with sqlite3.connect(mocked.checkpoints.path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0], 0)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path, resume=True, workers=2)
+        self.assertEqual(len([commit for commit in mocked.fetch()]), 6)
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        self.assertIsNone(mocked.checkpoints)
+        self.assertEqual(len([commit for commit in mocked.fetch()]), 6)
+
+    def __commit_hashes(self):
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path)
+        return [commit['data']['commit'] for commit in mocked.fetch()]
+
+    def test_fetch_analysis_workers_on_error(self):
+        """Test whether errors raised in the worker processes are propagated"""
+
+        mocked = MockedGraal('http://example.com', self.git_path, self.worktree_path,
+                             workers=2, raise_exception=True)
+        with self.assertRaises(GraalError):
+            _ = [commit for commit in mocked.fetch()]
+
 
 class TestGraalRepository(TestCaseRepo):
     """GraalRepository tests"""
@@ -341,6 +851,25 @@ class TestGraalRepository(TestCaseRepo):
         repo.prune()
         self.assertFalse(os.path.exists(repo.worktreepath))
 
+    def test_worktree_detached(self):
+        """Test whether several working trees are created from the same branch"""
+
+        new_path = os.path.join(self.tmp_path, 'testworktree')
+        other_path = os.path.join(self.tmp_path, 'otherworktree')
+
+        repo = GraalRepository('http://example.git', self.git_path)
+        repo.worktree(new_path, branch='master', detach=True)
+        other_repo = GraalRepository('http://example.git', self.git_path)
+        other_repo.worktree(other_path, branch='master', detach=True)
+
+        self.assertTrue(os.path.exists(repo.worktreepath))
+        self.assertTrue(os.path.exists(other_repo.worktreepath))
+
+        repo.prune()
+        other_repo.prune()
+        self.assertFalse(os.path.exists(repo.worktreepath))
+        self.assertFalse(os.path.exists(other_repo.worktreepath))
+
     def test_worktree_already_exists(self):
         """Test whether a debug info is logged when the worktree already exists"""
 
@@ -418,6 +947,91 @@ class TestGraalRepository(TestCaseRepo):
         with self.assertRaises(RepositoryError):
             repo.checkout("825b4da7ca740f7f2abbae1b3402908a44d130cd")
 
+    def test_materialize(self):
+        """Test whether the files of a commit are written without checking it out"""
+
+        new_path = os.path.join(self.tmp_path, 'testworktree')
+
+        repo = GraalRepository('http://example.git', self.git_path)
+        repo.worktree(new_path, checkout=False)
+        self.assertListEqual(GraalRepository.files(new_path), [])
+
+        repo.materialize("825b4da7ca740f7f2abbae1b3402908a44d130cd", ['perceval/errors.py', 'perceval/backend.py', 'unknown'])
+        files = sorted(GraalRepository.files(new_path))
+        self.assertListEqual(files, [os.path.join(new_path, 'perceval', 'backend.py'),
+                                     os.path.join(new_path, 'perceval', 'errors.py')])
+        self.assertEqual(GraalRepository.blob_hash(files[0]), "552942eaf9ff9b5efbe372cb914d2342f0af8155")
+
+        # The files of the previous commit are removed
+        repo.materialize("d256c971afce9e2ddca0b34d74a4d3ce7f57dd4d", ['perceval/backends/graal.py'])
+        self.assertListEqual(GraalRepository.files(new_path),
+                             [os.path.join(new_path, 'perceval', 'backends', 'graal.py')])
+
+        repo.prune()
+        self.assertIsNone(repo._cat_file)
+        self.assertFalse(os.path.exists(repo.worktreepath))
+
+    def test_tree_files(self):
+        """Test whether the files of a commit are listed from its tree"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        files = repo.tree_files("825b4da7ca740f7f2abbae1b3402908a44d130cd")
+        self.assertEqual(len(files), 15)
+        self.assertIn('.gitignore', files)
+        self.assertIn('perceval/backends/core/git.py', files)
+
+        files = repo.tree_files("d256c971afce9e2ddca0b34d74a4d3ce7f57dd4d")
+        self.assertIn('perceval/backends/graal.py', files)
+        self.assertNotIn('perceval/backends/core/graal.py', files)
+        self.assertEqual(len(repo._tree_files), 2)
+
+        # commits with the same tree are listed once
+        files = repo.tree_files("68d0757b40c7037356bc94bf2e6b49c131a7e8a8")
+        self.assertEqual(len(files), 15)
+        self.assertEqual(len(repo._tree_files), 2)
+
+        with self.assertRaises(RepositoryError):
+            repo.tree_files("0000000000000000000000000000000000000000")
+
+    def test_sparse_checkout(self):
+        """Test whether the working tree is restricted to some directories"""
+
+        new_path = os.path.join(self.tmp_path, 'testworktree')
+
+        repo = GraalRepository('http://example.git', self.git_path)
+        repo.worktree(new_path, sparse_paths=['./perceval/backends/', 'perceval/archive.py', 'unknown'])
+        self.assertListEqual(GraalRepository.files(new_path), [])
+        self.assertListEqual(self.__git_sparse_list(repo), ['perceval', 'unknown'])
+
+        repo.checkout("825b4da7ca740f7f2abbae1b3402908a44d130cd")
+        self.assertTrue(os.path.exists(os.path.join(new_path, 'perceval', 'backends', 'core', 'git.py')))
+
+        repo.sparse_checkout(['perceval/backends/core/git.py', '.'])
+        self.assertListEqual(self.__git_sparse_list(repo), ['perceval/backends/core'])
+
+        repo.prune()
+        self.assertFalse(os.path.exists(repo.worktreepath))
+
+    def test_sparse_checkout_on_error(self):
+        """Test whether a RepositoryError is thrown in case of error"""
+
+        repo = MockedGraalRepository('http://example.git', self.git_path, raise_exception=True)
+        with self.assertRaises(RepositoryError):
+            repo.sparse_checkout(['perceval'])
+
+    def test_tree_hash(self):
+        """Test whether the SHA of the trees is returned"""
+
+        repo = GraalRepository('http://example.git', self.git_path)
+
+        commit = "825b4da7ca740f7f2abbae1b3402908a44d130cd"
+        self.assertEqual(repo.tree_hash(commit), "b4a6139e190cabe6e4ee0d9fd75edde0b9fb1e0a")
+        self.assertEqual(repo.tree_hash(commit, '.'), "b4a6139e190cabe6e4ee0d9fd75edde0b9fb1e0a")
+        self.assertEqual(repo.tree_hash(commit, 'perceval'), "138568537a1bbfe00f3f0a433cd3167e7f8fff07")
+        self.assertEqual(repo.tree_hash(commit, './perceval/backends/'), "c998a50c2e5f6bb223d2dbcc9e903b0df8b5deb8")
+        self.assertIsNone(repo.tree_hash(commit, 'unknown'))
+
     def test_archive(self):
         """Test whether a Git archive command is correctly executed"""
 
@@ -522,6 +1136,16 @@ class TestGraalRepository(TestCaseRepo):
         self.assertEqual(GraalRepository.extension('tests/requirements.txt'), 'txt')
         self.assertEqual(GraalRepository.extension('LICENSE'), 'LICENSE')
 
+    def test_blob_hash(self):
+        """Test whether the blob SHA of a file is the one calculated by Git"""
+
+        file_path = os.path.join(self.tmp_path, 'blobtest')
+        with open(file_path, 'w') as fd:
+            fd.write('graal\n')
+
+        expected = subprocess.check_output([GIT_EXEC_PATH, 'hash-object', file_path]).decode('utf-8').strip()
+        self.assertEqual(GraalRepository.blob_hash(file_path), expected)
+
     def test_files(self):
         """Test whether all files in a directory and its sub-directories are shown"""
 
@@ -582,6 +1206,12 @@ class TestGraalRepository(TestCaseRepo):
         repo.prune()
         self.assertFalse(os.path.exists(repo.worktreepath))
 
+    @staticmethod
+    def __git_sparse_list(repo):
+        cmd_list = [GIT_EXEC_PATH, 'sparse-checkout', 'list']
+        outs = repo._exec(cmd_list, cwd=repo.worktreepath, env=repo.gitenv)
+        return outs.decode("utf-8").split()
+
     @staticmethod
     def __git_show_hash(repo):
         cmd_show = [GIT_EXEC_PATH, 'show']
@@ -651,6 +1281,13 @@ class TestGraalCommand(unittest.TestCase):
         self.assertEqual(parsed_args.out_paths, None)
         self.assertEqual(parsed_args.entrypoint, None)
         self.assertFalse(parsed_args.details)
+        self.assertEqual(parsed_args.workers, 1)
+        self.assertIsNone(parsed_args.cache_path)
+        self.assertEqual(parsed_args.cache_size, DEFAULT_CACHE_SIZE)
+        self.assertFalse(parsed_args.blob_checkout)
+        self.assertFalse(parsed_args.sparse_checkout)
+        self.assertFalse(parsed_args.resume)
+        self.assertFalse(parsed_args.prefetch)
         self.assertEqual(parser._backend, Graal)
 
         args = ['http://example.com/',
@@ -664,7 +1301,14 @@ class TestGraalCommand(unittest.TestCase):
                 '--in-paths', '*.py', '*.java',
                 '--out-paths', '*.c',
                 '--entrypoint', 'module',
-                '--details']
+                '--details',
+                '--workers', '4',
+                '--blob-checkout',
+                '--sparse-checkout',
+                '--resume',
+                '--prefetch',
+                '--cache-path', '/tmp/cache.db',
+                '--cache-size', '100']
 
         parsed_args = parser.parse(*args)
         self.assertEqual(parsed_args.uri, 'http://example.com/')
@@ -679,6 +1323,13 @@ class TestGraalCommand(unittest.TestCase):
         self.assertEqual(parsed_args.out_paths, ['*.c'])
         self.assertEqual(parsed_args.entrypoint, 'module')
         self.assertTrue(parsed_args.details)
+        self.assertEqual(parsed_args.workers, 4)
+        self.assertEqual(parsed_args.cache_path, '/tmp/cache.db')
+        self.assertEqual(parsed_args.cache_size, 100)
+        self.assertTrue(parsed_args.blob_checkout)
+        self.assertTrue(parsed_args.sparse_checkout)
+        self.assertTrue(parsed_args.resume)
+        self.assertTrue(parsed_args.prefetch)
 
         parser = GraalCommand.setup_cmd_parser(Graal)
         self.assertIsInstance(parser, GraalCommandArgumentParser)
@@ -713,6 +1364,19 @@ class TesGraalFunctions(unittest.TestCase):
         for b in backends.keys():
             self.assertTrue(issubclass(backends.get(b), Graal))
 
+    def test_cpu_count(self):
+        """Test whether the CPUs counted are the ones the process can run on"""
+
+        with unittest.mock.patch('os.sched_getaffinity', return_value={0, 2}, create=True):
+            self.assertEqual(cpu_count(), 2)
+
+        # the CPU affinity is not available on all the platforms
+        with unittest.mock.patch('os.sched_getaffinity', side_effect=AttributeError, create=True):
+            with unittest.mock.patch('os.cpu_count', return_value=8):
+                self.assertEqual(cpu_count(), 8)
+            with unittest.mock.patch('os.cpu_count', return_value=None):
+                self.assertEqual(cpu_count(), 1)
+
 
 class TestFetch(TestCaseRepo):
     """Unit tests for fetch function"""
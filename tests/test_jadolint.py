@@ -23,9 +23,12 @@
 import os
 import shutil
 import subprocess
+import sys
+import tempfile
 import unittest.mock
 
 from graal.backends.core.analyzers.jadolint import (Jadolint,
+                                                    JadolintHost,
                                                     DEPENDENCIES,
                                                     SMELLS)
 from graal.graal import GraalError
@@ -59,6 +62,10 @@ class TestJadolint(TestCaseAnalyzer):
 
         jadolint = Jadolint(JADOLINT_PATH, analysis=DEPENDENCIES)
         self.assertEqual(jadolint.analysis, DEPENDENCIES)
+        self.assertFalse(jadolint.host)
+
+        jadolint = Jadolint(JADOLINT_PATH, analysis=DEPENDENCIES, host=True)
+        self.assertTrue(jadolint.host)
 
     def test_init_error(self):
         """Test whether an error is thrown when the exec path is None"""
@@ -164,6 +171,195 @@ class TestJadolint(TestCaseAnalyzer):
         with self.assertRaises(GraalError):
             _ = jadolint.analyze(**kwargs)
 
+    def test_analyze_host(self):
+        """Test whether the long-lived JVMs return the same results of Jadolint"""
+
+        file_path = os.path.join(self.tmp_path, DOCKERFILE_TEST)
+
+        for analysis in [DEPENDENCIES, SMELLS]:
+            expected = Jadolint(JADOLINT_PATH, analysis=analysis).analyze(file_path=file_path)
+
+            jadolint = Jadolint(JADOLINT_PATH, analysis=analysis, host=True)
+            self.assertDictEqual(jadolint.analyze(file_path=file_path), expected)
+            self.assertDictEqual(jadolint.analyze(file_path=file_path), expected)
+
+            jadolint.close()
+            self.assertTrue(jadolint._hosts.empty())
+
+
+HOST_SCRIPT = """
+import os
+import sys
+
+for request, line in enumerate(sys.stdin):
+    options, file_path = line.rstrip('\\n').split('\\t')
+    if file_path == 'exit':
+        sys.exit(1)
+    for option in options.split(','):
+        if file_path == 'error':
+            sys.stdout.write('Analysis failed\\n\\0' + '1\\n')
+        else:
+            sys.stdout.write('%s %s\\n%s %s\\n\\0' % (file_path, option, os.getpid(), request) + '0\\n')
+    sys.stdout.flush()
+"""
+
+
+class TestJadolintHost(unittest.TestCase):
+    """JadolintHost tests, using a script that speaks the protocol of the host"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+        self.host_path = os.path.join(self.tmp_path, 'host.py')
+        with open(self.host_path, 'w') as fd:
+            fd.write(HOST_SCRIPT)
+
+        patcher = unittest.mock.patch.object(JadolintHost, '_command',
+                                             return_value=[sys.executable, self.host_path])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_run(self):
+        """Test whether the files are analyzed by the same process"""
+
+        host = JadolintHost(self.host_path)
+        msg = host.run('Dockerfile', '--deps')
+        line, pid = msg.split('\n')[:2]
+        self.assertEqual(line, 'Dockerfile --deps')
+
+        msg = host.run('Dockerfile-full', '--smells')
+        self.assertListEqual(msg.split('\n'), ['Dockerfile-full --smells', pid.replace(' 0', ' 1'), ''])
+
+        host.close()
+        self.assertIsNone(host._proc)
+
+    def test_run_options(self):
+        """Test whether the options are run by a single request"""
+
+        host = JadolintHost(self.host_path)
+        msgs = host.run_options('Dockerfile', ['--deps', '--smells'])
+        self.assertEqual(len(msgs), 2)
+
+        deps, pid = msgs[0].split('\n')[:2]
+        smells, smells_pid = msgs[1].split('\n')[:2]
+        self.assertEqual(deps, 'Dockerfile --deps')
+        self.assertEqual(smells, 'Dockerfile --smells')
+        self.assertEqual(smells_pid, pid)
+
+        # the process is still in sync with the requests
+        self.assertEqual(host.run('Dockerfile', '--deps').split('\n')[1], pid.replace(' 0', ' 1'))
+
+        with self.assertRaises(GraalError):
+            _ = host.run_options('error', ['--deps', '--smells'])
+        self.assertEqual(host.run('Dockerfile', '--deps').split('\n')[1], pid.replace(' 0', ' 3'))
+
+        host.close()
+
+    def test_run_restart(self):
+        """Test whether the process is restarted when it dies"""
+
+        host = JadolintHost(self.host_path)
+        pid = host.run('Dockerfile', '--deps').split('\n')[1]
+
+        host._proc.kill()
+        host._proc.wait()
+
+        new_pid = host.run('Dockerfile', '--deps').split('\n')[1]
+        self.assertNotEqual(new_pid, pid)
+
+        with self.assertRaises(GraalError):
+            _ = host.run('exit', '--deps')
+
+        host.close()
+
+    def test_run_error(self):
+        """Test whether an exception is thrown when the analysis fails"""
+
+        host = JadolintHost(self.host_path)
+        with self.assertRaises(GraalError):
+            _ = host.run('error', '--deps')
+
+        # the process is still alive
+        self.assertIsNone(host._proc.poll())
+        host.close()
+
+    def test_analyze(self):
+        """Test whether Jadolint uses the long-lived processes"""
+
+        jadolint = Jadolint(self.host_path, analysis=DEPENDENCIES, host=True)
+        result = jadolint.analyze(file_path='Dockerfile')
+        self.assertEqual(result[DEPENDENCIES][0], 'Dockerfile --deps')
+
+        jadolint = Jadolint(self.host_path, analysis=SMELLS, host=True)
+        result = jadolint.analyze(file_path='Dockerfile')
+        self.assertEqual(result[SMELLS][0], 'Dockerfile --smells')
+
+        # a host is started for each file analyzed at the same time
+        self.assertEqual(jadolint._hosts.qsize(), 1)
+        jadolint.close()
+        self.assertTrue(jadolint._hosts.empty())
+
+    def test_analyze_combined(self):
+        """Test whether the analyses of a file are performed by the same process"""
+
+        jadolint = Jadolint(self.host_path, analysis=[DEPENDENCIES, SMELLS], host=True)
+        result = jadolint.analyze(file_path='Dockerfile')
+
+        self.assertListEqual(sorted(result.keys()), [DEPENDENCIES, SMELLS])
+        self.assertEqual(result[DEPENDENCIES][0], 'Dockerfile --deps')
+        self.assertEqual(result[SMELLS][0], 'Dockerfile --smells')
+        self.assertEqual(result[DEPENDENCIES][1], result[SMELLS][1])
+
+        self.assertEqual(jadolint._hosts.qsize(), 1)
+        jadolint.close()
+
+
+STUB_JADOLINT = """
+public class StubJadolint {
+    public static void main(String[] args) {
+        System.out.println(args[0] + " " + args[1]);
+        System.exit(args[0].equals("error") ? 2 : 0);
+    }
+}
+"""
+
+
+class TestJadolintHostExit(unittest.TestCase):
+    """JadolintHost tests, using a stub of Jadolint which calls System.exit"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+        with open(os.path.join(self.tmp_path, 'StubJadolint.java'), 'w') as fd:
+            fd.write(STUB_JADOLINT)
+
+        self.jar_path = os.path.join(self.tmp_path, 'stub.jar')
+        subprocess.check_call(['javac', 'StubJadolint.java'], cwd=self.tmp_path)
+        subprocess.check_call(['jar', 'cfe', self.jar_path, 'StubJadolint', 'StubJadolint.class'],
+                              cwd=self.tmp_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_run_exit(self):
+        """Test whether the JVM is not terminated when Jadolint calls System.exit"""
+
+        host = JadolintHost(self.jar_path)
+        self.assertEqual(host.run('Dockerfile', '--deps'), 'Dockerfile --deps\n')
+        proc = host._proc
+
+        self.assertListEqual(host.run_options('Dockerfile', ['--deps', '--smells']),
+                             ['Dockerfile --deps\n', 'Dockerfile --smells\n'])
+
+        with self.assertRaises(GraalError):
+            _ = host.run('error', '--deps')
+
+        # the same JVM served all the requests
+        self.assertIs(host._proc, proc)
+        self.assertIsNone(proc.poll())
+        host.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import unittest.mock
+
+from base_analyzer import (TestCaseAnalyzer,
+                           ANALYZER_TEST_FILE,
+                           DOCKERFILE_TEST)
+
+from graal.backends.core.analyzers.cloc import Cloc
+from graal.backends.core.analyzers.linecounter import LineCounter
+from graal.graal import GraalError
+
+
+class TestLineCounter(TestCaseAnalyzer):
+    """LineCounter tests"""
+
+    def write_file(self, name, content):
+        file_path = os.path.join(self.tmp_path, name)
+        with open(file_path, 'w') as fd:
+            fd.write(content)
+
+        return file_path
+
+    def test_initialization(self):
+        """Test whether the comment syntaxes are indexed by extension"""
+
+        counter = LineCounter()
+        self.assertEqual(counter.languages['py'][0], 'Python')
+        self.assertEqual(counter.languages['java'][0], 'Java')
+        self.assertEqual(counter.languages['h'][0], 'C/C++ Header')
+        self.assertIsNone(counter.languages['json'][1])
+
+    def test_analyze(self):
+        """Test whether the lines are counted as CLOC does"""
+
+        counter = LineCounter()
+        kwargs = {'file_path': os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)}
+        result = counter.analyze(**kwargs)
+
+        self.assertEqual(result['blanks'], 27)
+        self.assertEqual(result['comments'], 31)
+        self.assertEqual(result['loc'], 67)
+        self.assertEqual(result['ext'], 'py')
+
+    @unittest.mock.patch.object(Cloc, 'analyze')
+    def test_analyze_not_recognized(self, mock_analyze):
+        """Test whether the files of unknown languages are counted by CLOC"""
+
+        file_path = os.path.join(self.tmp_data_path, DOCKERFILE_TEST)
+        mock_analyze.return_value = {'blanks': 1, 'comments': 2, 'loc': 3, 'ext': ''}
+
+        counter = LineCounter()
+        result = counter.analyze(file_path=file_path)
+
+        self.assertDictEqual(result, {'blanks': 1, 'comments': 2, 'loc': 3, 'ext': ''})
+        mock_analyze.assert_called_once_with(file_path=file_path)
+
+    def test_analyze_comments(self):
+        """Test whether line and block comments are found"""
+
+        content = "/* a block\n" \
+                  "   comment */\n" \
+                  "\n" \
+                  "int a = 0; // a line comment\n" \
+                  "// a line comment\n" \
+                  "int b = 0; /* a block comment */\n" \
+                  "/* a block comment */ int c = 0;\n" \
+                  "char *d = \"/* unclosed\";\n"
+        file_path = self.write_file('comments.c', content)
+
+        counter = LineCounter()
+        result = counter.analyze(file_path=file_path)
+
+        self.assertEqual(result['blanks'], 1)
+        self.assertEqual(result['comments'], 3)
+        self.assertEqual(result['loc'], 4)
+        self.assertEqual(result['ext'], 'c')
+
+    def test_analyze_strings(self):
+        """Test whether the comment markers within string literals are ignored"""
+
+        content = "char *a = \"/* not a comment\";\n" \
+                  "int b = 0;\n" \
+                  "char *c = \"*/ // not a comment\";\n" \
+                  "char e = '\\'', *f = \"\\\" /*\";\n" \
+                  "/* a \"quoted\" comment */\n" \
+                  "int d = 0; // \"a comment\"\n"
+        file_path = self.write_file('strings.c', content)
+
+        counter = LineCounter()
+        result = counter.analyze(file_path=file_path)
+        self.assertDictEqual(result, {'blanks': 0, 'comments': 1, 'loc': 5, 'ext': 'c'})
+
+        content = "url = 'http://example.com/#anchor'\n" \
+                  "# a comment\n" \
+                  "x = \"#\"  # a comment with 'quotes'\n" \
+                  "\n"
+        file_path = self.write_file('strings.py', content)
+
+        result = counter.analyze(file_path=file_path)
+        self.assertDictEqual(result, {'blanks': 1, 'comments': 1, 'loc': 2, 'ext': 'py'})
+
+        content = "const url = `http://example.com\n" \
+                  "/* not a comment */`;\n" \
+                  "// a comment\n"
+        file_path = self.write_file('strings.js', content)
+
+        result = counter.analyze(file_path=file_path)
+        self.assertDictEqual(result, {'blanks': 0, 'comments': 1, 'loc': 2, 'ext': 'js'})
+
+    def test_analyze_empty(self):
+        """Test whether empty files are counted"""
+
+        file_path = self.write_file('empty.py', '')
+
+        counter = LineCounter()
+        result = counter.analyze(file_path=file_path)
+
+        self.assertDictEqual(result, {'blanks': 0, 'comments': 0, 'loc': 0, 'ext': 'py'})
+
+    @unittest.mock.patch.object(Cloc, 'analyze')
+    def test_analyze_files(self, mock_analyze):
+        """Test whether the lines of a set of files are counted, the ones of unknown
+        languages with a single execution of CLOC"""
+
+        file_paths = [os.path.join(self.tmp_data_path, DOCKERFILE_TEST),
+                      os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)]
+        mock_analyze.return_value = {file_paths[0]: {'blanks': 1, 'comments': 2, 'loc': 3, 'ext': ''}}
+
+        counter = LineCounter()
+        results = counter.analyze(file_paths=file_paths)
+
+        mock_analyze.assert_called_once_with(file_paths=file_paths[:1])
+        self.assertListEqual(list(results.keys()), file_paths)
+        self.assertDictEqual(results[file_paths[0]], {'blanks': 1, 'comments': 2, 'loc': 3, 'ext': ''})
+        self.assertEqual(results[file_paths[1]]['loc'], 67)
+        self.assertEqual(results[file_paths[1]]['ext'], 'py')
+
+        mock_analyze.reset_mock()
+        results = counter.analyze(file_paths=file_paths[1:])
+        mock_analyze.assert_not_called()
+
+    def test_analyze_repository(self):
+        """Test whether the lines of a repository are grouped by language"""
+
+        counter = LineCounter()
+        results = counter.analyze(file_path=self.origin_path, repository_level=True)
+
+        self.assertIn('Python', results)
+        result = results['Python']
+        self.assertEqual(type(result['total_files']), int)
+        self.assertGreater(result['total_files'], 0)
+        self.assertEqual(type(result['blanks']), int)
+        self.assertEqual(type(result['comments']), int)
+        self.assertEqual(type(result['loc']), int)
+
+    @unittest.mock.patch.object(Cloc, 'analyze')
+    def test_analyze_repository_not_recognized(self, mock_analyze):
+        """Test whether the files of unknown languages of a repository are counted by CLOC"""
+
+        self.write_file('a.py', 'a = 1\n\n# a comment\n')
+        self.write_file('Dockerfile', 'FROM python\n')
+        self.write_file('Makefile', 'all:\n')
+        mock_analyze.return_value = {
+            'Dockerfile': {'total_files': 1, 'blanks': 0, 'comments': 0, 'loc': 1},
+            'Python': {'total_files': 1, 'blanks': 1, 'comments': 1, 'loc': 1}
+        }
+
+        counter = LineCounter()
+        with unittest.mock.patch('os.walk', return_value=[(self.tmp_path, [], ['a.py', 'Dockerfile', 'Makefile'])]):
+            results = counter.analyze(file_path=self.tmp_path, repository_level=True)
+
+        mock_analyze.assert_called_once_with(file_paths=[os.path.join(self.tmp_path, 'Dockerfile'),
+                                                         os.path.join(self.tmp_path, 'Makefile')],
+                                             repository_level=True)
+        self.assertDictEqual(results, {
+            'Dockerfile': {'total_files': 1, 'blanks': 0, 'comments': 0, 'loc': 1},
+            'Python': {'total_files': 2, 'blanks': 2, 'comments': 2, 'loc': 2}
+        })
+
+    def test_analyze_as_cloc(self):
+        """Test whether the results match the ones of CLOC, which only counts the files
+        of the languages unknown to the line counter"""
+
+        file_paths = []
+        for root, dirs, files in os.walk(self.origin_path):
+            dirs[:] = [d for d in dirs if d != '.git']
+            file_paths.extend([os.path.join(root, f) for f in files])
+
+        expected = Cloc().analyze(file_paths=file_paths)
+
+        counter = LineCounter()
+        unknown_paths = [file_path for file_path in file_paths if counter.count(file_path) is None]
+        with unittest.mock.patch.object(Cloc, 'analyze', autospec=True, side_effect=Cloc.analyze) as analyze:
+            results = counter.analyze(file_paths=file_paths)
+            analyze.assert_called_once_with(counter.cloc, file_paths=unknown_paths)
+
+        self.assertDictEqual(results, expected)
+
+    @unittest.mock.patch('mmap.mmap')
+    def test_analyze_error(self, mock_mmap):
+        """Test whether an exception is thrown in case of errors"""
+
+        mock_mmap.side_effect = OSError("mmap failed")
+
+        counter = LineCounter()
+        with self.assertRaises(GraalError):
+            counter.analyze(file_path=os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -23,10 +23,12 @@
 
 import os
 import unittest
+import unittest.mock
 
 from base_analyzer import (TestCaseAnalyzer,
                            ANALYZER_TEST_FILE)
 
+from graal.backends.core.analyzers.cloc import Cloc
 from graal.backends.core.analyzers.lizard import Lizard
 
 
@@ -100,6 +102,45 @@ class TestLizard(TestCaseAnalyzer):
             self.assertIn('end', fd)
             self.assertEqual(type(fd['end']), int)
 
+    def test_analyze_files(self):
+        """Test whether lizard analyzes a set of files with a pool of processes"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        lizard = Lizard()
+        expected = lizard.analyze(file_path=file_path, details=True)
+
+        results = lizard.analyze(file_paths=[file_path], details=True, jobs=2)
+        self.assertDictEqual(results, {file_path: expected})
+        self.assertIsNone(lizard._pool)
+
+        results = lizard.analyze(file_paths=[file_path, file_path], details=True, jobs=2)
+        self.assertDictEqual(results, {file_path: expected})
+        self.assertIsNotNone(lizard._pool)
+
+        # the pool is reused across calls
+        pool = lizard._pool
+        _ = lizard.analyze(file_paths=[file_path, file_path], details=False, jobs=2)
+        self.assertIs(lizard._pool, pool)
+
+        lizard.close()
+        self.assertIsNone(lizard._pool)
+
+    def test_analyze_files_pool_size(self):
+        """Test whether the pool of processes is sized by the jobs and not by the first set of files"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        lizard = Lizard()
+
+        _ = lizard.analyze(file_paths=[file_path, file_path], details=False, jobs=4)
+        self.assertEqual(lizard._pool._processes, 4)
+
+        pool = lizard._pool
+        _ = lizard.analyze(file_paths=[file_path] * 8, details=False, jobs=4)
+        self.assertIs(lizard._pool, pool)
+        self.assertEqual(lizard._pool._processes, 4)
+
+        lizard.close()
+
     def test_analyze_repository(self):
         """Test whether lizard returns the expected fields data for repository"""
 
@@ -126,6 +167,51 @@ class TestLizard(TestCaseAnalyzer):
         self.assertIn('comments', result)
         self.assertEqual(type(result['comments']), int)
 
+    def test_analyze_repository_jobs(self):
+        """Test whether the results obtained with several processes are returned in the same order"""
+
+        lizard = Lizard()
+        kwargs = {'repository_path': self.tmp_data_path,
+                  'repository_level': True,
+                  'files_affected': [ANALYZER_TEST_FILE],
+                  'details': False}
+        expected = lizard.analyze(**kwargs)
+
+        kwargs['jobs'] = 4
+        results = lizard.analyze(**kwargs)
+        self.assertListEqual(results, expected)
+
+        # the pool is kept alive across the analyses
+        kwargs['files'] = [ANALYZER_TEST_FILE, ANALYZER_TEST_FILE]
+        results = lizard.analyze(**kwargs)
+        pool = lizard._pool
+        self.assertEqual(pool._processes, 4)
+
+        self.assertListEqual(lizard.analyze(**kwargs), results)
+        self.assertIs(lizard._pool, pool)
+
+        lizard.close()
+        self.assertIsNone(lizard._pool)
+
+    def test_analyze_repository_single_cloc(self):
+        """Test whether the blank and commented lines of a repository are obtained with a single cloc execution"""
+
+        lizard = Lizard()
+        kwargs = {'repository_path': self.tmp_data_path,
+                  'repository_level': True,
+                  'files_affected': [ANALYZER_TEST_FILE],
+                  'details': False}
+
+        with unittest.mock.patch('graal.backends.core.analyzers.cloc.Cloc.analyze',
+                                 side_effect=Cloc().analyze) as cloc_analyze:
+            results = lizard.analyze(**kwargs)
+            self.assertEqual(cloc_analyze.call_count, 1)
+
+        result = [r for r in results if r['file_path'] == ANALYZER_TEST_FILE][0]
+        self.assertTrue(result['in_commit'])
+        self.assertEqual(result['blanks'], 27)
+        self.assertEqual(result['comments'], 31)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -21,15 +21,21 @@
 #     inishchith <inishchith@gmail.com>
 #
 
+import json
 import os
+import shutil
 import subprocess
+import sys
+import tempfile
 import unittest
 import unittest.mock
 
 from base_analyzer import (TestCaseAnalyzer,
-                           ANALYZER_TEST_FILE)
+                           ANALYZER_TEST_FILE,
+                           DOCKERFILE_TEST)
 
-from graal.backends.core.analyzers.scancode import ScanCode
+from graal.backends.core.analyzers.scancode import (ScanCode,
+                                                    ScanCodeWorker)
 from graal.graal import GraalError
 from utils import SCANCODE_PATH, SCANCODE_CLI_PATH
 
@@ -67,6 +73,250 @@ class TestScanCode(TestCaseAnalyzer):
         with self.assertRaises(GraalError):
             _ = scancode.analyze(**kwargs)
 
+        kwargs = {'file_paths': [os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)]}
+        with self.assertRaises(GraalError):
+            _ = scancode.analyze(**kwargs)
+
+    def test_analyze_files(self):
+        """Test whether the files are scanned with a single execution of scancode"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        expected = ScanCode(exec_path=SCANCODE_PATH).analyze(file_path=file_path)
+
+        scancode = ScanCode(exec_path=SCANCODE_PATH, processes=2)
+        self.assertEqual(scancode.processes, 2)
+
+        results = scancode.analyze(file_paths=[file_path])
+        self.assertListEqual(list(results.keys()), [file_path])
+        self.assertEqual(results[file_path]['licenses'], expected['licenses'])
+        self.assertEqual(results[file_path]['copyrights'], expected['copyrights'])
+
+        self.assertDictEqual(scancode.analyze(file_paths=[]), {})
+
+    @unittest.mock.patch('subprocess.check_output')
+    def test_analyze_files_output(self, check_output_mock):
+        """Test whether the output of scancode is split into the results of each file"""
+
+        def scan(cmd):
+            self.assertIn('--processes', cmd)
+            self.assertEqual(cmd[cmd.index('--processes') + 1], '4')
+
+            scratch_path = cmd[-1]
+            scratch_name = os.path.basename(scratch_path)
+            files = [{'path': scratch_name, 'type': 'directory'}]
+            for root, dirs, file_names in os.walk(scratch_path):
+                for name in dirs:
+                    path = os.path.relpath(os.path.join(root, name), os.path.dirname(scratch_path))
+                    files.append({'path': path, 'type': 'directory'})
+                for name in file_names:
+                    path = os.path.relpath(os.path.join(root, name), os.path.dirname(scratch_path))
+                    files.append({
+                        'path': path,
+                        'type': 'file',
+                        'licenses': [{'key': name}],
+                        'copyrights': [{'value': path.split('/')[1]}]
+                    })
+
+            return json.dumps({'files': files}).encode('utf-8')
+
+        check_output_mock.side_effect = scan
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        other_path = os.path.join(self.tmp_data_path, DOCKERFILE_TEST)
+
+        scancode = ScanCode(exec_path=SCANCODE_PATH, processes=4)
+        results = scancode.analyze(file_paths=[file_path, other_path])
+
+        self.assertEqual(check_output_mock.call_count, 1)
+        self.assertListEqual(list(results.keys()), [file_path, other_path])
+        self.assertListEqual(results[file_path]['licenses'], [{'key': ANALYZER_TEST_FILE}])
+        self.assertListEqual(results[file_path]['copyrights'], [{'value': '0'}])
+        self.assertListEqual(results[other_path]['licenses'], [{'key': DOCKERFILE_TEST}])
+        self.assertListEqual(results[other_path]['copyrights'], [{'value': '1'}])
+
+        # the scratch directory is removed
+        scratch_path = check_output_mock.call_args[0][0][-1]
+        self.assertFalse(os.path.exists(scratch_path))
+
+    @unittest.mock.patch('subprocess.check_output')
+    def test_analyze_files_skipped(self, check_output_mock):
+        """Test whether the files skipped in the scanned directory are scanned one by one"""
+
+        def scan(cmd):
+            path = cmd[-1]
+            if not os.path.isdir(path):
+                files = [{'path': path, 'type': 'file', 'licenses': [{'key': 'alone'}], 'copyrights': []}]
+                return json.dumps({'files': files}).encode('utf-8')
+
+            # the Dockerfile is ignored when the directory is scanned
+            scratch_name = os.path.basename(path)
+            files = [{'path': scratch_name, 'type': 'directory'},
+                     {'path': scratch_name + '/0', 'type': 'directory'},
+                     {'path': scratch_name + '/0/' + ANALYZER_TEST_FILE, 'type': 'file',
+                      'licenses': [{'key': 'batch'}], 'copyrights': []}]
+            return json.dumps({'files': files}).encode('utf-8')
+
+        check_output_mock.side_effect = scan
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        other_path = os.path.join(self.tmp_data_path, DOCKERFILE_TEST)
+
+        scancode = ScanCode(exec_path=SCANCODE_PATH)
+        with self.assertLogs('graal.backends.core.analyzers.scancode', level='WARNING') as logs:
+            results = scancode.analyze(file_paths=[file_path, other_path])
+
+        self.assertEqual(check_output_mock.call_count, 2)
+        self.assertEqual(check_output_mock.call_args[0][0][-1], other_path)
+        self.assertIn(other_path, logs.output[0])
+        self.assertListEqual(list(results.keys()), [file_path, other_path])
+        self.assertListEqual(results[file_path]['licenses'], [{'key': 'batch'}])
+        self.assertListEqual(results[other_path]['licenses'], [{'key': 'alone'}])
+
+
+class TestScanCodeWorkers(TestCaseAnalyzer):
+    """ScanCode workers tests"""
+
+    def test_init(self):
+        """Test whether the workers are started on the first analysis"""
+
+        scancode = ScanCode(exec_path=SCANCODE_PATH, workers=2)
+        self.assertEqual(scancode.workers, 2)
+        self.assertIsNone(scancode._workers)
+
+        scancode = ScanCode(exec_path=SCANCODE_PATH)
+        self.assertEqual(scancode.workers, 0)
+
+    def test_analyze(self):
+        """Test whether the workers return the same results of scancode"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        expected = ScanCode(exec_path=SCANCODE_PATH).analyze(file_path=file_path)
+
+        scancode = ScanCode(exec_path=SCANCODE_PATH, workers=2)
+        result = scancode.analyze(file_path=file_path)
+        self.assertEqual(result['licenses'], expected['licenses'])
+        self.assertEqual(result['copyrights'], expected['copyrights'])
+
+        results = scancode.analyze(file_paths=[file_path, file_path])
+        self.assertListEqual(list(results.keys()), [file_path])
+        self.assertEqual(results[file_path]['licenses'], expected['licenses'])
+
+        scancode.close()
+        self.assertIsNone(scancode._workers)
+
+    def test_analyze_cli_options(self):
+        """Test whether the workers scan the files with the options of scancode"""
+
+        tmp_path = tempfile.mkdtemp(prefix='graal_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+
+        file_path = os.path.join(tmp_path, 'licensed.py')
+        with open(file_path, 'w') as fd:
+            fd.write(LICENSED_FILE)
+
+        expected = ScanCode(exec_path=SCANCODE_PATH).analyze(file_path=file_path)
+        self.assertNotEqual(expected['licenses'], [])
+        self.assertNotEqual(expected['copyrights'], [])
+
+        scancode = ScanCode(exec_path=SCANCODE_PATH, workers=1)
+        result = scancode.analyze(file_path=file_path)
+        scancode.close()
+
+        self.assertDictEqual(result, expected)
+
+
+LICENSED_FILE = """# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+print('licensed')
+"""
+
+WORKER_SCRIPT = """
+import json
+import os
+import sys
+
+for line in sys.stdin:
+    file_path = json.loads(line)
+    if file_path == 'exit':
+        sys.exit(1)
+    elif file_path == 'error':
+        result = {'error': 'scan failed'}
+    else:
+        result = {'licenses': [file_path], 'copyrights': [os.getpid()]}
+    sys.stdout.write(json.dumps(result) + '\\n')
+    sys.stdout.flush()
+"""
+
+
+class TestScanCodeWorker(unittest.TestCase):
+    """ScanCodeWorker tests, using a script that speaks the protocol of the workers"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+        worker_path = os.path.join(self.tmp_path, 'worker.py')
+        with open(worker_path, 'w') as fd:
+            fd.write(WORKER_SCRIPT)
+
+        patcher = unittest.mock.patch('graal.backends.core.analyzers.scancode.SCANCODE_WORKER', worker_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_scan(self):
+        """Test whether the files are scanned by the same process"""
+
+        worker = ScanCodeWorker(sys.executable)
+        result = worker.scan('a.py')
+        self.assertListEqual(result['licenses'], ['a.py'])
+
+        pid = result['copyrights'][0]
+        result = worker.scan('b.py')
+        self.assertListEqual(result['licenses'], ['b.py'])
+        self.assertListEqual(result['copyrights'], [pid])
+
+        worker.close()
+        self.assertIsNone(worker._proc)
+
+    def test_scan_restart(self):
+        """Test whether the process is restarted when it dies"""
+
+        worker = ScanCodeWorker(sys.executable)
+        pid = worker.scan('a.py')['copyrights'][0]
+
+        worker._proc.kill()
+        worker._proc.wait()
+
+        result = worker.scan('b.py')
+        self.assertListEqual(result['licenses'], ['b.py'])
+        self.assertNotEqual(result['copyrights'], [pid])
+
+        with self.assertRaises(GraalError):
+            worker.scan('exit')
+
+        worker.close()
+
+    def test_scan_error(self):
+        """Test whether an exception is thrown when the scan fails"""
+
+        worker = ScanCodeWorker(sys.executable)
+        with self.assertRaises(GraalError):
+            worker.scan('error')
+
+        self.assertListEqual(worker.scan('a.py')['licenses'], ['a.py'])
+        worker.close()
+
 
 class TestScanCodeCli(TestCaseAnalyzer):
     """ScanCodeCli tests"""
@@ -99,5 +349,71 @@ class TestScanCodeCli(TestCaseAnalyzer):
             _ = scancode_cli.analyze(**kwargs)
 
 
+SCANCLI_SCRIPT = """
+import json
+import sys
+
+for file_path in sys.argv[1:]:
+    if file_path == 'error':
+        sys.stdout.write('Scan failed\\n')
+        sys.exit(1)
+    output = [{'headers': []}, {'files': [{'path': file_path, 'licenses': [], 'copyrights': []}]}]
+    sys.stdout.write(json.dumps(output, indent=2) + '\\n\\n')
+    sys.stdout.flush()
+"""
+
+
+class TestScanCodeCliStream(unittest.TestCase):
+    """ScanCodeCli tests, using a script that writes the output of scancode_cli"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='graal_')
+
+        scripts_path = os.path.join(self.tmp_path, 'etc', 'scripts')
+        os.makedirs(scripts_path)
+        self.scancli_path = os.path.join(scripts_path, 'scancli.py')
+        with open(self.scancli_path, 'w') as fd:
+            fd.write(SCANCLI_SCRIPT)
+
+        configure_path = os.path.join(self.tmp_path, 'configure')
+        with open(configure_path, 'w') as fd:
+            fd.write('#!/bin/sh\n')
+        os.chmod(configure_path, 0o755)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_analyze_stream(self):
+        """Test whether the results are yielded file by file"""
+
+        scancode_cli = ScanCode(exec_path=self.scancli_path, cli=True)
+        result = scancode_cli.analyze(file_paths=['a.py', 'b.py', 'c.py'], stream=True)
+
+        self.assertNotIsInstance(result, list)
+        self.assertEqual(next(result)['path'], 'a.py')
+        self.assertEqual(next(result)['path'], 'b.py')
+        self.assertEqual(next(result)['path'], 'c.py')
+        with self.assertRaises(StopIteration):
+            _ = next(result)
+
+        result = scancode_cli.analyze(file_paths=['a.py', 'b.py'])
+        self.assertListEqual([r['path'] for r in result], ['a.py', 'b.py'])
+        self.assertIn('licenses', result[0])
+        self.assertIn('copyrights', result[0])
+
+    def test_analyze_stream_error(self):
+        """Test whether an exception is thrown when scancode_cli fails"""
+
+        scancode_cli = ScanCode(exec_path=self.scancli_path, cli=True)
+
+        result = scancode_cli.analyze(file_paths=['a.py', 'error'], stream=True)
+        self.assertEqual(next(result)['path'], 'a.py')
+        with self.assertRaises(GraalError):
+            _ = next(result)
+
+        with self.assertRaises(GraalError):
+            _ = scancode_cli.analyze(file_paths=['error'])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -21,6 +21,7 @@
 #     Valerio Cosentino <valcos@bitergia.com>
 #
 
+import json
 import os
 import subprocess
 import unittest.mock
@@ -30,6 +31,27 @@ from base_analyzer import (TestCaseAnalyzer,
                            ANALYZER_TEST_FILE)
 
 from graal.backends.core.analyzers.scc import SCC
+from graal.graal import GraalError
+
+
+def scc_by_file_output(*file_infos):
+    """Build the JSON output of SCC by file"""
+
+    languages = {}
+    for language, location, blanks, comments, code, complexity in file_infos:
+        files = languages.setdefault(language, [])
+        files.append({
+            "Language": language,
+            "Location": location,
+            "Filename": os.path.basename(location),
+            "Blank": blanks,
+            "Comment": comments,
+            "Code": code,
+            "Complexity": complexity
+        })
+
+    output = [{"Name": language, "Files": files} for language, files in languages.items()]
+    return json.dumps(output).encode('utf-8')
 
 
 class TestSCC(TestCaseAnalyzer):
@@ -69,6 +91,73 @@ class TestSCC(TestCaseAnalyzer):
         self.assertIn('blanks', result)
         self.assertEqual(type(result['blanks']), int)
 
+    def test_analyze_files(self):
+        """Test whether SCC analyzes a set of files with a single execution"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        other_path = os.path.join(self.tmp_data_path, 'Dockerfile')
+
+        scc = SCC()
+        results = scc.analyze(file_paths=[file_path, other_path])
+
+        self.assertListEqual(list(results.keys()), [file_path, other_path])
+        for file_path, result in results.items():
+            self.assertEqual(type(result['ccn']), int)
+            self.assertEqual(type(result['loc']), int)
+            self.assertEqual(type(result['comments']), int)
+            self.assertEqual(type(result['blanks']), int)
+
+        self.assertDictEqual(results[file_path], scc.analyze(file_path=file_path))
+
+    @unittest.mock.patch('subprocess.check_output')
+    def test_analyze_files_json(self, check_output_mock):
+        """Test whether the JSON output of SCC is parsed"""
+
+        file_path = os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)
+        other_path = os.path.join(self.tmp_data_path, 'Dockerfile')
+        unknown_path = os.path.join(self.tmp_data_path, 'graaltest.zip')
+
+        check_output_mock.return_value = scc_by_file_output(('Python', file_path, 27, 31, 67, 10),
+                                                            ('Dockerfile', other_path, 1, 2, 3, 0))
+
+        scc = SCC()
+        results = scc.analyze(file_paths=[file_path, other_path, unknown_path])
+
+        check_output_mock.assert_called_once_with(['scc', '--by-file', '--format', 'json',
+                                                   file_path, other_path, unknown_path])
+
+        expected = {
+            file_path: {'blanks': 27, 'comments': 31, 'loc': 67, 'ccn': 10, 'ext': 'py'},
+            other_path: {'blanks': 1, 'comments': 2, 'loc': 3, 'ccn': 0, 'ext': other_path},
+            unknown_path: {'blanks': 0, 'comments': 0, 'loc': 0, 'ccn': 0, 'ext': 'zip'}
+        }
+        self.assertDictEqual(results, expected)
+
+    @unittest.mock.patch('subprocess.check_output')
+    def test_analyze_files_chunks(self, check_output_mock):
+        """Test whether long lists of files are split among executions"""
+
+        check_output_mock.return_value = b'[]'
+        file_paths = ['file_%s.py' % i for i in range(1000)]
+
+        scc = SCC()
+        results = scc.analyze(file_paths=file_paths)
+
+        self.assertEqual(check_output_mock.call_count, 2)
+        self.assertEqual(len(results), 1000)
+        self.assertEqual(scc.analyze(file_paths=[]), {})
+
+    @unittest.mock.patch('subprocess.check_output')
+    def test_analyze_files_error(self, check_output_mock):
+        """Test whether an exception is thrown in case of errors"""
+
+        check_output_mock.side_effect = subprocess.CalledProcessError(
+            -1, "command", output=b'output')
+
+        scc = SCC()
+        with self.assertRaises(GraalError):
+            scc.analyze(file_paths=[os.path.join(self.tmp_data_path, ANALYZER_TEST_FILE)])
+
     def test_analyze_repository(self):
         """Test whether SCC returns the expected fields data for repository"""
 
@@ -92,6 +181,71 @@ class TestSCC(TestCaseAnalyzer):
             self.assertIn('total_files', language_result)
             self.assertEqual(type(language_result['total_files']), int)
 
+    def test_analyze_repository_details(self):
+        """Test whether SCC returns the results of each file of a repository"""
+
+        scc = SCC()
+        kwargs = {'repository_path': self.tmp_data_path,
+                  'repository_level': True,
+                  'files_affected': [ANALYZER_TEST_FILE],
+                  'details': True}
+        result = scc.analyze(**kwargs)
+
+        file_paths = [file_result['file_path'] for file_result in result]
+        self.assertIn(ANALYZER_TEST_FILE, file_paths)
+
+        for file_result in result:
+            self.assertEqual(type(file_result['ccn']), int)
+            self.assertEqual(type(file_result['loc']), int)
+            self.assertEqual(type(file_result['blanks']), int)
+            self.assertEqual(type(file_result['comments']), int)
+            self.assertEqual(file_result['in_commit'], file_result['file_path'] == ANALYZER_TEST_FILE)
+
+    @unittest.mock.patch('subprocess.check_output')
+    def test_analyze_repository_details_json(self, check_output_mock):
+        """Test whether the results of each file of a repository are obtained with a single execution"""
+
+        repository_path = self.tmp_data_path
+        check_output_mock.return_value = scc_by_file_output(
+            ('Python', os.path.join(repository_path, 'sample_code.py'), 27, 31, 67, 10),
+            ('Python', os.path.join(repository_path, 'perceval', 'backend.py'), 1, 2, 3, 1),
+            ('Dockerfile', os.path.join(repository_path, 'Dockerfile'), 0, 0, 5, 0))
+
+        scc = SCC()
+        kwargs = {'repository_path': repository_path,
+                  'repository_level': True,
+                  'files_affected': ['perceval/backend.py'],
+                  'details': True}
+        result = scc.analyze(**kwargs)
+
+        check_output_mock.assert_called_once_with(['scc', '--by-file', '--format', 'json', repository_path])
+
+        expected = [
+            {'blanks': 0, 'comments': 0, 'loc': 5, 'ccn': 0,
+             'file_path': 'Dockerfile', 'language': 'Dockerfile', 'in_commit': False},
+            {'blanks': 1, 'comments': 2, 'loc': 3, 'ccn': 1,
+             'file_path': 'perceval/backend.py', 'language': 'Python', 'in_commit': True},
+            {'blanks': 27, 'comments': 31, 'loc': 67, 'ccn': 10,
+             'file_path': 'sample_code.py', 'language': 'Python', 'in_commit': False}
+        ]
+        self.assertListEqual(result, expected)
+
+    @unittest.mock.patch('subprocess.check_output')
+    def test_analyze_repository_details_error(self, check_output_mock):
+        """Test whether an exception is thrown in case of errors"""
+
+        check_output_mock.side_effect = subprocess.CalledProcessError(
+            -1, "command", output=b'output')
+
+        scc = SCC()
+        kwargs = {'repository_path': self.tmp_data_path,
+                  'repository_level': True,
+                  'files_affected': [],
+                  'details': True}
+
+        with self.assertRaises(GraalError):
+            scc.analyze(**kwargs)
+
     @unittest.mock.patch('subprocess.check_output')
     def test_analyze_error(self, check_output_mock):
         """Test whether an exception is thrown in case of errors"""